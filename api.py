@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+
+from flask import Blueprint, current_app, request, session, url_for
+
+import auth
+import orders as customer_orders
+from cart_store import get_cart_store
+from db import get_db
+from menu_cache import get_menu
+
+try:
+    import orjson
+except ImportError:  # optional: same output, just slower
+    orjson = None
+
+# ---------------- JSON API ----------------
+
+# /api/v1 for kiosks and partner integrations. It uses the same session
+# login, menu cache, cart store and order code as the HTML pages; each call
+# that writes does so in one transaction.
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_BATCH_ITEMS = 100
+MAX_QUANTITY = 99
+MAX_ORDERS_PER_PAGE = 100
+
+
+def _dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json(payload, status=200):
+    return current_app.response_class(_dumps(payload), status, mimetype="application/json")
+
+
+def _error(message, status, **extra):
+    return _json({"error": message, **extra}, status)
+
+
+@bp.before_request
+def require_login():
+    if request.endpoint != "api.login" and "user_id" not in session:
+        return _error("login required", 401)
+
+# ---------------- AUTH ----------------
+
+@bp.route("/login", methods=["POST"])
+def login():
+    body = request.get_json(silent=True) or {}
+    email, password = body.get("email"), body.get("password")
+    if not isinstance(email, str) or not isinstance(password, str):
+        return _error("email and password are required", 400)
+
+    try:
+        user = auth.authenticate(get_db(), email, password, request.remote_addr)
+    except auth.RateLimited as e:
+        response = _error("too many attempts", 429, retry_after=e.retry_after)
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    except auth.Busy:
+        response = _error("server busy", 503)
+        response.headers["Retry-After"] = "1"
+        return response
+
+    if not user:
+        return _error("invalid credentials", 401)
+    session["user_id"] = user["id"]
+    session["user_name"] = user["name"]
+    session["is_admin"] = user["is_admin"]
+    get_cart_store().clear(user["id"])
+    return _json({"id": user["id"], "name": user["name"]})
+
+# ---------------- MENU ----------------
+
+# The serialised menu is built once per menu version, so a request is a
+# version check plus a byte copy, or a 304.
+_menu_body = {}
+_menu_lock = threading.Lock()
+
+
+def _menu_response_body(snapshot):
+    with _menu_lock:
+        if _menu_body.get("version") != snapshot.version:
+            body = _dumps({
+                "version": snapshot.version,
+                "items": [
+                    {
+                        "id": item["id"],
+                        "item_name": item["item_name"],
+                        "category": item["category"],
+                        "price": item["price"],
+                        "image_url": url_for("static", filename="food_images/" + item["image"])
+                        if item.get("image") else None,
+                    }
+                    for item in snapshot.items
+                ],
+            })
+            _menu_body.update(version=snapshot.version, body=body,
+                              etag=hashlib.sha1(body).hexdigest()[:20])
+        return _menu_body["body"], _menu_body["etag"]
+
+
+@bp.route("/menu")
+def menu():
+    body, etag = _menu_response_body(get_menu())
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# ---------------- CART ----------------
+
+def _cart_payload(user_id):
+    store = get_cart_store()
+    items = store.items(user_id)
+    return {
+        "items": [{"key": key, **item} for key, item in items.items()],
+        "total": sum(item["price"] * item["quantity"] for item in items.values()),
+    }
+
+
+@bp.route("/cart")
+def cart():
+    return _json(_cart_payload(session["user_id"]))
+
+
+@bp.route("/cart/items", methods=["POST"])
+def add_cart_items():
+    """Add many menu items at once: {"items": [{"item_id": 1, "quantity": 2}, ...]}.
+
+    Either every line is added or, if any is invalid, none is.
+    """
+    body = request.get_json(silent=True) or {}
+    lines = body.get("items")
+    if not isinstance(lines, list) or not lines:
+        return _error("items must be a non-empty list", 400)
+    if len(lines) > MAX_BATCH_ITEMS:
+        return _error(f"at most {MAX_BATCH_ITEMS} items per call", 400)
+
+    by_id = get_menu().by_id
+    quantities = {}
+    invalid = []
+    for index, line in enumerate(lines):
+        item_id = line.get("item_id") if isinstance(line, dict) else None
+        quantity = line.get("quantity", 1) if isinstance(line, dict) else None
+        # bool is an int subclass; true must not count as one item
+        if (not isinstance(item_id, int) or isinstance(item_id, bool) or item_id not in by_id
+                or not isinstance(quantity, int) or isinstance(quantity, bool)
+                or not 1 <= quantity <= MAX_QUANTITY):
+            invalid.append(index)
+            continue
+        quantities[item_id] = quantities.get(item_id, 0) + quantity
+    if invalid:
+        return _error("invalid items", 400, invalid=invalid)
+
+    get_cart_store().add_many(session["user_id"], [
+        (str(item_id), by_id[item_id]["item_name"], by_id[item_id]["price"], quantity)
+        for item_id, quantity in quantities.items()
+    ])
+    return _json(_cart_payload(session["user_id"]))
+
+# ---------------- ORDERS ----------------
+
+@bp.route("/checkout", methods=["POST"])
+def checkout():
+    placed = customer_orders.place_order(get_db(), session["user_id"], get_cart_store())
+    if placed is None:
+        return _error("cart is empty", 409)
+    order_id, total = placed
+    return _json({"order_id": order_id, "total": total}, 201)
+
+
+@bp.route("/orders")
+def order_history():
+    limit = request.args.get("limit", customer_orders.ORDERS_PER_PAGE, type=int)
+    limit = max(1, min(limit, MAX_ORDERS_PER_PAGE))
+    orders, next_cursor = customer_orders.order_history(
+        get_db(), session["user_id"],
+        request.args.get("before_ts"), request.args.get("before_id", type=int), limit
+    )
+    return _json({"orders": orders, "next": next_cursor})
+
+
+def init_app(app):
+    app.register_blueprint(bp)
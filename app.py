@@ -1,134 +1,116 @@
-from flask import Flask, render_template, request, redirect, session
+from flask import Flask, Response, render_template, request, redirect, session, jsonify
+import os
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from flask import send_file
+from markupsafe import Markup
 import io
 
+import api
+import assets
+import async_serving
+import auth
+import cache
+import cart_store
+import db
+import exports
+import forecast
+import group_formation
+import jobs
+import menu_cache
+import menu_io
+import metrics
+import migrations
+import offers as offer_claims
+import orders as customer_orders
+import render_cache
+import rollups
+import search as menu_search
+import supplier_search
+from cart_store import get_cart_store
+from cache import data_version
+from db import get_db
+from menu_cache import get_menu
+
 app = Flask(__name__)
 app.secret_key = "super_secret_key"
 
-DATABASE = "restaurant.db"
+DATABASE = os.environ.get("DATABASE", "restaurant.db")
+app.config["DATABASE"] = DATABASE
+app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 8))
 
 # ---------------- DATABASE CONNECTION ----------------
 
-def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+db.init_app(app)
 
-# ---------------- DATABASE INIT ----------------
+# ---------------- METRICS ----------------
 
-def init_db():
-    conn = get_db()
-    c = conn.cursor()
-
-    # USERS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            is_admin INTEGER DEFAULT 0
-        )
-    """)
-
-    # MENU
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS menu(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_name TEXT,
-            category TEXT,
-            price INTEGER
-        )
-    """)
-
-    # ORDERS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS orders(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    # ORDER ITEMS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS order_items(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER,
-            item_name TEXT,
-            FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE
-        )
-    """)
+# Registered first so its timing covers the other request hooks.
+app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "1") == "1"
+app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", metrics.DEFAULT_SLOW_QUERY_MS))
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+metrics.init_app(app)
 
-    # GROUPS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS groups(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            group_name TEXT UNIQUE
-        )
-    """)
-
-    # GROUP MEMBERS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS group_members(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            group_id INTEGER,
-            user_id INTEGER,
-            UNIQUE(group_id, user_id),
-            FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE,
-            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    """)
-
-    # OFFERS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS offers(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            group_id INTEGER,
-            title TEXT,
-            description TEXT,
-            price INTEGER,
-            expiry_datetime TEXT,
-            FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE
-        )
-    """)
-
-    # SAMPLE MENU
-    c.execute("SELECT COUNT(*) FROM menu")
-    if c.fetchone()[0] == 0:
-        items = [
-            ("Chicken Biryani", "Biryani", 250),
-            ("Mutton Biryani", "Biryani", 320),
-            ("Margherita Pizza", "Pizza", 299),
-            ("Veg Burger", "Burger", 120),
-            ("Cold Coffee", "Coffee", 90)
-        ]
-        c.executemany(
-            "INSERT INTO menu (item_name, category, price) VALUES (?,?,?)",
-            items
-        )
+# ---------------- CART STORE ----------------
 
-    # DEFAULT ADMIN
-    c.execute("SELECT * FROM users WHERE email='admin@gmail.com'")
-    if not c.fetchone():
-        admin_password = generate_password_hash("admin123")
-        c.execute(
-            "INSERT INTO users (name,email,password,is_admin) VALUES (?,?,?,1)",
-            ("admin", "admin@gmail.com", admin_password)
-        )
+app.config["CART_BACKEND"] = os.environ.get("CART_BACKEND", "sqlite")
+cart_store.init_app(app)
 
-    conn.commit()
-    conn.close()
+# ---------------- MENU CACHE ----------------
+
+menu_cache.init_app(app)
+
+# ---------------- DATABASE MIGRATIONS ----------------
+
+# Schema changes live in migrations.py and are applied once with
+# `flask --app app migrate`; workers only check the schema version.
+migrations.init_app(app)
+
+# ---------------- STATIC ASSETS ----------------
+
+assets.init_app(app)
+
+# ---------------- PASSWORD HASHING ----------------
+
+# Cost of new hashes; existing ones are upgraded on the next good login.
+app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", auth.DEFAULT_HASH_METHOD)
+app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", auth.DEFAULT_HASH_WORKERS))
+auth.init_app(app)
 
-init_db()
+# ---------------- RENDER CACHE ----------------
+
+render_cache.init_app(app)
+
+# ---------------- JSON API ----------------
+
+api.init_app(app)
+
+# ---------------- ASYNC SERVING ----------------
+
+# `uvicorn app:asgi_app` is the async serving mode for browse traffic;
+# `gunicorn app:app` keeps serving every route synchronously.
+app.config["ASYNC_READ_THREADS"] = int(os.environ.get("ASYNC_READ_THREADS", async_serving.DEFAULT_READ_THREADS))
+app.config["ASYNC_WRITE_THREADS"] = int(os.environ.get("ASYNC_WRITE_THREADS", async_serving.DEFAULT_WRITE_THREADS))
+async_serving.init_app(app)
+asgi_app = async_serving.AsyncServer(app)
+
+# ---------------- CLI ----------------
+
+menu_io.init_app(app)
+rollups.init_app(app)
+exports.init_app(app)
+forecast.init_app(app)
+jobs.init_app(app)
 
 # ---------------- AUTH ----------------
 
+def too_many_attempts(e):
+    return (f"Too many attempts. Try again in {e.retry_after} seconds.", 429,
+            {"Retry-After": str(e.retry_after)})
+
+def server_busy():
+    return "Server busy, please try again.", 503, {"Retry-After": "1"}
+
 @app.route("/")
 def home():
     return redirect("/login")
@@ -138,19 +120,22 @@ def register():
     if request.method == "POST":
         name = request.form["name"]
         email = request.form["email"]
-        password = generate_password_hash(request.form["password"])
 
         conn = get_db()
+        try:
+            password = auth.hash_new_password(conn, request.form["password"], request.remote_addr)
+        except auth.RateLimited as e:
+            return too_many_attempts(e)
+        except auth.Busy:
+            return server_busy()
         try:
             conn.execute(
                 "INSERT INTO users (name,email,password) VALUES (?,?,?)",
                 (name, email, password)
             )
             conn.commit()
-        except:
-            conn.close()
+        except sqlite3.IntegrityError:
             return "Email already exists!"
-        conn.close()
         return redirect("/login")
 
     return render_template("register.html")
@@ -162,17 +147,18 @@ def login():
         password = request.form["password"]
 
         conn = get_db()
-        user = conn.execute(
-            "SELECT * FROM users WHERE email=?",
-            (email,)
-        ).fetchone()
-        conn.close()
+        try:
+            user = auth.authenticate(conn, email, password, request.remote_addr)
+        except auth.RateLimited as e:
+            return too_many_attempts(e)
+        except auth.Busy:
+            return server_busy()
 
-        if user and check_password_hash(user["password"], password):
+        if user:
             session["user_id"] = user["id"]
             session["user_name"] = user["name"]
             session["is_admin"] = user["is_admin"]
-            session["cart"] = {}
+            get_cart_store().clear(user["id"])
             if user["is_admin"] == 1:
                 return redirect("/admin/dashboard")
             else:
@@ -194,18 +180,30 @@ def menu():
         return redirect("/login")
 
     search = request.args.get("search")
-    conn = get_db()
 
     if search:
-        items = conn.execute(
-            "SELECT * FROM menu WHERE item_name LIKE ? OR category LIKE ?",
-            ('%' + search + '%', '%' + search + '%')
-        ).fetchall()
-    else:
-        items = conn.execute("SELECT * FROM menu").fetchall()
+        by_id = get_menu().by_id
+        results = menu_search.search(get_db(), search, kinds=("menu",))
+        items = [by_id[item_id] for _, item_id in results if item_id in by_id]
+        grid = Markup(render_template("menu_grid.html", items=items))
+        return render_template("menu.html", menu_grid=grid)
+
+    # The grid is the same for everyone; only the greeting is per user
+    snapshot = get_menu()
+    grid = render_cache.fragment(
+        "menu_grid", None, snapshot.version,
+        lambda: (render_template("menu_grid.html", items=snapshot.items), None)
+    )
+    return render_cache.cached_response(grid, "menu.html", "menu_grid", vary=(session.get("user_name"),))
 
-    conn.close()
-    return render_template("menu.html", items=items)
+@app.route("/search/suggest")
+def search_suggest():
+    if "user_id" not in session:
+        return jsonify({"error": "login required"}), 401
+
+    limit = request.args.get("limit", menu_search.MAX_SUGGESTIONS, type=int)
+    results = menu_search.suggest(get_db(), request.args.get("q", ""), limit)
+    return jsonify({"results": results})
 
 # ---------------- GROUP OFFERS ----------------
 
@@ -215,21 +213,27 @@ def group_page(group_id):
         return redirect("/login")
 
     conn = get_db()
-    group = conn.execute("SELECT * FROM groups WHERE id=?", (group_id,)).fetchone()
 
-    if not group:
-        conn.close()
-        return "Group not found"
+    def render():
+        group = conn.execute("SELECT * FROM groups WHERE id=?", (group_id,)).fetchone()
 
-    offers = conn.execute("""
-        SELECT *
-        FROM offers
-        WHERE group_id=?
-        AND datetime(expiry_datetime) > datetime('now')
-    """, (group_id,)).fetchall()
+        if not group:
+            return "Group not found", None
+
+        offers = conn.execute("""
+            SELECT *
+            FROM offers
+            WHERE group_id=?
+            AND expiry_ts > ?
+            ORDER BY expiry_ts
+        """, (group_id, offer_claims.now_ts())).fetchall()
+
+        # Re-rendered when the first listed offer expires
+        expires_at = offers[0]["expiry_ts"] if offers else None
+        return render_template("group_offers.html", group_name=group["group_name"], offers=offers), expires_at
 
-    conn.close()
-    return render_template("group_offers.html", group_name=group["group_name"], offers=offers)
+    version = (data_version(conn, "groups"), data_version(conn, "offers"))
+    return render_cache.cached_response(render_cache.fragment("group_offers", group_id, version, render))
 @app.route("/admin/group/<int:group_id>", methods=["GET","POST"])
 def admin_group(group_id):
     if not session.get("is_admin"):
@@ -238,25 +242,25 @@ def admin_group(group_id):
     conn = get_db()
     group = conn.execute("SELECT * FROM groups WHERE id=?", (group_id,)).fetchone()
     if not group:
-        conn.close()
         return "Group not found"
 
     if request.method == "POST":
         title = request.form["title"]
         description = request.form["description"]
         price = request.form["price"]
-        expiry_datetime = request.form["expiry"]
-        
+        max_claims = request.form.get("max_claims", type=int)
+        try:
+            expiry_datetime, expiry_ts = offer_claims.parse_expiry(request.form["expiry"])
+        except ValueError:
+            return "Invalid expiry date"
 
-       
         conn.execute("""
-            INSERT INTO offers (group_id,title,description,price,expiry_datetime)
-            VALUES (?,?,?,?,?)
-        """, (group_id, title, description, price, expiry_datetime))
+            INSERT INTO offers (group_id,title,description,price,expiry_datetime,expiry_ts,max_claims)
+            VALUES (?,?,?,?,?,?,?)
+        """, (group_id, title, description, price, expiry_datetime, expiry_ts, max_claims))
         conn.commit()
 
     offers = conn.execute("SELECT * FROM offers WHERE group_id=?", (group_id,)).fetchall()
-    conn.close()
 
     return render_template("admin_group.html", group=group, offers=offers)
 
@@ -273,11 +277,10 @@ def add_offer_to_cart():
         SELECT *
         FROM offers
         WHERE id=?
-        AND datetime(expiry_datetime) > datetime('now')
-    """, (offer_id,)).fetchone()
+        AND expiry_ts > ?
+    """, (offer_id, offer_claims.now_ts())).fetchone()
 
     if not offer:
-        conn.close()
         return "Offer expired or invalid"
 
     member = conn.execute("""
@@ -285,24 +288,11 @@ def add_offer_to_cart():
         FROM group_members
         WHERE group_id=? AND user_id=?
     """, (offer["group_id"], session["user_id"])).fetchone()
-    conn.close()
 
     if not member:
         return "Unauthorized"
 
-    cart = session.get("cart", {})
-    key = f"offer_{offer_id}"
-
-    if key in cart:
-        cart[key]["quantity"] += quantity
-    else:
-        cart[key] = {
-            "name": offer["title"],
-            "price": offer["price"],
-            "quantity": quantity
-        }
-
-    session["cart"] = cart
+    get_cart_store().add(session["user_id"], f"offer_{offer_id}", offer["title"], offer["price"], quantity)
     return redirect("/cart")
 
 # ---------------- CART OPERATIONS ----------------
@@ -312,27 +302,15 @@ def add_to_cart():
     if "user_id" not in session:
         return redirect("/login")
         
-    item_id = request.form.get("item_id")
+    item_id = request.form.get("item_id", type=int)
     quantity = int(request.form.get("quantity", 1))
 
-    conn = get_db()
-    item = conn.execute("SELECT id, item_name, price FROM menu WHERE id=?", (item_id,)).fetchone()
-    conn.close()
+    item = get_menu().by_id.get(item_id)
 
     if not item:
         return redirect("/menu")
 
-    cart = session.get("cart", {})
-    if item_id in cart:
-        cart[item_id]["quantity"] += quantity
-    else:
-        cart[item_id] = {
-            "name": item["item_name"],
-            "price": item["price"],
-            "quantity": quantity
-        }
-
-    session["cart"] = cart
+    get_cart_store().add(session["user_id"], str(item["id"]), item["item_name"], item["price"], quantity)
     return redirect("/cart")
 
 @app.route("/cart")
@@ -340,21 +318,25 @@ def cart():
     if "user_id" not in session:
         return redirect("/login")
 
-    cart = session.get("cart", {})
-    total = sum(int(item["price"]) * int(item["quantity"]) for item in cart.values())
+    store = get_cart_store()
+    cart = store.items(session["user_id"])
+    total = store.total(session["user_id"])
     return render_template("cart.html", cart=cart, total=total)
 
 @app.route("/remove_from_cart/<key>")
 def remove_from_cart(key):
-    cart = session.get("cart", {})
-    if key in cart:
-        cart.pop(key)
-        session["cart"] = cart
+    if "user_id" not in session:
+        return redirect("/login")
+
+    get_cart_store().remove(session["user_id"], key)
     return redirect("/cart")
 
 @app.route("/clear_cart")
 def clear_cart():
-    session.pop("cart", None)
+    if "user_id" not in session:
+        return redirect("/login")
+
+    get_cart_store().clear(session["user_id"])
     return redirect("/cart")
 
 # ---------------- CHECKOUT & GROUPS ----------------
@@ -364,69 +346,76 @@ def checkout():
     if "user_id" not in session:
         return redirect("/login")
 
-    cart = session.get("cart")
+    cart = get_cart_store().items(session["user_id"])
     if not cart:
         return redirect("/cart")
 
     if request.method == "POST":
         payment_method = request.form.get("payment_method")
-        conn = get_db()
-        cur = conn.execute("INSERT INTO orders (user_id) VALUES (?)", (session["user_id"],))
-        order_id = cur.lastrowid
-
-        for item in cart.values():
-            conn.execute("INSERT INTO order_items (order_id, item_name) VALUES (?,?)", (order_id, item["name"]))
-
-        # Group Formation Logic
-        for item in cart.values():
-            if item["name"].startswith("Offer"): continue
-
-            users = conn.execute("""
-                SELECT DISTINCT o.user_id FROM orders o
-                JOIN order_items oi ON o.id = oi.order_id
-                WHERE oi.item_name=?
-            """, (item["name"],)).fetchall()
-
-            if len(users) >= 2:
-                group_name = f"{item['name']} Lovers"
-                group = conn.execute("SELECT * FROM groups WHERE group_name=?", (group_name,)).fetchone()
-                
-                if not group:
-                    cur = conn.execute("INSERT INTO groups (group_name) VALUES (?)", (group_name,))
-                    group_id = cur.lastrowid
-                else:
-                    group_id = group["id"]
-
-                for u in users:
-                    conn.execute("INSERT OR IGNORE INTO group_members (group_id, user_id) VALUES (?,?)", (group_id, u["user_id"]))
-
-        conn.commit()
-        conn.close()
-        session.pop("cart", None)
+        if customer_orders.place_order(get_db(), session["user_id"], get_cart_store()) is None:
+            return redirect("/cart")
         return render_template("order_success.html", method=payment_method)
 
     return render_template("checkout.html")
 
+GROUP_MEMBERS_PREVIEW = 10
+
 @app.route("/my_groups")
 def my_groups():
     if not session.get("user_id"):
         return redirect("/login")
 
+    user_id = session["user_id"]
     conn = get_db()
     groups_data = conn.execute("""
         SELECT g.* FROM groups g
         JOIN group_members gm ON g.id = gm.group_id
         WHERE gm.user_id = ?
-    """, (session["user_id"],)).fetchall()
+        ORDER BY g.group_name
+    """, (user_id,)).fetchall()
 
-    groups = []
+    groups = {}
     for group in groups_data:
-        members = conn.execute("SELECT u.name FROM users u JOIN group_members gm ON u.id = gm.user_id WHERE gm.group_id = ?", (group["id"],)).fetchall()
-        offers = conn.execute("SELECT * FROM offers WHERE group_id = ?", (group["id"],)).fetchall()
-        groups.append({"id": group["id"], "group_name": group["group_name"], "members": members, "offers": offers})
+        groups[group["id"]] = {
+            "id": group["id"],
+            "group_name": group["group_name"],
+            "members": [],
+            "member_count": 0,
+            "offers": []
+        }
+
+    # Only the first few members of each group are listed; the rest are counted.
+    members = conn.execute("""
+        SELECT group_id, name, member_count FROM (
+            SELECT gm.group_id, u.name,
+                   ROW_NUMBER() OVER (PARTITION BY gm.group_id ORDER BY gm.id) AS position,
+                   COUNT(*) OVER (PARTITION BY gm.group_id) AS member_count
+            FROM group_members gm
+            JOIN users u ON u.id = gm.user_id
+            WHERE gm.group_id IN (SELECT group_id FROM group_members WHERE user_id = ?)
+        )
+        WHERE position <= ?
+    """, (user_id, GROUP_MEMBERS_PREVIEW)).fetchall()
+    # The worker can add the user to a group between these queries; such a
+    # group shows up on the next page load.
+    for member in members:
+        group = groups.get(member["group_id"])
+        if group is None:
+            continue
+        group["members"].append(member)
+        group["member_count"] = member["member_count"]
 
-    conn.close()
-    return render_template("my_groups.html", groups=groups)
+    offers = conn.execute("""
+        SELECT * FROM offers
+        WHERE group_id IN (SELECT group_id FROM group_members WHERE user_id = ?)
+        AND expiry_ts > ?
+        ORDER BY expiry_ts
+    """, (user_id, offer_claims.now_ts())).fetchall()
+    for offer in offers:
+        if offer["group_id"] in groups:
+            groups[offer["group_id"]]["offers"].append(offer)
+
+    return render_template("my_groups.html", groups=list(groups.values()))
 
 # ---------------- ADMIN PANEL ----------------
 
@@ -435,15 +424,86 @@ def admin_dashboard():
     if not session.get("is_admin"):
         return redirect("/login")
 
-    conn = get_db()
-    groups = conn.execute("""
-        SELECT g.id, g.group_name, COUNT(gm.user_id) as total_members
-        FROM groups g
-        LEFT JOIN group_members gm ON g.id = gm.group_id
-        GROUP BY g.id
-    """).fetchall()
-    conn.close()
-    return render_template("admin_dashboard.html", groups=groups)
+    # Rollups only: rendering cost does not grow with order history
+    stats = rollups.dashboard(get_db())
+    # Computed once per day by the refresh_forecast job; this only reads it
+    stats["forecast"] = forecast.get_forecast(get_db())
+    stats["jobs"] = jobs.stats(get_db())
+    stats["auth"] = auth.stats()
+    return render_template("admin_dashboard.html", **stats)
+
+@app.route("/admin/cache_stats")
+def admin_cache_stats():
+    if not session.get("is_admin"):
+        return redirect("/login")
+
+    return jsonify(cache.all_stats())
+
+@app.route("/admin/db_stats")
+def admin_db_stats():
+    if not session.get("is_admin"):
+        return redirect("/login")
+
+    stats = db.get_pool().stats()
+    stats["write_locks"] = db.lock_stats()
+    if "db_read_pool" in app.extensions:
+        stats["read_pool"] = db.get_read_pool().stats()
+        stats["async_lanes"] = asgi_app.stats()
+    return jsonify(stats)
+
+@app.route("/admin/metrics")
+def admin_metrics():
+    if not session.get("is_admin"):
+        return redirect("/login")
+
+    stats = metrics.snapshot()
+    if request.args.get("format") == "json":
+        return jsonify(stats)
+    return render_template("admin_metrics.html", **stats)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if not metrics.scrape_allowed():
+        return "Forbidden", 403
+    return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/jobs")
+def admin_jobs():
+    if not session.get("is_admin"):
+        return redirect("/login")
+
+    return jsonify(jobs.stats(get_db()))
+
+@app.route("/admin/auth")
+def admin_auth():
+    if not session.get("is_admin"):
+        return redirect("/login")
+
+    return jsonify(auth.stats())
+
+@app.route("/admin/export/<dataset>")
+def admin_export(dataset):
+    if not session.get("is_admin"):
+        return redirect("/login")
+
+    if dataset not in exports.DATASETS:
+        return "Unknown export", 404
+    fmt = request.args.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        return "Unknown format", 400
+    start, end = request.args.get("start") or None, request.args.get("end") or None
+    try:
+        exports.date_bounds(start, end)
+    except ValueError:
+        return "Dates must be YYYY-MM-DD", 400
+
+    # Streamed chunk by chunk from its own read-only connection
+    filename = f"{dataset}_{start or 'all'}_{end or 'all'}.{exports.EXTENSIONS[fmt]}"
+    return Response(
+        exports.stream(app.config["DATABASE"], dataset, fmt, start, end),
+        mimetype=exports.MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @app.route("/admin_post_offer", methods=["GET", "POST"])
 def admin_post_offer():
@@ -454,14 +514,18 @@ def admin_post_offer():
     if request.method == "POST":
         group_id, title = request.form["group_id"], request.form["title"]
         description, price = request.form["description"], request.form["price"]
-        expiry_datetime = f"{request.form['expiry_date']} {request.form['expiry_time']}"
+        try:
+            expiry_datetime, expiry_ts = offer_claims.parse_expiry(
+                f"{request.form['expiry_date']} {request.form['expiry_time']}"
+            )
+        except ValueError:
+            return "Invalid expiry date"
 
-        conn.execute("INSERT INTO offers (group_id,title,description,price,expiry_datetime) VALUES (?,?,?,?,?)",
-                     (group_id, title, description, price, expiry_datetime))
+        conn.execute("INSERT INTO offers (group_id,title,description,price,expiry_datetime,expiry_ts) VALUES (?,?,?,?,?,?)",
+                     (group_id, title, description, price, expiry_datetime, expiry_ts))
         conn.commit()
 
     groups = conn.execute("SELECT * FROM groups").fetchall()
-    conn.close()
     return render_template("admin_offer.html", groups=groups)
 
 @app.route("/claim_offer/<int:offer_id>", methods=["POST"])
@@ -469,92 +533,33 @@ def claim_offer(offer_id):
     if not session.get("user_id"):
         return redirect("/login")
 
-    conn = sqlite3.connect("restaurant.db")
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    # Get offer
-    cursor.execute("SELECT * FROM offers WHERE id=?", (offer_id,))
-    offer = cursor.fetchone()
+    status, remaining = offer_claims.claim(get_db(), offer_id, session["user_id"])
 
-    if not offer:
-        conn.close()
+    if status == offer_claims.NOT_FOUND:
         return "Offer not found"
-
-    # ✅ Check expiry
-    cursor.execute("""
-        SELECT * FROM offers
-        WHERE id=?
-        AND datetime(expiry_datetime) > datetime('now')
-    """, (offer_id,))
-    
-    if not cursor.fetchone():
-        conn.close()
+    if status == offer_claims.EXPIRED:
         return "Offer expired"
-
-    # ✅ Check claim limit
-    if offer["claimed_count"] >= offer["max_claims"]:
-        conn.close()
-        return "Offer Sold Out!"
-
-    # ✅ Increase claim count IMMEDIATELY
-    cursor.execute("""
-        UPDATE offers
-        SET claimed_count = claimed_count + 1
-        WHERE id=? AND claimed_count < max_claims
-    """, (offer_id,))
-
-    conn.commit()
-
-    # Check if update actually happened
-    if cursor.rowcount == 0:
-        conn.close()
+    if status == offer_claims.ALREADY_CLAIMED:
+        return "You have already claimed this offer"
+    if status == offer_claims.SOLD_OUT:
         return "Offer Sold Out!"
 
-    conn.close()
-
+    if remaining is not None:
+        return f"Offer Claimed Successfully! {remaining} left"
     return "Offer Claimed Successfully!"
+
 @app.route("/orders")
 def order_history():
     if "user_id" not in session:
         return redirect("/login")
 
-    conn = get_db()
-
-    # Get all orders of current user
-    orders_data = conn.execute("""
-        SELECT * FROM orders
-        WHERE user_id=?
-        ORDER BY created_at DESC
-    """, (session["user_id"],)).fetchall()
-
-    orders = []
-
-    for order in orders_data:
-        order_id = order["id"]
-
-        items = conn.execute("""
-            SELECT oi.item_name, m.price
-            FROM order_items oi
-            LEFT JOIN menu m ON oi.item_name = m.item_name
-            WHERE oi.order_id=?
-        """, (order_id,)).fetchall()
-
-        total = 0
-        for item in items:
-            if item["price"]:
-                total += item["price"]
-
-        orders.append({
-            "id": order_id,
-            "created_at": order["created_at"],
-            "items": items,
-            "total": total
-        })
+    # Keyset cursor: the (created_at, id) of the last order on the previous page
+    before_ts = request.args.get("before_ts")
+    before_id = request.args.get("before_id", type=int)
 
-    conn.close()
+    orders, next_cursor = customer_orders.order_history(get_db(), session["user_id"], before_ts, before_id)
 
-    return render_template("order_history.html", orders=orders)
+    return render_template("order_history.html", orders=orders, next_cursor=next_cursor)
 @app.route("/supplier_dashboard")
 def supplier_dashboard():
     if "user_id" not in session:
@@ -573,7 +578,7 @@ def add_supplier_item():
     location = request.form["location"]
     contact = request.form["contact"]
 
-    conn = sqlite3.connect("restaurant.db")
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -583,70 +588,68 @@ def add_supplier_item():
     """, (session["user_id"], item_name, category, price, quantity, location, contact))
 
     conn.commit()
-    conn.close()
+    # Other workers pick the change up from data_versions
+    cache.get_cache("supplier_items").invalidate()
 
     return redirect("/view_my_listings")
-@app.route("/admin_suppliers")
-def admin_suppliers():
+SUPPLIERS_PER_PAGE = 50
+
+def load_supplier_categories(conn, version):
+    rows = conn.execute("""
+        SELECT DISTINCT category FROM supplier_items
+        WHERE category IS NOT NULL
+        ORDER BY category
+    """).fetchall()
+    return [row[0] for row in rows]
 
-    category = request.args.get("category")
-    sort = request.args.get("sort")
+cache.register(app, cache.VersionedCache("supplier_items", load_supplier_categories))
 
-    conn = sqlite3.connect("restaurant.db")
-    cursor = conn.cursor()
+@app.route("/admin_suppliers")
+def admin_suppliers():
+    if not session.get("is_admin"):
+        return redirect("/login")
 
-    query = """
-        SELECT users.name,
-               supplier_items.item_name,
-               supplier_items.category,
-               supplier_items.price_per_kg,
-               supplier_items.quantity,
-               supplier_items.location,
-               supplier_items.contact,
-               supplier_items.created_at
-        FROM supplier_items
-        JOIN users ON supplier_items.user_id = users.id
-    """
-
-    conditions = []
-    params = []
-
-    # Filter by category
-    if category and category != "All":
-        conditions.append("supplier_items.category = ?")
-        params.append(category)
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    # Sort by price
-    if sort == "low":
-        query += " ORDER BY supplier_items.price_per_kg ASC"
-    else:
-        query += " ORDER BY supplier_items.created_at DESC"
-
-    cursor.execute(query, params)
-    items = cursor.fetchall()
+    filters = supplier_search.parse_filters(request.args)
+    filters["limit"] = SUPPLIERS_PER_PAGE
+    items, cursor = supplier_search.search_listings(get_db(), filters)
 
-    # Get distinct categories for dropdown
-    cursor.execute("SELECT DISTINCT category FROM supplier_items")
-    categories = [row[0] for row in cursor.fetchall()]
+    next_page = None
+    if cursor:
+        # Carry the current filters over to the next page
+        next_page = {
+            key: value for key, value in request.args.items()
+            if key not in ("after", "after_id")
+        }
+        next_page.update(cursor)
 
-    conn.close()
+    # Categories for the dropdown only change when a listing is written
+    categories = cache.get_cache("supplier_items").get()
 
     return render_template(
         "admin_suppliers.html",
         items=items,
         categories=categories,
-        selected_category=category,
-        selected_sort=sort
+        filters=filters,
+        next_page=next_page
     )
+
+@app.route("/admin_suppliers/search")
+def admin_suppliers_search():
+    if not session.get("is_admin"):
+        return jsonify({"error": "admin login required"}), 401
+
+    filters = supplier_search.parse_filters(request.args)
+    items, cursor = supplier_search.search_listings(get_db(), filters)
+    return jsonify({
+        "items": [supplier_search.listing_to_dict(row) for row in items],
+        "next": cursor
+    })
 @app.route("/view_my_listings")
 def view_my_listings():
     if "user_id" not in session:
         return redirect("/login")
 
-    conn = sqlite3.connect("restaurant.db")
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -656,7 +659,6 @@ def view_my_listings():
     """, (session["user_id"],))
 
     items = cursor.fetchall()
-    conn.close()
 
     return render_template("view_my_listings.html", items=items)
 
@@ -673,7 +675,7 @@ def add_special():
 
         today = datetime.now().strftime("%Y-%m-%d")
 
-        conn = sqlite3.connect("restaurant.db")
+        conn = get_db()
         cursor = conn.cursor()
 
         # Delete old specials (yesterday and before)
@@ -686,23 +688,34 @@ def add_special():
         )
 
         conn.commit()
-        conn.close()
 
         return redirect("/admin/dashboard")
 
-    return render_template("add_special.html")
+    # Suggestions from the demand forecast, with menu details to prefill
+    menu_by_name = {item["item_name"]: item for item in get_menu().items}
+    demand = forecast.get_forecast(get_db())
+    suggestions = [
+        dict(suggestion, category=menu_by_name[suggestion["item_name"]]["category"],
+             price=menu_by_name[suggestion["item_name"]]["price"])
+        for suggestion in (demand["specials"] if demand else [])
+        if suggestion["item_name"] in menu_by_name
+    ]
+    return render_template("add_special.html", suggestions=suggestions)
 @app.route("/today_special")
 def today_special():
     if "user_id" not in session:
         return redirect("/login")
 
-    conn = sqlite3.connect("restaurant.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM specials ORDER BY created_at DESC")
-    specials = cursor.fetchall()
-    conn.close()
+    conn = get_db()
 
-    return render_template("today_special.html", specials=specials)
+    def render():
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM specials ORDER BY created_at DESC")
+        specials = cursor.fetchall()
+        return render_template("today_special.html", specials=specials), None
+
+    page = render_cache.fragment("today_special", None, data_version(conn, "specials"), render)
+    return render_cache.cached_response(page)
 @app.route("/add_special_to_cart", methods=["POST"])
 def add_special_to_cart():
     if "user_id" not in session:
@@ -716,26 +729,14 @@ def add_special_to_cart():
         "SELECT id, item_name, price FROM specials WHERE id=?",
         (item_id,)
     ).fetchone()
-    conn.close()
 
     if not item:
         return redirect("/today_special")
 
-    cart = session.get("cart", {})
-
     # Important: Use a unique key so it doesn’t clash with menu items
-    special_key = f"special_{item_id}"
-
-    if special_key in cart:
-        cart[special_key]["quantity"] += quantity
-    else:
-        cart[special_key] = {
-            "name": item["item_name"],
-            "price": item["price"],
-            "quantity": quantity
-        }
+    special_key = f"special_{item['id']}"
 
-    session["cart"] = cart
+    get_cart_store().add(session["user_id"], special_key, item["item_name"], item["price"], quantity)
     return redirect("/cart")
 @app.route("/diet_menu", methods=["GET", "POST"])
 def diet_menu():
@@ -759,7 +760,6 @@ def diet_menu():
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (session["user_id"], name, shift, mobile, days, months, liquids, nonveg, food_items))
         conn.commit()
-        conn.close()
         return "Diet menu request submitted successfully!"
     
     return render_template("diet_menu.html")
@@ -775,7 +775,6 @@ def update_diet_status(request_id, action):
     conn = get_db()
     conn.execute("update diet_menu_requests SET status=? WHERE id=?", (action, request_id))
     conn.commit()
-    conn.close()
     
     return redirect("/admin/diet_requests")
 @app.route("/admin/diet_requests")
@@ -786,7 +785,6 @@ def admin_diet_requests():
     
     conn = get_db()
     requests = conn.execute("SELECT * FROM diet_menu_requests ORDER BY created_at DESC").fetchall()
-    conn.close()
     
     return render_template("admin_diet_requests.html", requests=requests)
 @app.route("/my_diet_requests")
@@ -800,7 +798,6 @@ def my_diet_requests():
         "SELECT * FROM diet_menu_requests WHERE user_id=? ORDER BY created_at DESC",
         (user_id,)
     ).fetchall()
-    conn.close()
 
     return render_template("my_diet_requests.html", requests=requests)
 @app.route("/download_diet_menu/<int:request_id>")
@@ -814,7 +811,6 @@ def download_diet_menu(request_id):
         "SELECT * FROM diet_menu_requests WHERE id=? AND user_id=?",
         (request_id, user_id)
     ).fetchone()
-    conn.close()
 
     if not request_data:
         return "Request not found"
@@ -846,4 +842,9 @@ Submitted At: {request_data['created_at']}
         mimetype="text/plain"
     )
 if __name__ == "__main__":
+    migrations.migrate(DATABASE)
+    # The development server runs queued jobs itself; production runs
+    # `flask --app app worker` next to the web workers.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        jobs.start_thread(DATABASE)
     app.run(debug=True)
\ No newline at end of file
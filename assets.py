@@ -0,0 +1,165 @@
+import hashlib
+import io
+import json
+import os
+import re
+
+import click
+from flask import current_app, request, url_for
+from flask.cli import with_appcontext
+from markupsafe import Markup, escape
+
+import db
+
+# ---------------- IMAGE VARIANTS ----------------
+
+DEFAULT_WIDTHS = (160, 320, 640)
+VARIANTS_DIR = "variants"
+FORMATS = {
+    # format key: (Pillow format, file extension, save options)
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 6}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Variant files carry a content hash, e.g. veg_biryani-320w.1a2b3c4d5e.webp
+HASHED_NAME = re.compile(r"\.[0-9a-f]{10}\.(webp|jpg)$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_MAX_AGE = 3600
+
+
+def _encode(image, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, pil_format, **options)
+    return buf.getvalue()
+
+
+def build_variants(source, out_dir, widths=DEFAULT_WIDTHS):
+    """Write resized WebP/JPEG copies of one image. Returns the variant manifest.
+
+    Widths at or above the original are skipped rather than upscaled; an
+    image smaller than every target gets one variant at its own width.
+    """
+    from PIL import Image
+
+    with Image.open(source) as original:
+        original.load()
+        width, height = original.size
+        stem = os.path.splitext(os.path.basename(source))[0]
+        targets = sorted({w for w in widths if w < width}) or [width]
+
+        manifest = {"width": width, "height": height}
+        for fmt in FORMATS:
+            ext = FORMATS[fmt][1]
+            entries = []
+            for target in targets:
+                if target == width:
+                    resized = original
+                else:
+                    resized = original.resize((target, round(height * target / width)), Image.LANCZOS)
+                data = _encode(resized, fmt)
+                digest = hashlib.sha256(data).hexdigest()[:10]
+                name = f"{stem}-{target}w.{digest}.{ext}"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    with open(path, "wb") as fh:
+                        fh.write(data)
+                entries.append([target, f"{VARIANTS_DIR}/{name}"])
+            manifest[fmt] = entries
+    return manifest
+
+# ---------------- TEMPLATE HELPER ----------------
+
+def _srcset(entries):
+    return ", ".join(
+        f"{url_for('static', filename='food_images/' + path)} {width}w" for width, path in entries
+    )
+
+
+def menu_image(item, sizes="220px"):
+    """<picture> markup with WebP/JPEG srcsets and lazy loading for a menu item."""
+    image = item.get("image")
+    if not image:
+        return Markup("")
+    alt = escape(item["item_name"])
+    src = url_for("static", filename="food_images/" + image)
+    variants = item.get("image_variants")
+    if isinstance(variants, str):
+        variants = json.loads(variants)
+
+    if not variants:
+        return Markup(f'<img src="{src}" alt="{alt}" loading="lazy" decoding="async">')
+
+    fallback = variants["jpeg"][0][1]
+    return Markup(
+        "<picture>"
+        f'<source type="image/webp" srcset="{_srcset(variants["webp"])}" sizes="{sizes}">'
+        f'<img src="{url_for("static", filename="food_images/" + fallback)}" '
+        f'srcset="{_srcset(variants["jpeg"])}" sizes="{sizes}" '
+        f'width="{variants["width"]}" height="{variants["height"]}" '
+        f'alt="{alt}" loading="lazy" decoding="async">'
+        "</picture>"
+    )
+
+# ---------------- CACHE HEADERS ----------------
+
+def static_cache_headers(response):
+    if request.endpoint != "static" or response.status_code not in (200, 304):
+        return response
+    if HASHED_NAME.search(request.path):
+        response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+    return response
+
+# ---------------- CLI ----------------
+
+@click.command("build-images")
+@click.option("--widths", default=",".join(map(str, DEFAULT_WIDTHS)), show_default=True,
+              help="Comma-separated target widths in pixels.")
+@click.option("--images-dir", help="Source directory, defaults to static/food_images.")
+@with_appcontext
+def build_images_command(widths, images_dir):
+    """Generate resized WebP/JPEG variants and record them on the menu."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise click.ClickException("Pillow is required: pip install Pillow")
+
+    widths = [int(w) for w in widths.split(",") if w.strip()]
+    images_dir = images_dir or os.path.join(current_app.static_folder, "food_images")
+    if not os.path.isdir(images_dir):
+        raise click.ClickException(f"Images directory {images_dir} not found.")
+    out_dir = os.path.join(images_dir, VARIANTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        images = [row[0] for row in conn.execute(
+            "SELECT DISTINCT image FROM menu WHERE image IS NOT NULL AND image != ''"
+        )]
+        updates = []
+        for image in images:
+            source = os.path.join(images_dir, image)
+            if not os.path.isfile(source):
+                click.echo(f"skipping {image}: file not found", err=True)
+                continue
+            manifest = build_variants(source, out_dir, widths)
+            updates.append((json.dumps(manifest, separators=(",", ":")), image))
+            click.echo(f"{image}: {len(manifest['webp'])} sizes")
+
+        with db.write_transaction(conn, "build_images"):
+            conn.executemany("""
+                UPDATE menu SET image_variants = ?
+                WHERE image = ? AND image_variants IS NOT ?
+            """, [(manifest, image, manifest) for manifest, image in updates])
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    app.jinja_env.globals["menu_image"] = menu_image
+    app.after_request(static_cache_headers)
+    app.cli.add_command(build_images_command)
@@ -0,0 +1,279 @@
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+import db
+
+# ---------------- ASYNC SERVING ----------------
+
+# `uvicorn app:asgi_app` serves the same Flask app from an event loop. An
+# open connection costs a coroutine rather than a gunicorn worker, and a
+# request only holds a thread while its view runs:
+#
+#   * browse pages (BROWSE_ENDPOINTS) run on the reader threads with
+#     read-only connections from db.get_read_pool();
+#   * everything else runs on a few writer threads, exactly as it would
+#     in a sync worker.
+#
+# When a lane has more requests in flight than threads + ASYNC_QUEUE_LIMIT
+# it answers 503 instead of queueing without bound. `gunicorn app:app`
+# does not go through this module at all.
+
+BROWSE_ENDPOINTS = frozenset({
+    "menu",
+    "today_special",
+    "group_page",
+    "order_history",
+    "admin_suppliers",
+    "admin_suppliers_search",
+    "admin_diet_requests",
+})
+
+DEFAULT_READ_THREADS = 8
+DEFAULT_WRITE_THREADS = 4
+DEFAULT_QUEUE_LIMIT = 1024
+DEFAULT_MAX_BODY = 1024 * 1024
+# Responses up to this size are buffered and sent from the event loop;
+# larger ones (exports) are streamed from their thread.
+BUFFER_LIMIT = 256 * 1024
+
+
+class Lane:
+    """A bounded thread pool and the count of requests queued or running on it."""
+
+    def __init__(self, name, threads, queue_limit):
+        self.name = name
+        self.threads = threads
+        self.limit = threads + queue_limit
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix=f"async-{name}")
+        # Only touched from the event loop thread
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def stats(self):
+        return {
+            "threads": self.threads,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class AsyncServer:
+    """ASGI application that runs a Flask app's views on bounded thread pools."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lanes = None
+        self._pid = None
+        self._urls = None
+        app.extensions["async_server"] = self
+
+    def lanes(self):
+        # uvicorn --workers starts each worker in its own process
+        if self._lanes is None or self._pid != os.getpid():
+            config = self.app.config
+            self._lanes = {
+                "read": Lane("read", config["ASYNC_READ_THREADS"], config["ASYNC_QUEUE_LIMIT"]),
+                "write": Lane("write", config["ASYNC_WRITE_THREADS"], config["ASYNC_QUEUE_LIMIT"]),
+            }
+            self._pid = os.getpid()
+            self._urls = self.app.url_map.bind("localhost")
+            # Read-only connections cannot create the WAL index; one writer
+            # connection kept open in the pool guarantees it exists.
+            pool = db.get_pool(self.app)
+            pool.release(pool.acquire())
+        return self._lanes
+
+    def close(self):
+        if self._lanes is not None:
+            for lane in self._lanes.values():
+                lane.executor.shutdown(wait=True)
+            self._lanes = None
+
+    def stats(self):
+        if self._lanes is None:
+            return {}
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
+    def is_browse(self, method, path):
+        if method not in ("GET", "HEAD"):
+            return False
+        try:
+            endpoint, _ = self._urls.match(path, method)
+        except (HTTPException, RequestRedirect):
+            return False
+        return endpoint in BROWSE_ENDPOINTS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        lanes = self.lanes()
+        body = await _read_body(receive, self.app.config["ASYNC_MAX_BODY"])
+        if body is None:
+            await _send_plain(send, 413, b"Request body too large.")
+            return
+
+        path = scope["path"][len(scope.get("root_path", "")):] or "/"
+        browse = self.is_browse(scope["method"], path)
+        lane = lanes["read" if browse else "write"]
+        if lane.in_flight >= lane.limit:
+            lane.rejected += 1
+            await _send_plain(send, 503, b"Server busy. Try again shortly.", [(b"retry-after", b"1")])
+            return
+
+        environ = _environ(scope, path, body)
+        environ[db.READ_ONLY_ENVIRON_KEY] = browse
+        loop = asyncio.get_running_loop()
+        lane.in_flight += 1
+        try:
+            result = await loop.run_in_executor(lane.executor, _run_wsgi, self.app, environ, send, loop)
+        finally:
+            lane.in_flight -= 1
+            lane.completed += 1
+        if result is not None:
+            status, headers, chunks = result
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": b"".join(chunks)})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.lanes()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+# ---------------- WSGI BRIDGE ----------------
+
+async def _read_body(receive, max_body):
+    """The request body, or None if it is larger than max_body."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_body:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send_plain(send, status, body, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode())] + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _environ(scope, path, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key in environ:
+            value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+        environ[key] = value
+    return environ
+
+
+def _run_wsgi(app, environ, send, loop):
+    """Call the app on a pool thread.
+
+    Returns (status, headers, chunks) for the event loop to send, or None if
+    the response outgrew BUFFER_LIMIT and was streamed from here instead.
+    """
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response[:] = [
+            int(status.split(" ", 1)[0]),
+            [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        ]
+
+    def send_now(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    iterable = app(environ, start_response)
+    chunks = []
+    size = 0
+    streaming = False
+    try:
+        for chunk in iterable:
+            if not chunk:
+                continue
+            if streaming:
+                send_now({"type": "http.response.body", "body": chunk, "more_body": True})
+                continue
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > BUFFER_LIMIT:
+                streaming = True
+                send_now({"type": "http.response.start", "status": response[0], "headers": response[1]})
+                send_now({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                chunks = []
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+    if streaming:
+        send_now({"type": "http.response.body", "body": b""})
+        return None
+    return response[0], response[1], chunks
+
+
+def init_app(app):
+    app.config.setdefault("ASYNC_READ_THREADS", DEFAULT_READ_THREADS)
+    app.config.setdefault("ASYNC_WRITE_THREADS", DEFAULT_WRITE_THREADS)
+    app.config.setdefault("ASYNC_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)
+    app.config.setdefault("ASYNC_MAX_BODY", DEFAULT_MAX_BODY)
+    # One read-only connection per reader thread, so none of them waits on the pool
+    app.config.setdefault("DB_READ_POOL_SIZE", app.config["ASYNC_READ_THREADS"])
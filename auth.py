@@ -0,0 +1,317 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import db
+from metrics import Histogram
+
+# ---------------- PASSWORD HASHING ----------------
+
+# A password hash is deliberately tens of milliseconds of CPU. Done inline, a
+# burst of logins holds every request thread and menu/checkout traffic waits
+# behind it, so hashes run in a small process pool with a bounded backlog:
+# once `workers + queue_limit` hashes are in flight, callers get Busy at once
+# instead of queueing behind a bot.
+
+DEFAULT_HASH_METHOD = "scrypt:32768:8:1"
+DEFAULT_HASH_WORKERS = 2
+DEFAULT_HASH_QUEUE = 8
+DEFAULT_HASH_TIMEOUT = 5.0
+
+
+class Busy(Exception):
+    """The hashing backlog is full; answer 503 rather than wait."""
+
+
+class RateLimited(Exception):
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Too many attempts for this {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Hash and verify passwords off the request thread, one pool per process.
+
+    With workers=0 hashing runs inline (still bounded by queue_limit), which
+    suits single-core hosts and scripts.
+    """
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=DEFAULT_HASH_WORKERS,
+                 queue_limit=DEFAULT_HASH_QUEUE, timeout=DEFAULT_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._prefix = None
+        self.in_flight = 0
+
+    def _executor(self):
+        with self._lock:
+            # A pool inherited across gunicorn's fork has no live processes
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise Busy()
+        with self._lock:
+            self.in_flight += 1
+        if not self.workers:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+
+        try:
+            future = self._executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the hash finishes, even if we stop waiting
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise Busy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        """True when a stored hash was made with another method or cost."""
+        if self._prefix is None:
+            # werkzeug expands short names ("scrypt") to their full parameters
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return stored.split("$", 1)[0] != self._prefix
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def get_hasher():
+    return current_app.extensions["password_hasher"]
+
+# ---------------- RATE LIMITING ----------------
+
+# Token buckets live in SQLite so every worker process shares them. A bucket
+# holds up to `capacity` attempts and refills at `per_second`; a full bucket
+# is the same as no row, so idle rows are swept now and then.
+#
+# Buckets are checked with a plain read first, so a rejected attempt never
+# takes the write lock that checkout needs; a login that goes ahead writes
+# once, after the password check.
+
+DEFAULT_RATE_LIMITS = {
+    "ip": (20, 20 / 60),      # 20 attempts, then one every 3 seconds
+    "email": (5, 1 / 60),     # 5 attempts, then one a minute
+}
+BUCKET_SWEEP_CHANCE = 0.01
+
+
+def create_schema(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits(
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+def _levels(conn, buckets, limits, now):
+    """[(key, tokens left after taking one)]; raises RateLimited for the first empty bucket."""
+    levels = []
+    for scope, ident in buckets:
+        capacity, per_second = limits[scope]
+        key = f"{scope}:{ident}"
+        row = conn.execute("SELECT tokens, updated_at FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * per_second)
+        if tokens < 1:
+            raise RateLimited(scope, int((1 - tokens) / per_second) + 1)
+        levels.append((key, tokens - 1, now))
+    return levels
+
+
+def check_tokens(conn, buckets, limits=None):
+    """Raise RateLimited if any (scope, id) bucket is empty, without writing."""
+    _levels(conn, buckets, limits or current_app.config["LOGIN_RATE_LIMITS"], time.time())
+
+
+def charge(conn, buckets, reset=(), limits=None):
+    """Take one token from each bucket and empty the `reset` scopes' buckets.
+
+    Call inside the caller's write transaction. The buckets are checked
+    again there, so attempts that raced past check_tokens() still raise
+    RateLimited and nothing is written.
+    """
+    limits = limits or current_app.config["LOGIN_RATE_LIMITS"]
+    now = time.time()
+    levels = _levels(conn, buckets, limits, now)
+    reset_keys = {f"{scope}:{ident}" for scope, ident in buckets if scope in reset}
+    taken = [level for level in levels if level[0] not in reset_keys]
+    if taken:
+        conn.executemany("""
+            INSERT INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+        """, taken)
+    if reset_keys:
+        conn.executemany("DELETE FROM rate_limits WHERE key = ?", [(key,) for key in reset_keys])
+    if random.random() < BUCKET_SWEEP_CHANCE:
+        slowest = min(capacity / per_second for capacity, per_second in limits.values())
+        conn.execute("DELETE FROM rate_limits WHERE updated_at < ?", (now - slowest,))
+
+
+def take_token(conn, buckets, limits=None):
+    """Take one token from each (scope, id) bucket, or none if any is empty.
+
+    Raises RateLimited for the first empty bucket.
+    """
+    check_tokens(conn, buckets, limits)
+    with db.write_transaction(conn, "rate_limit"):
+        charge(conn, buckets, limits=limits)
+
+# ---------------- LOGIN / REGISTER ----------------
+
+def authenticate(conn, email, password, remote_addr):
+    """Return the user row for valid credentials, else None.
+
+    Raises RateLimited or Busy before any hashing when the caller should back
+    off. Hashes made with an older method or cost are replaced on success.
+    """
+    hasher = get_hasher()
+    started = time.perf_counter()
+    outcome = "login_failed"
+    rehashed = False
+    buckets = [("ip", remote_addr), ("email", email.strip().lower())]
+    try:
+        check_tokens(conn, buckets)
+        user = conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
+        valid = user is not None and hasher.verify(user["password"], password)
+
+        new_hash = None
+        if valid and hasher.needs_rehash(user["password"]):
+            try:
+                new_hash = hasher.hash(password)
+            except Busy:
+                pass  # try again on a quieter login
+
+        # The attempt's only write: charge the buckets and, on success, clear
+        # the email bucket and store the upgraded hash.
+        with db.write_transaction(conn, "login"):
+            charge(conn, buckets, reset=("email",) if valid else ())
+            if new_hash is not None:
+                conn.execute("UPDATE users SET password = ? WHERE id = ?", (new_hash, user["id"]))
+        if not valid:
+            return None
+        outcome = "login_success"
+        rehashed = new_hash is not None
+        return user
+    except RateLimited as e:
+        outcome = f"rejected_{e.scope}"
+        raise
+    except Busy:
+        outcome = "rejected_busy"
+        raise
+    finally:
+        record(outcome, time.perf_counter() - started, rehashed)
+
+
+def hash_new_password(conn, password, remote_addr):
+    """Hash a password for registration, rate limited per IP."""
+    try:
+        take_token(conn, [("ip", remote_addr)])
+        return get_hasher().hash(password)
+    except RateLimited as e:
+        record(f"rejected_{e.scope}")
+        raise
+    except Busy:
+        record("rejected_busy")
+        raise
+
+# ---------------- METRICS ----------------
+
+# Counters and a login latency histogram, per worker process like the
+# request metrics in metrics.py, so recording them costs no write.
+
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+OUTCOMES = ("login_success", "login_failed", "rejected_ip", "rejected_email", "rejected_busy")
+
+_stats_lock = threading.Lock()
+_counts = dict.fromkeys(OUTCOMES + ("rehashed",), 0)
+_latency = Histogram(LATENCY_BUCKETS_MS)
+
+
+def record(outcome, elapsed=None, rehashed=False):
+    with _stats_lock:
+        _counts[outcome] += 1
+        if rehashed:
+            _counts["rehashed"] += 1
+        if elapsed is not None:
+            _latency.observe(elapsed * 1000)
+
+
+def stats():
+    """This process's outcome counters, login latency percentiles and hash backlog."""
+    with _stats_lock:
+        counts = dict(_counts)
+        p50, p95 = _latency.percentile(0.5), _latency.percentile(0.95)
+        mean = round(_latency.sum / _latency.count, 1) if _latency.count else None
+        histogram = {
+            ("+Inf" if index == len(LATENCY_BUCKETS_MS) else str(LATENCY_BUCKETS_MS[index])): n
+            for index, n in enumerate(_latency.counts)
+        }
+
+    hasher = get_hasher()
+    return {
+        "counts": counts,
+        "latency_ms": {
+            # None when the percentile falls in the unbounded top bucket
+            "p50": None if p50 == float("inf") else p50,
+            "p95": None if p95 == float("inf") else p95,
+            "mean": mean,
+            "histogram": histogram,
+        },
+        "hashing": {
+            "method": hasher.method,
+            "workers": hasher.workers,
+            "queue_limit": hasher.queue_limit,
+            "in_flight": hasher.in_flight,
+        },
+    }
+
+
+def init_app(app):
+    app.config.setdefault("PASSWORD_HASH_METHOD", DEFAULT_HASH_METHOD)
+    app.config.setdefault("PASSWORD_HASH_WORKERS", DEFAULT_HASH_WORKERS)
+    app.config.setdefault("PASSWORD_HASH_QUEUE", DEFAULT_HASH_QUEUE)
+    app.config.setdefault("PASSWORD_HASH_TIMEOUT", DEFAULT_HASH_TIMEOUT)
+    app.config.setdefault("LOGIN_RATE_LIMITS", DEFAULT_RATE_LIMITS)
+    app.extensions["password_hasher"] = PasswordHasher(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        queue_limit=app.config["PASSWORD_HASH_QUEUE"],
+        timeout=app.config["PASSWORD_HASH_TIMEOUT"],
+    )
@@ -0,0 +1,77 @@
+"""Adding a basket to the cart: one /api/v1 batch call vs one form post per item.
+
+    python benchmarks/bench_api.py --basket 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--basket", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        os.environ["DATABASE"] = path
+        os.environ["PASSWORD_HASH_WORKERS"] = "0"
+
+        import db
+        import migrations
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+        with db.write_transaction(conn, "seed"):
+            conn.executemany(
+                "INSERT INTO menu (item_name, category, price) VALUES (?, 'Main', ?)",
+                [(f"Item {i}", 100 + i) for i in range(args.basket)]
+            )
+        ids = [row[0] for row in conn.execute("SELECT id FROM menu ORDER BY id LIMIT ?", (args.basket,))]
+        conn.close()
+
+        from app import app
+        app.template_folder = ROOT  # templates sit next to app.py in this checkout
+        client = app.test_client()
+        client.post("/register", data={"name": "Bench", "email": "bench@example.com", "password": "x"})
+        client.post("/api/v1/login", json={"email": "bench@example.com", "password": "x"})
+        basket = {"items": [{"item_id": item_id, "quantity": 2} for item_id in ids]}
+
+        def forms():
+            for item_id in ids:
+                client.post("/add_to_cart", data={"item_id": item_id, "quantity": 2})
+
+        def batch():
+            client.post("/api/v1/cart/items", json=basket)
+
+        results = {}
+        for name, fn in (("form posts", forms), ("api batch", batch)):
+            timings = []
+            for _ in range(args.repeat):
+                client.post("/api/v1/checkout")
+                started = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            results[name] = (timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000)
+
+        menu = client.get("/api/v1/menu")
+        etag = menu.headers["ETag"]
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            client.get("/api/v1/menu", headers={"If-None-Match": etag})
+        not_modified = (time.perf_counter() - started) / args.repeat * 1000
+
+    print(f"basket of {args.basket} items")
+    for name, (p50, p95) in results.items():
+        print(f"  {name:10} p50={p50:7.2f} ms  p95={p95:7.2f} ms")
+    print(f"GET /api/v1/menu 304: {not_modified:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Browse traffic from many concurrent clients: gunicorn sync workers vs `uvicorn app:asgi_app`.
+
+Each client keeps a connection open (reconnecting when the server closes
+it), requests one of /menu, /today_special, /group/<id> or /orders, waits
+a random think time, and repeats. Both modes get the same number of
+server processes.
+
+    pip install gunicorn uvicorn
+    python benchmarks/bench_async.py --clients 2000 --duration 20 --processes 2
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+import db  # noqa: E402
+import loadtest  # noqa: E402  (benchmarks/ is on sys.path when run as a script)
+
+
+def sync_app():
+    """gunicorn entry point: `bench_async:sync_app()`."""
+    return loadtest.bench_app()
+
+
+def async_app():
+    """uvicorn entry point: `--factory bench_async:async_app`."""
+    return loadtest.bench_app().extensions["async_server"]
+
+
+def start_server(mode, env, processes):
+    port = loadtest._free_port()
+    if mode == "sync":
+        command = [sys.executable, "-m", "gunicorn", "--chdir", ROOT, "--pythonpath", HERE,
+                   "-w", str(processes), "--backlog", "4096", "-b", f"127.0.0.1:{port}",
+                   "--log-level", "warning", "bench_async:sync_app()"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "--app-dir", HERE, "--factory", "--workers", str(processes),
+                   "--backlog", "4096", "--port", str(port), "--timeout-keep-alive", "75", "--log-level", "warning",
+                   "--no-access-log", "bench_async:async_app"]
+    server = subprocess.Popen(command, env=env, cwd=ROOT, start_new_session=True)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        loadtest._wait_for(url, server)
+    except BaseException:
+        loadtest.stop_server(server)
+        raise
+    return server, url
+
+
+def session_cookie(url):
+    """Log in once; every client reuses the signed session cookie."""
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    data = urllib.parse.urlencode({"email": loadtest.user_email(0), "password": loadtest.PASSWORD}).encode()
+    try:
+        urllib.request.build_opener(NoRedirect).open(url + "/login", data, timeout=30)
+    except urllib.error.HTTPError as e:
+        cookie = e.headers.get("Set-Cookie")
+        if e.code == 302 and cookie:
+            return cookie.split(";", 1)[0]
+    raise SystemExit("login failed")
+
+# ---------------- CLIENTS ----------------
+
+async def read_response(reader):
+    """(status, server closes the connection) for one HTTP/1.1 response."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    status = int(line.split()[1])
+    length = None
+    close = chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            close = value == "close"
+        elif name == "transfer-encoding":
+            chunked = "chunked" in value
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    elif status not in (204, 304):
+        await reader.read()
+        close = True
+    return status, close
+
+
+async def client(host, port, cookie, paths, deadline, think, timeout, rng, latencies, errors):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        path = rng.choice(paths)
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host}\r\nCookie: {cookie}\r\n\r\n").encode()
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(request)
+            status, close = await asyncio.wait_for(read_response(reader), timeout)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            close = True
+        if close and writer is not None:
+            writer.close()
+            writer = None
+        await asyncio.sleep(rng.expovariate(1 / think) if think else 0)
+    if writer is not None:
+        writer.close()
+
+
+def _load_process(args):
+    url, cookie, paths, clients, duration, think, ramp, timeout, seed = args
+    parsed = urllib.parse.urlsplit(url)
+
+    async def main():
+        latencies, errors = [], {}
+        deadline = time.monotonic() + ramp + duration
+        tasks = []
+        for i in range(clients):
+            rng = random.Random(seed + i)
+            tasks.append(asyncio.create_task(client(parsed.hostname, parsed.port, cookie, paths, deadline,
+                                                    think, timeout, rng, latencies, errors)))
+            await asyncio.sleep(ramp / clients)
+        await asyncio.gather(*tasks)
+        return latencies, errors
+
+    return asyncio.run(main())
+
+
+def drive(url, cookie, paths, args):
+    per_process = [args.clients // args.load_processes + (i < args.clients % args.load_processes)
+                   for i in range(args.load_processes)]
+    work = [(url, cookie, paths, n, args.duration, args.think_ms / 1000, args.ramp, args.timeout, i * 100000)
+            for i, n in enumerate(per_process)]
+    latencies, errors = [], {}
+    with multiprocessing.Pool(args.load_processes) as pool:
+        for result_latencies, result_errors in pool.map(_load_process, work):
+            latencies += result_latencies
+            for key, count in result_errors.items():
+                errors[key] = errors.get(key, 0) + count
+    latencies.sort()
+    return latencies, errors
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="database from `loadtest.py generate` (default: generate a small one)")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--processes", type=int, default=2, help="server processes in either mode")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--load-processes", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds measured after the ramp")
+    parser.add_argument("--ramp", type=float, default=3.0, help="seconds over which clients connect")
+    parser.add_argument("--think-ms", type=float, default=1000.0, help="mean pause between a client's requests")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.db
+        if not source:
+            source = os.path.join(tmp, "source.db")
+            loadtest.generate(source, users=500, menu_items=200, orders=20000, groups=50, offers=200,
+                              listings=2000, days=90, seed=24, hash_method="pbkdf2:sha256:1000")
+        conn = db.connect(source, read_only=True)
+        group_ids = [row[0] for row in conn.execute("SELECT id FROM groups LIMIT 20")]
+        conn.close()
+        paths = ["/menu", "/today_special", "/orders"] + [f"/group/{group_id}" for group_id in group_ids]
+
+        results = {}
+        for mode in args.modes.split(","):
+            path = os.path.join(tmp, f"{mode}.db")
+            shutil.copy(source, path)
+            env = dict(os.environ, DATABASE=path, PASSWORD_HASH_METHOD=loadtest.stored_hash_method(source),
+                       PASSWORD_HASH_WORKERS="0")
+            env.pop("LOADTEST_WORKER", None)
+            server, url = start_server(mode, env, args.processes)
+            try:
+                cookie = session_cookie(url)
+                latencies, errors = drive(url, cookie, paths, args)
+            finally:
+                loadtest.stop_server(server)
+            results[mode] = (latencies, errors)
+
+    print(f"{args.clients} clients, think {args.think_ms:.0f} ms, {args.processes} server processes, "
+          f"{args.duration:.0f}s (+{args.ramp:.0f}s ramp)")
+    print(f"  {'mode':6} {'ok':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors")
+    # Requests are only started inside the ramp + duration window
+    window = args.ramp + args.duration
+    for mode, (latencies, errors) in results.items():
+        print(f"  {mode:6} {len(latencies):8} {len(latencies) / window:8.0f} {percentile(latencies, 0.5):9.1f} "
+              f"{percentile(latencies, 0.95):9.1f} {percentile(latencies, 0.99):9.1f}  {errors or '-'}")
+
+
+if __name__ == "__main__":
+    main()
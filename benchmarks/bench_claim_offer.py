@@ -0,0 +1,95 @@
+"""Load-test offer claiming with many concurrent claimers.
+
+Every claimer is a separate process with its own connection, released at the
+same moment, all hitting one offer with limited stock. The run fails if the
+offer is oversold, anyone claims twice, or claiming invalidated the cached
+group pages (data_versions['offers'] changed).
+
+    python benchmarks/bench_claim_offer.py --claimers 200 --stock 50
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import db
+import migrations
+import offers
+
+def claimer(args):
+    path, user_id, attempts, start_at = args
+    conn = db.connect(path, busy_timeout_ms=30000)
+    while time.time() < start_at:
+        time.sleep(0.001)
+    results = []
+    for _ in range(attempts):
+        started = time.perf_counter()
+        status, _ = offers.claim(conn, 1, user_id)
+        results.append((status, time.perf_counter() - started))
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--claimers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=2,
+                        help="claims per user; repeats must be rejected")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "claims.db")
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+        conn.executemany(
+            "INSERT INTO users (name, email, password) VALUES (?, ?, 'x')",
+            [(f"Claimer {i}", f"claimer{i}@example.com") for i in range(args.claimers)]
+        )
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE email LIKE 'claimer%'")]
+        group_id = conn.execute("INSERT INTO groups (group_name) VALUES ('Flash buyers')").lastrowid
+        conn.execute(
+            "INSERT INTO offers (group_id, title, price, expiry_datetime, expiry_ts, max_claims) "
+            "VALUES (?, 'Flash', 99, datetime('now', '+1 hour'), ?, ?)",
+            (group_id, offers.now_ts() + 3600, args.stock)
+        )
+        conn.commit()
+        offers_version = cache.data_version(conn, "offers")
+
+        start_at = time.time() + 2.0
+        jobs = [(path, user_id, args.attempts, start_at) for user_id in user_ids]
+        with multiprocessing.Pool(args.claimers) as pool:
+            results = [r for batch in pool.map(claimer, jobs) for r in batch]
+        elapsed = max(time.time() - start_at, 1e-9)
+
+        claimed_count = conn.execute("SELECT claimed_count FROM offers WHERE id=1").fetchone()[0]
+        ledger = conn.execute("SELECT COUNT(*), COUNT(DISTINCT user_id) FROM offer_claims").fetchone()
+        version_unchanged = cache.data_version(conn, "offers") == offers_version
+        conn.close()
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(t for _, t in results)
+
+    print(f"claimers={args.claimers} attempts={len(results)} stock={args.stock}")
+    print(f"outcomes: {statuses}")
+    print(f"claimed_count={claimed_count} ledger_rows={ledger[0]} distinct_users={ledger[1]}")
+    print(f"throughput: {len(results) / elapsed:.0f} claims/s over {elapsed:.2f}s")
+    print(f"latency p50={latencies[len(latencies) // 2] * 1000:.2f} ms "
+          f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+    assert claimed_count == statuses.get(offers.CLAIMED, 0) == ledger[0] == ledger[1]
+    assert claimed_count <= args.stock, "offer oversold"
+    assert version_unchanged, "claims bumped the offers data version"
+    print("OK: no overselling, no double claims, cached group pages kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Throughput and memory of streamed order_items exports.
+
+Seeds a database through the real migrations, then streams a date range as
+CSV and as the columnar format, discarding the output. Anonymous (heap) RSS
+should stay flat as --items grows; peak RSS also includes the database
+pages SQLite maps in.
+
+    python benchmarks/bench_export.py --items 10000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import exports
+import migrations
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def anon_rss_mb():
+    """Heap-backed resident memory; peak RSS also counts the mmap'd database."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def seed(conn, items, items_per_order, rng):
+    start = time.time() - 365 * 86400
+    orders = items // items_per_order
+    with db.write_transaction(conn, "seed"):
+        conn.execute("INSERT INTO users (name, email, password) VALUES ('Bench', 'bench@example.com', 'x')")
+        conn.executemany(
+            "INSERT INTO orders (id, user_id, created_at) VALUES (?, 1, ?)",
+            ((i + 1, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + i * 365 * 86400 / orders)))
+             for i in range(orders))
+        )
+        conn.executemany(
+            "INSERT INTO order_items (order_id, menu_id, item_name, unit_price, quantity) VALUES (?,?,?,?,?)",
+            ((i // items_per_order + 1, (i % 40) + 1, f"Item {i % 40}", rng.randint(50, 400), rng.randint(1, 3))
+             for i in range(orders * items_per_order))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--items-per-order", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+        started = time.perf_counter()
+        seed(conn, args.items, args.items_per_order, random.Random(17))
+        conn.close()
+        print(f"seeded {args.items} line items in {time.perf_counter() - started:.1f}s, "
+              f"peak RSS {peak_rss_mb():.0f} MB")
+
+        for fmt in exports.FORMATS:
+            started = time.perf_counter()
+            size = 0
+            for piece in exports.stream(path, "order_items", fmt):
+                size += len(piece)
+            elapsed = time.perf_counter() - started
+            print(f"{fmt:9} {elapsed:6.1f}s  {args.items / elapsed:10,.0f} rows/s  "
+                  f"{size / 1e6:8.1f} MB out  peak RSS {peak_rss_mb():.0f} MB  anon RSS {anon_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
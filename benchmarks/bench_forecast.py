@@ -0,0 +1,84 @@
+"""Time a full demand forecast over a year of per-item daily history.
+
+    python benchmarks/bench_forecast.py --items 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import forecast
+import migrations
+
+
+def seed(conn, items, days, rng, today):
+    rows = []
+    for i in range(items):
+        base = rng.uniform(0.5, 40)
+        weekly = [rng.uniform(0.6, 1.6) for _ in range(7)]
+        for d in range(1, days + 1):
+            day = today - timedelta(days=d)
+            # Sparse items have days with no orders, as in the real rollup
+            quantity = int(rng.gauss(base * weekly[day.weekday()], base * 0.2))
+            if quantity > 0:
+                rows.append((day.isoformat(), f"Item {i}", quantity, quantity, quantity * 150))
+    with db.write_transaction(conn, "seed"):
+        conn.executemany("""
+            INSERT INTO daily_item_sales (day, item_name, orders, quantity, revenue)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.executemany(
+            "INSERT INTO recipe_ingredients (item_name, ingredient, quantity, unit) VALUES (?, ?, ?, 'kg')",
+            [(f"Item {i}", f"Ingredient {i % 60}", round(rng.uniform(0.05, 0.3), 2)) for i in range(items)]
+        )
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=forecast.HISTORY_DAYS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+        rows = seed(conn, args.items, args.days, random.Random(18), today)
+        print(f"seeded {rows} item-days for {args.items} items")
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = forecast.compute(conn, today.isoformat())
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"compute: median {timings[len(timings) // 2] * 1000:.0f} ms, "
+              f"max {timings[-1] * 1000:.0f} ms ({len(result['items'])} items, "
+              f"{len(result['ingredients'])} ingredients)")
+
+        started = time.perf_counter()
+        forecast.refresh(conn, today.isoformat())
+        refreshed = time.perf_counter() - started
+        forecast._latest.clear()
+        started = time.perf_counter()
+        forecast.get_forecast(conn, today.isoformat())
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        forecast.get_forecast(conn, today.isoformat())
+        cached = time.perf_counter() - started
+        print(f"refresh {refreshed * 1000:.0f} ms; get_forecast: from forecast_cache {first * 1000:.1f} ms, "
+              f"in memory {cached * 1000:.3f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
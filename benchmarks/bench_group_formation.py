@@ -0,0 +1,138 @@
+"""Compare the old full-history group formation in checkout() with the
+incremental buyer-count tables.
+
+    python benchmarks/bench_group_formation.py --order-items 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import group_formation
+
+SCHEMA = """
+CREATE TABLE users(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT);
+CREATE TABLE orders(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE order_items(id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER, item_name TEXT);
+CREATE TABLE groups(id INTEGER PRIMARY KEY AUTOINCREMENT, group_name TEXT UNIQUE);
+CREATE TABLE group_members(id INTEGER PRIMARY KEY AUTOINCREMENT, group_id INTEGER, user_id INTEGER,
+                           UNIQUE(group_id, user_id));
+CREATE TABLE item_buyers(item_name TEXT NOT NULL, user_id INTEGER NOT NULL,
+                         PRIMARY KEY(item_name, user_id)) WITHOUT ROWID;
+CREATE TABLE item_buyer_counts(item_name TEXT PRIMARY KEY, buyer_count INTEGER NOT NULL DEFAULT 0);
+"""
+
+INDEXES = """
+CREATE INDEX idx_order_items_order ON order_items(order_id);
+CREATE INDEX idx_order_items_item_name ON order_items(item_name);
+CREATE INDEX idx_orders_user ON orders(user_id);
+CREATE INDEX idx_group_members_user ON group_members(user_id);
+"""
+
+
+def build(path, order_items, users, items, per_order):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    rng = random.Random(42)
+    names = [f"Item {i}" for i in range(items)]
+    orders = order_items // per_order
+    conn.executemany("INSERT INTO orders (id, user_id) VALUES (?,?)",
+                     ((i, rng.randint(1, users)) for i in range(1, orders + 1)))
+    conn.executemany("INSERT INTO order_items (order_id, item_name) VALUES (?,?)",
+                     ((o, rng.choice(names)) for o in range(1, orders + 1) for _ in range(per_order)))
+    conn.commit()
+    conn.close()
+    return names
+
+
+def old_checkout(conn, user_id, cart_names):
+    cur = conn.execute("INSERT INTO orders (user_id) VALUES (?)", (user_id,))
+    order_id = cur.lastrowid
+    for name in cart_names:
+        conn.execute("INSERT INTO order_items (order_id, item_name) VALUES (?,?)", (order_id, name))
+    for name in cart_names:
+        buyers = conn.execute("""
+            SELECT DISTINCT o.user_id FROM orders o
+            JOIN order_items oi ON o.id = oi.order_id
+            WHERE oi.item_name=?
+        """, (name,)).fetchall()
+        if len(buyers) >= 2:
+            group_name = f"{name} Lovers"
+            group = conn.execute("SELECT id FROM groups WHERE group_name=?", (group_name,)).fetchone()
+            if not group:
+                group_id = conn.execute("INSERT INTO groups (group_name) VALUES (?)", (group_name,)).lastrowid
+            else:
+                group_id = group[0]
+            for (u,) in buyers:
+                conn.execute("INSERT OR IGNORE INTO group_members (group_id, user_id) VALUES (?,?)", (group_id, u))
+    conn.commit()
+
+
+def new_checkout(conn, user_id, cart_names):
+    cur = conn.execute("INSERT INTO orders (user_id) VALUES (?)", (user_id,))
+    order_id = cur.lastrowid
+    for name in cart_names:
+        conn.execute("INSERT INTO order_items (order_id, item_name) VALUES (?,?)", (order_id, name))
+    group_formation.record_buyers(conn, user_id, cart_names)
+    conn.commit()
+
+
+def run(path, fn, names, users, checkouts):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rng = random.Random(7)
+    timings = []
+    for _ in range(checkouts):
+        cart = rng.sample(names, 3)
+        started = time.perf_counter()
+        fn(conn, rng.randint(1, users), cart)
+        timings.append(time.perf_counter() - started)
+    conn.close()
+    timings.sort()
+    return {
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--order-items", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--per-order", type=int, default=4)
+    parser.add_argument("--checkouts", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = os.path.join(tmp, "before.db")
+        print(f"building {args.order_items} order_items ...")
+        names = build(before, args.order_items, args.users, args.items, args.per_order)
+
+        result = run(before, old_checkout, names, args.users, args.checkouts)
+        print(f"before (full scan, no index): {result}")
+
+        conn = sqlite3.connect(before)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(INDEXES)
+        started = time.perf_counter()
+        group_formation.backfill_buyers(conn)
+        conn.commit()
+        print(f"backfill: {time.perf_counter() - started:.2f}s")
+        conn.close()
+
+        result = run(before, old_checkout, names, args.users, args.checkouts)
+        print(f"before (full scan, indexed):  {result}")
+
+        result = run(before, new_checkout, names, args.users, args.checkouts)
+        print(f"after (incremental):          {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Menu latency while a burst of logins hits the app.
+
+Login threads (each from its own IP, guessing wrong passwords for a set of
+real accounts) run against the app while one thread keeps loading /menu.
+Compare hashing inline with the process pool:
+
+    python benchmarks/bench_login.py --hash-workers 0
+    python benchmarks/bench_login.py --hash-workers 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        os.environ["DATABASE"] = path
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+
+        import auth
+        import migrations
+        migrations.migrate(path, echo=lambda *a: None)
+        from app import app
+        app.template_folder = ROOT  # templates sit next to app.py in this checkout
+
+        # Each bot thread has its own IP so only the email buckets bite
+        app.config["LOGIN_RATE_LIMITS"] = {"ip": (10 ** 9, 10 ** 9), "email": (5, 1 / 60)}
+        client = app.test_client()
+        for i in range(args.accounts):
+            client.post("/register", data={"name": f"u{i}", "email": f"u{i}@example.com", "password": "secret"},
+                        environ_base={"REMOTE_ADDR": f"10.1.{i // 250}.{i % 250}"})
+
+        stop = threading.Event()
+        outcomes = {}
+        lock = threading.Lock()
+
+        def bot(n):
+            bot_client = app.test_client()
+            i = n
+            while not stop.is_set():
+                response = bot_client.post(
+                    "/login", data={"email": f"u{i % args.accounts}@example.com", "password": "guess"},
+                    environ_base={"REMOTE_ADDR": f"10.2.{n}.{i % 250}"}
+                )
+                with lock:
+                    outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+                i += args.threads
+
+        menu_client = app.test_client()
+        menu_client.post("/login", data={"email": "u0@example.com", "password": "secret"})
+        baseline = []
+        for _ in range(200):
+            started = time.perf_counter()
+            menu_client.get("/menu")
+            baseline.append(time.perf_counter() - started)
+
+        bots = [threading.Thread(target=bot, args=(n,), daemon=True) for n in range(args.threads)]
+        for thread in bots:
+            thread.start()
+        loaded = []
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            menu_client.get("/menu")
+            loaded.append(time.perf_counter() - started)
+        stop.set()
+        for thread in bots:
+            thread.join()
+
+        with app.app_context():
+            counts = auth.stats()["counts"]
+        app.extensions["password_hasher"].close()
+
+    print(f"hash workers={args.hash_workers} bot threads={args.threads}")
+    print(f"login responses: {dict(sorted(outcomes.items()))}")
+    print(f"auth counters: {counts}")
+    print(f"/menu idle:   p50={pct(baseline, 0.5):.1f} ms p95={pct(baseline, 0.95):.1f} ms")
+    print(f"/menu loaded: p50={pct(loaded, 0.5):.1f} ms p95={pct(loaded, 0.95):.1f} ms "
+          f"({len(loaded)} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Request overhead of the metrics hooks and SQL tracing.
+
+Runs the same request mix in a fresh process with METRICS_ENABLED=0 and
+=1, alternating, and compares the median time per request.
+
+    python benchmarks/bench_metrics.py --requests 3000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MIX = ("/menu", "/orders", "/cart", "/my_groups", "/api/v1/menu", "/api/v1/orders")
+
+
+def run(requests):
+    """Child process: time the request mix against a seeded database."""
+    import db
+    import migrations
+
+    path = os.environ["DATABASE"]
+    migrations.migrate(path, echo=lambda *a: None)
+    conn = db.connect(path)
+    with db.write_transaction(conn, "seed"):
+        conn.executemany("INSERT INTO menu (item_name, category, price) VALUES (?, 'Main', ?)",
+                         [(f"Item {i}", 100 + i) for i in range(100)])
+    conn.close()
+
+    from app import app
+    app.template_folder = ROOT  # templates sit next to app.py in this checkout
+    client = app.test_client()
+    client.post("/register", data={"name": "Bench", "email": "bench@example.com", "password": "x"})
+    client.post("/login", data={"email": "bench@example.com", "password": "x"})
+    for item_id in range(1, 30):
+        client.post("/api/v1/cart/items", json={"items": [{"item_id": item_id, "quantity": 1}]})
+        client.post("/api/v1/checkout")
+    client.post("/api/v1/cart/items", json={"items": [{"item_id": 1}, {"item_id": 2}]})
+
+    for path in MIX * 20:
+        client.get(path)
+    rounds = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for i in range(requests):
+            client.get(MIX[i % len(MIX)])
+        rounds.append((time.perf_counter() - started) / requests)
+    return sorted(rounds)[len(rounds) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--pairs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.requests)))
+        return
+
+    results = {"0": [], "1": []}
+    for _ in range(args.pairs):
+        for enabled in ("0", "1"):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, DATABASE=os.path.join(tmp, "bench.db"),
+                           METRICS_ENABLED=enabled, PASSWORD_HASH_WORKERS="0")
+                out = subprocess.run([sys.executable, __file__, "--child", "--requests", str(args.requests)],
+                                     env=env, capture_output=True, text=True, check=True)
+                results[enabled].append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    off = sorted(results["0"])[len(results["0"]) // 2]
+    on = sorted(results["1"])[len(results["1"]) // 2]
+    print(f"request mix: {', '.join(MIX)}")
+    print(f"metrics off: {off * 1e6:8.1f} us/request")
+    print(f"metrics on:  {on * 1e6:8.1f} us/request")
+    print(f"overhead:    {(on - off) / off * 100:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
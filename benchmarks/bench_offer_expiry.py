@@ -0,0 +1,74 @@
+"""Compare function-wrapped text expiry filters with the indexed epoch column.
+
+    python benchmarks/bench_offer_expiry.py --offers 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import offers
+
+
+def timed(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return round(timings[len(timings) // 2] * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=100_000)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    now = offers.now_ts()
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE offers(id INTEGER PRIMARY KEY, group_id INTEGER, title TEXT, description TEXT,
+                            price INTEGER, expiry_datetime TEXT, expiry_ts INTEGER)
+    """)
+    rows = []
+    for i in range(args.offers):
+        # Mostly expired history with a small live tail, as in production.
+        ts = now + rng.randint(-365 * 86400, 2 * 86400)
+        text = time.strftime("%Y-%m-%dT%H:%M" if i % 2 else "%Y-%m-%d %H:%M", time.gmtime(ts))
+        rows.append((rng.randint(1, args.groups), f"Offer {i}", "", 99, text))
+    conn.executemany(
+        "INSERT INTO offers (group_id, title, description, price, expiry_datetime) VALUES (?,?,?,?,?)", rows
+    )
+    conn.execute("CREATE INDEX idx_offers_group ON offers(group_id)")
+
+    group_id = 7
+    before = timed(conn, """
+        SELECT * FROM offers WHERE group_id=? AND datetime(expiry_datetime) > datetime('now')
+    """, (group_id,), args.repeat)
+    before_all = timed(conn, """
+        SELECT * FROM offers WHERE datetime(expiry_datetime) > datetime('now')
+    """, (), args.repeat)
+
+    started = time.perf_counter()
+    offers.backfill_expiry(conn)
+    conn.execute("CREATE INDEX idx_offers_group_expiry ON offers(group_id, expiry_ts)")
+    migrate = time.perf_counter() - started
+
+    after = timed(conn, "SELECT * FROM offers WHERE group_id=? AND expiry_ts > ?", (group_id, offers.now_ts()), args.repeat)
+    after_all = timed(conn, "SELECT * FROM offers WHERE expiry_ts > ?", (offers.now_ts(),), args.repeat)
+
+    print(f"{args.offers} offers across {args.groups} groups, migration {migrate:.2f}s")
+    print(f"one group's live offers: datetime() {before:8.3f} ms   expiry_ts {after:8.3f} ms")
+    print(f"all live offers:         datetime() {before_all:8.3f} ms   expiry_ts {after_all:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
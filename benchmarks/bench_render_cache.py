@@ -0,0 +1,76 @@
+"""/menu cost with a full render, a cached grid, and a conditional GET.
+
+    python benchmarks/bench_render_cache.py --items 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        os.environ["DATABASE"] = path
+        os.environ["PASSWORD_HASH_WORKERS"] = "0"
+
+        import db
+        import migrations
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+        with db.write_transaction(conn, "seed"):
+            conn.executemany(
+                "INSERT INTO menu (item_name, category, price, image) VALUES (?, 'Main', ?, 'dish.jpg')",
+                [(f"Item {i}", 100 + i % 300) for i in range(args.items)]
+            )
+        conn.close()
+
+        from app import app
+        import render_cache
+        app.template_folder = ROOT  # templates sit next to app.py in this checkout
+        client = app.test_client()
+        client.post("/register", data={"name": "Bench", "email": "bench@example.com", "password": "x"})
+        client.post("/login", data={"email": "bench@example.com", "password": "x"})
+
+        response = client.get("/menu")
+        etag = response.headers["ETag"]
+        size = len(response.data)
+        with app.app_context():
+            cache = render_cache.get_fragment_cache()
+
+        def uncached():
+            cache.clear()
+            client.get("/menu")
+
+        results = {
+            "full render": timed(uncached, args.repeat),
+            "cached grid": timed(lambda: client.get("/menu"), args.repeat),
+            "304": timed(lambda: client.get("/menu", headers={"If-None-Match": etag}), args.repeat),
+        }
+
+    print(f"/menu with {args.items} items ({size / 1024:.0f} KB)")
+    for name, (p50, p95) in results.items():
+        print(f"  {name:12} p50={p50:7.2f} ms  p95={p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
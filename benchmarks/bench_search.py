@@ -0,0 +1,72 @@
+"""Time ranked FTS5 menu search against the old LIKE scan on a large catalog.
+
+    python benchmarks/bench_search.py --items 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrations
+import search
+
+WORDS = ["biryani", "pizza", "burger", "coffee", "paneer", "chicken", "mutton", "veg",
+         "cheese", "masala", "tikka", "garlic", "mango", "lime", "spring", "roll",
+         "shake", "butter", "tandoori", "noodles", "fried", "rice", "soup", "dosa"]
+CATEGORIES = ["Biryani", "Pizza", "Burger", "Coffee", "Snacks", "Beverages", "Chinese", "South Indian"]
+QUERIES = ["biry", "chicken tik", "pa", "garlic bread", "mango sha", "dosa", "xyz"]
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return round(timings[len(timings) // 2] * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+        try:
+            run(conn, args)
+        finally:
+            conn.close()
+
+
+def run(conn, args):
+    rng = random.Random(1)
+    started = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO menu (item_name, category, price) VALUES (?,?,?)",
+        ((" ".join(rng.sample(WORDS, 3)).title() + f" #{i}", rng.choice(CATEGORIES), rng.randint(40, 500))
+         for i in range(args.items))
+    )
+    conn.commit()
+    print(f"indexed {args.items} items in {time.perf_counter() - started:.2f}s")
+
+    for q in QUERIES:
+        like = timed(lambda: conn.execute(
+            "SELECT * FROM menu WHERE item_name LIKE ? OR category LIKE ?",
+            (f"%{q}%", f"%{q}%")).fetchall(), args.repeat)
+        fts = timed(lambda: search.search(conn, q, kinds=("menu",)), args.repeat)
+        sug = timed(lambda: search.suggest(conn, q), args.repeat)
+        print(f"{q!r:16} LIKE {like:8.3f} ms   FTS top-{search.MAX_RESULTS} {fts:8.3f} ms   suggest {sug:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Latency of supplier marketplace search on a seeded listings table.
+
+Builds a database through the real migrations (indexes, FTS and triggers
+included), seeds --listings rows and reports p50/p95 per query shape.
+
+    python benchmarks/bench_supplier_search.py --listings 500000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrations
+import supplier_search
+
+PRODUCE = {
+    # item: (category, typical price per kg)
+    "Tomato": ("Vegetables", 28), "Onion": ("Vegetables", 35), "Potato": ("Vegetables", 25),
+    "Green Chilli": ("Vegetables", 60), "Carrot": ("Vegetables", 45), "Cabbage": ("Vegetables", 20),
+    "Cauliflower": ("Vegetables", 40), "Spinach": ("Vegetables", 30), "Brinjal": ("Vegetables", 32),
+    "Okra": ("Vegetables", 50), "Capsicum": ("Vegetables", 70), "Ginger": ("Vegetables", 120),
+    "Garlic": ("Vegetables", 150), "Coriander": ("Vegetables", 80), "Banana": ("Fruits", 40),
+    "Mango": ("Fruits", 90), "Apple": ("Fruits", 140), "Papaya": ("Fruits", 35),
+    "Lemon": ("Fruits", 60), "Pomegranate": ("Fruits", 160), "Basmati Rice": ("Grains", 110),
+    "Sona Masoori Rice": ("Grains", 60), "Wheat Flour": ("Grains", 38), "Toor Dal": ("Pulses", 130),
+    "Chana Dal": ("Pulses", 90), "Moong Dal": ("Pulses", 115), "Paneer": ("Dairy", 380),
+    "Milk": ("Dairy", 56), "Curd": ("Dairy", 70), "Chicken": ("Meat", 220), "Mutton": ("Meat", 750),
+    "Sunflower Oil": ("Oils", 150), "Groundnut Oil": ("Oils", 190),
+}
+VARIETIES = ["", "Fresh", "Organic", "Grade A", "Premium", "Local", "Hybrid", "Desi"]
+CITIES = ["Hyderabad", "Secunderabad", "Warangal", "Vijayawada", "Guntur", "Bengaluru", "Chennai",
+          "Pune", "Mumbai", "Nagpur", "Nashik", "Kolkata", "Delhi", "Jaipur", "Indore", "Bhopal",
+          "Lucknow", "Kochi", "Madurai", "Mysuru", "Visakhapatnam", "Nellore", "Kurnool", "Karimnagar"]
+AREAS = ["", "Market Yard", "Old City", "North", "South", "Wholesale Mandi", "Industrial Area", "Rythu Bazar"]
+
+QUERIES = {
+    # name: filter overrides (callables get the rng)
+    "tomato <30/kg near hyderabad >=100kg": lambda r: dict(
+        q="tomato", location="hyderabad", max_price=30, min_quantity=100, sort="price_asc"),
+    "item prefix, cheapest first": lambda r: dict(q=r.choice(list(PRODUCE))[:4].lower(), sort="price_asc"),
+    "location prefix, newest": lambda r: dict(location=r.choice(CITIES)[:5].lower()),
+    "category + price range, cheapest": lambda r: dict(
+        category=r.choice(["Vegetables", "Fruits", "Pulses"]), min_price=20, max_price=60, sort="price_asc"),
+    "price range only, newest": lambda r: dict(min_price=r.randint(10, 100), max_price=r.randint(110, 200)),
+    "category + price range, newest": lambda r: dict(category="Vegetables", min_price=20, max_price=60),
+    "min quantity + price, cheapest": lambda r: dict(min_quantity=500, max_price=r.randint(30, 90), sort="price_asc"),
+    "narrow price band, newest": lambda r: dict(min_price=400, max_price=410),
+    "min quantity, largest first": lambda r: dict(min_quantity=r.randint(100, 900), sort="quantity_desc"),
+    "item + location, highest price": lambda r: dict(
+        q=r.choice(list(PRODUCE)).split()[0].lower(), location=r.choice(CITIES).lower(), sort="price_desc"),
+    "no filters, newest": lambda r: dict(),
+    "page 5 of category, cheapest": None,  # keyset pages, handled below
+}
+
+
+def filters(**overrides):
+    f = {"q": "", "category": None, "min_price": None, "max_price": None, "min_quantity": None,
+         "location": "", "sort": "newest", "after": None, "after_id": None,
+         "limit": supplier_search.DEFAULT_LIMIT}
+    f.update(overrides)
+    return f
+
+
+def seed(conn, listings, suppliers, rng):
+    with db.write_transaction(conn, "seed_suppliers"):
+        conn.executemany(
+            "INSERT INTO users (name, email, password) VALUES (?, ?, 'x')",
+            [(f"Supplier {i}", f"supplier{i}@example.com") for i in range(suppliers)]
+        )
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    names = list(PRODUCE)
+    start = time.time() - 365 * 86400
+
+    def rows():
+        for _ in range(listings):
+            name = rng.choice(names)
+            category, price = PRODUCE[name]
+            variety = rng.choice(VARIETIES)
+            area = rng.choice(AREAS)
+            created = start + rng.random() * 365 * 86400
+            yield (
+                rng.choice(user_ids),
+                f"{variety} {name}".strip(),
+                category,
+                round(price * rng.uniform(0.6, 1.6), 2),
+                rng.choice([5, 10, 25, 50, 100, 200, 500, 1000]) + rng.randint(0, 50),
+                f"{rng.choice(CITIES)} {area}".strip(),
+                f"98{rng.randint(10000000, 99999999)}",
+                time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(created)),
+            )
+
+    with db.write_transaction(conn, "seed"):
+        conn.executemany("""
+            INSERT INTO supplier_items
+            (user_id, item_name, category, price_per_kg, quantity, location, contact, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows())
+    conn.execute("ANALYZE")
+
+
+def percentile(timings, p):
+    return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=500_000)
+    parser.add_argument("--suppliers", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    rng = random.Random(15)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        migrations.migrate(path, echo=lambda *a: None)
+        conn = db.connect(path)
+
+        started = time.perf_counter()
+        seed(conn, args.listings, args.suppliers, rng)
+        print(f"seeded {args.listings} listings in {time.perf_counter() - started:.1f}s")
+
+        all_timings = []
+        print(f"{'query':40} {'p50 ms':>8} {'p95 ms':>8} {'rows':>6}")
+        for name, make in QUERIES.items():
+            timings = []
+            rows = 0
+            for _ in range(args.repeat):
+                if make is None:
+                    f = filters(category=rng.choice(["Vegetables", "Grains"]), sort="price_asc")
+                    for _ in range(4):
+                        _, cursor = supplier_search.search_listings(conn, f)
+                        f.update(cursor)
+                else:
+                    f = filters(**make(rng))
+                t0 = time.perf_counter()
+                result, _ = supplier_search.search_listings(conn, f)
+                timings.append(time.perf_counter() - t0)
+                rows += len(result)
+            timings.sort()
+            all_timings += timings
+            print(f"{name:40} {percentile(timings, 0.5):8.2f} {percentile(timings, 0.95):8.2f} "
+                  f"{rows // args.repeat:6}")
+
+        all_timings.sort()
+        p95 = percentile(all_timings, 0.95)
+        print(f"overall p95 {p95:.2f} ms (target {args.target_ms:.0f} ms): "
+              f"{'OK' if p95 < args.target_ms else 'OVER'}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
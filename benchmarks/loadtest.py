@@ -0,0 +1,547 @@
+"""Load test of the ordering flow against a synthetic database.
+
+Every virtual user logs in once, then repeats
+
+    menu -> add_to_cart (x items) -> checkout -> orders -> my_groups
+
+and each step's latency is recorded. Results (throughput and p50/p95/p99
+per step) are printed and saved as JSON so runs on different commits can
+be compared.
+
+    # a restaurant.db-shaped database with realistic volumes
+    python benchmarks/loadtest.py generate /tmp/bench.db --users 2000 --orders 50000
+
+    # in-process through the Flask test client (view + SQL cost only)
+    python benchmarks/loadtest.py run /tmp/bench.db --driver client --users 20
+
+    # over HTTP: starts a local server, then 4 load processes x 8 users each
+    python benchmarks/loadtest.py run /tmp/bench.db --driver http --processes 4 --concurrency 8 \\
+        --out results/$(git rev-parse --short HEAD).json
+
+    python benchmarks/loadtest.py compare results/old.json results/new.json
+
+Each run works on a copy of the generated database, so repeated runs start
+from the same data.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STEPS = ("login", "menu", "add_to_cart", "checkout", "orders", "my_groups")
+PASSWORD = "bench-password"
+CATEGORIES = ("Biryani", "Pizza", "Burger", "Drinks", "Desserts", "Starters", "Rolls", "Thali")
+LOCATIONS = ("Hyderabad", "Bengaluru", "Chennai", "Pune", "Mumbai", "Delhi", "Kolkata")
+PRODUCE = ("Tomato", "Onion", "Potato", "Rice", "Paneer", "Chicken", "Flour", "Milk", "Chilli", "Garlic")
+# Login is rate limited per IP and every load generator shares 127.0.0.1
+BENCH_RATE_LIMITS = {"ip": (10 ** 9, 10 ** 9), "email": (10 ** 9, 10 ** 9)}
+
+# ---------------- DATA ----------------
+
+def user_email(i):
+    return f"user{i}@bench.local"
+
+
+def generate(path, users, menu_items, orders, groups, offers, listings, days, seed, hash_method):
+    """Write a migrated database with synthetic users, menu, orders, groups, offers and listings."""
+    import db
+    import group_formation
+    import migrations
+    import rollups
+    import search
+    from werkzeug.security import generate_password_hash
+
+    if os.path.exists(path):
+        raise SystemExit(f"{path} already exists")
+    rng = random.Random(seed)
+    migrations.migrate(path, echo=lambda *a: None)
+    conn = db.connect(path)
+    # One hash for everyone: hashing per user would dominate generation time
+    password = generate_password_hash(PASSWORD, hash_method)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    with db.write_transaction(conn, "generate"):
+        conn.executemany(
+            "INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+            ((f"User {i}", user_email(i), password) for i in range(users))
+        )
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE email LIKE '%@bench.local'")]
+
+        conn.executemany(
+            "INSERT INTO menu (item_name, category, price) VALUES (?, ?, ?)",
+            ((f"{CATEGORIES[i % len(CATEGORIES)]} Special {i}", CATEGORIES[i % len(CATEGORIES)],
+              rng.randrange(60, 600, 10)) for i in range(menu_items))
+        )
+        menu = conn.execute("SELECT id, item_name, price FROM menu").fetchall()
+        # Skewed popularity, as on a real menu
+        weights = [1 / (rank + 1) for rank in range(len(menu))]
+
+        start = now - timedelta(days=days)
+        order_rows = []
+        item_rows = []
+        for order_id in range(1, orders + 1):
+            created = start + timedelta(seconds=rng.randrange(days * 86400))
+            order_rows.append((order_id, rng.choice(user_ids), created.strftime("%Y-%m-%d %H:%M:%S")))
+            for item in {row["id"]: row for row in rng.choices(menu, weights, k=rng.randint(1, 4))}.values():
+                item_rows.append((order_id, item["id"], item["item_name"], item["price"], rng.randint(1, 3)))
+        conn.executemany("INSERT INTO orders (id, user_id, created_at) VALUES (?, ?, ?)", order_rows)
+        conn.executemany("""
+            INSERT INTO order_items (order_id, menu_id, item_name, unit_price, quantity)
+            VALUES (?, ?, ?, ?, ?)
+        """, item_rows)
+
+        group_formation.backfill_buyers(conn)
+        popular = [row[0] for row in conn.execute(
+            "SELECT item_name FROM item_buyer_counts WHERE buyer_count >= ? ORDER BY buyer_count DESC LIMIT ?",
+            (group_formation.GROUP_MIN_BUYERS, groups)
+        )]
+        for item_name in popular:
+            group_id = conn.execute(
+                "INSERT INTO groups (group_name) VALUES (?)", (group_formation.group_name_for(item_name),)
+            ).lastrowid
+            conn.execute("""
+                INSERT OR IGNORE INTO group_members (group_id, user_id)
+                SELECT ?, user_id FROM item_buyers WHERE item_name = ?
+            """, (group_id, item_name))
+        group_ids = [row[0] for row in conn.execute("SELECT id FROM groups")]
+
+        offer_rows = []
+        for i in range(offers if group_ids else 0):
+            expires = now + timedelta(hours=rng.randint(1, 24 * 14))
+            offer_rows.append((rng.choice(group_ids), f"Offer {i}", "Limited time combo", rng.randrange(50, 400, 10),
+                               expires.strftime("%Y-%m-%d %H:%M"), int(expires.timestamp()), rng.randint(10, 200)))
+        conn.executemany("""
+            INSERT INTO offers (group_id, title, description, price, expiry_datetime, expiry_ts, max_claims)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, offer_rows)
+
+        conn.executemany("""
+            INSERT INTO supplier_items (user_id, item_name, category, price_per_kg, quantity, location, contact,
+                                        created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            (rng.choice(user_ids), f"{rng.choice(PRODUCE)} grade {rng.randint(1, 3)}", "Produce",
+             round(rng.uniform(10, 500), 2), rng.randint(1, 1000), rng.choice(LOCATIONS),
+             f"98{rng.randrange(10 ** 8):08d}",
+             (now - timedelta(seconds=rng.randrange(days * 86400))).strftime("%Y-%m-%d %H:%M:%S"))
+            for _ in range(listings)
+        ))
+
+        conn.executemany(
+            "INSERT INTO specials (item_name, category, price) VALUES (?, ?, ?)",
+            [(row["item_name"], "Special", row["price"]) for row in menu[:5]]
+        )
+        search.rebuild(conn)
+        rollups.backfill(conn)
+
+    conn.execute("ANALYZE")
+    conn.close()
+    return dataset_summary(path)
+
+
+def dataset_summary(path):
+    import db
+
+    conn = db.connect(path, read_only=True)
+    try:
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("users", "menu", "orders", "order_items", "groups", "group_members",
+                          "offers", "supplier_items")
+        }
+    finally:
+        conn.close()
+
+
+def stored_hash_method(path):
+    """The method the generated users' passwords were hashed with, so the app does not rehash them."""
+    import db
+
+    conn = db.connect(path, read_only=True)
+    try:
+        row = conn.execute("SELECT password FROM users WHERE email = ?", (user_email(0),)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise SystemExit(f"{path} was not made by `loadtest.py generate`")
+    return row[0].split("$", 1)[0]
+
+# ---------------- VIRTUAL USERS ----------------
+
+def user_flow(request, user, menu_ids, iterations, items_per_cart, rng, record):
+    """Log in once, then run the ordering flow `iterations` times.
+
+    request(method, path, form) -> status; record(step, seconds, ok).
+    """
+    def step(name, method, path, form=None, expect=None):
+        started = time.perf_counter()
+        try:
+            status = request(method, path, form)
+        except Exception:
+            status = None
+        ok = status in expect if expect else status is not None and status < 400
+        record(name, time.perf_counter() - started, ok)
+        return ok
+
+    # A successful login redirects; bad credentials answer 200
+    if not step("login", "POST", "/login", {"email": user_email(user), "password": PASSWORD}, expect=(302,)):
+        return
+    for _ in range(iterations):
+        step("menu", "GET", "/menu")
+        for item_id in rng.sample(menu_ids, min(items_per_cart, len(menu_ids))):
+            step("add_to_cart", "POST", "/add_to_cart", {"item_id": item_id, "quantity": rng.randint(1, 3)})
+        step("checkout", "POST", "/checkout", {"payment_method": "upi"})
+        step("orders", "GET", "/orders")
+        step("my_groups", "GET", "/my_groups")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in STEPS}
+        self.errors = {name: 0 for name in STEPS}
+        self._lock = threading.Lock()
+
+    def __call__(self, step, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies[step].append(seconds)
+            else:
+                self.errors[step] += 1
+
+    def merge(self, other):
+        for name in STEPS:
+            self.latencies[name] += other["latencies"][name]
+            self.errors[name] += other["errors"][name]
+
+    def dump(self):
+        return {"latencies": self.latencies, "errors": self.errors}
+
+
+def _menu_ids(path, limit=200):
+    import db
+
+    conn = db.connect(path, read_only=True)
+    try:
+        return [row[0] for row in conn.execute("SELECT id FROM menu ORDER BY id LIMIT ?", (limit,))]
+    finally:
+        conn.close()
+
+# ---------------- DRIVERS ----------------
+
+def bench_app():
+    """The app configured for load testing; also the gunicorn entry point (`loadtest:bench_app()`)."""
+    import jobs
+    from app import app
+
+    app.template_folder = ROOT  # templates sit next to app.py in this checkout
+    app.config["LOGIN_RATE_LIMITS"] = BENCH_RATE_LIMITS
+    if os.environ.get("LOADTEST_WORKER") == "1":
+        # Group formation is queued by checkout; keep the queue drained
+        jobs.start_thread(app.config["DATABASE"], poll_interval=0.2)
+    return app
+
+
+def run_client(path, users, iterations, items_per_cart, seed):
+    """Drive the app in this process through the Flask test client, one user after another."""
+    app = bench_app()
+    menu_ids = _menu_ids(path)
+    recorder = Recorder()
+    for user in range(users):
+        client = app.test_client()
+        # A distinct address per user, as real clients would have
+        environ = {"REMOTE_ADDR": f"10.{user // 65536 % 256}.{user // 256 % 256}.{user % 256}"}
+
+        def request(method, url, form):
+            return client.open(url, method=method, data=form, environ_base=environ).status_code
+
+        user_flow(request, user, menu_ids, iterations, items_per_cart, random.Random(seed + user), recorder)
+    return recorder
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _http_worker(args):
+    base_url, users, menu_ids, iterations, items_per_cart, seed, start_at = args
+    recorder = Recorder()
+
+    def run_user(user):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+        def request(method, path, form):
+            data = urllib.parse.urlencode(form).encode() if form is not None else None
+            try:
+                with opener.open(urllib.request.Request(base_url + path, data=data, method=method),
+                                 timeout=60) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                e.read()
+                return e.code
+
+        user_flow(request, user, menu_ids, iterations, items_per_cart, random.Random(seed + user), recorder)
+
+    while time.time() < start_at:
+        time.sleep(0.005)
+    threads = [threading.Thread(target=run_user, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.dump()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("server exited during startup")
+        try:
+            urllib.request.urlopen(url + "/login", timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise SystemExit(f"server at {url} did not start")
+
+
+def start_server(kind, path, env, server_workers):
+    port = _free_port()
+    if kind == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "--chdir", ROOT, "--pythonpath", os.path.dirname(__file__),
+                   "-w", str(server_workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+                   "loadtest:bench_app()"]
+    else:
+        command = [sys.executable, os.path.abspath(__file__), "serve", path, "--port", str(port)]
+    # Own session, so stop_server also reaches the password hashing pool's processes
+    server = subprocess.Popen(command, env=env, start_new_session=True)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_for(url, server)
+    except BaseException:
+        stop_server(server)
+        raise
+    return server, url
+
+
+def stop_server(server):
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    server.wait()
+
+
+def run_http(url, path, processes, concurrency, iterations, items_per_cart, seed):
+    """Drive a running server from `processes` load processes with `concurrency` users each."""
+    menu_ids = _menu_ids(path)
+    users = list(range(processes * concurrency))
+    start_at = time.time() + 1.0
+    work = [(url, users[i::processes], menu_ids, iterations, items_per_cart, seed, start_at)
+            for i in range(processes)]
+    recorder = Recorder()
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.map(_http_worker, work):
+            recorder.merge(result)
+    return recorder
+
+# ---------------- REPORTING ----------------
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else None
+
+
+def summarize(recorder, elapsed):
+    steps = {}
+    for name in STEPS:
+        values = sorted(recorder.latencies[name])
+        steps[name] = {
+            "count": len(values),
+            "errors": recorder.errors[name],
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+            "p50_ms": round(percentile(values, 0.5), 2) if values else None,
+            "p95_ms": round(percentile(values, 0.95), 2) if values else None,
+            "p99_ms": round(percentile(values, 0.99), 2) if values else None,
+        }
+    return steps
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", ROOT, "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return out + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    print(f"{result['driver']} driver, {result['users']} users x {result['iterations']} flows, "
+          f"{result['elapsed_s']}s, {result['flows_per_s']} flows/s (commit {result['commit']})")
+    print(f"  {'step':12} {'count':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, s in result["steps"].items():
+        print(f"  {name:12} {s['count']:7} {s['errors']:5} {s['throughput_rps']:8} "
+              f"{s['p50_ms'] if s['p50_ms'] is not None else '-':>8} "
+              f"{s['p95_ms'] if s['p95_ms'] is not None else '-':>8} "
+              f"{s['p99_ms'] if s['p99_ms'] is not None else '-':>8}")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as fh:
+        old = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+    print(f"{old_path} ({old['commit']}) -> {new_path} ({new['commit']})")
+    print(f"  flows/s {old['flows_per_s']} -> {new['flows_per_s']}")
+    print(f"  {'step':12} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    for name in STEPS:
+        a, b = old["steps"].get(name), new["steps"].get(name)
+        if not a or not b:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if a[key] and b[key]:
+                cells.append(f"{a[key]:7.2f}->{b[key]:7.2f} {(b[key] - a[key]) / a[key] * 100:+4.0f}%")
+            else:
+                cells.append(f"{'-':>18}")
+        print(f"  {name:12} " + " ".join(f"{cell:>18}" for cell in cells))
+
+# ---------------- CLI ----------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="write a synthetic database")
+    gen.add_argument("path")
+    gen.add_argument("--users", type=int, default=2000)
+    gen.add_argument("--menu-items", type=int, default=200)
+    gen.add_argument("--orders", type=int, default=50000)
+    gen.add_argument("--groups", type=int, default=50)
+    gen.add_argument("--offers", type=int, default=200)
+    gen.add_argument("--listings", type=int, default=10000)
+    gen.add_argument("--days", type=int, default=90, help="spread order history over this many days")
+    gen.add_argument("--seed", type=int, default=24)
+    gen.add_argument("--hash-method", default="pbkdf2:sha256:1000",
+                     help="password hash for the synthetic users; the app's default (scrypt) makes "
+                          "login dominate every run")
+
+    run = commands.add_parser("run", help="run the ordering flow and report per-step latency")
+    run.add_argument("path", help="database from `generate`; a copy is used")
+    run.add_argument("--driver", choices=("client", "http"), default="client")
+    run.add_argument("--users", type=int, default=20, help="virtual users (client driver)")
+    run.add_argument("--processes", type=int, default=4, help="load processes (http driver)")
+    run.add_argument("--concurrency", type=int, default=8, help="users per load process (http driver)")
+    run.add_argument("--iterations", type=int, default=5, help="flows per user")
+    run.add_argument("--items-per-cart", type=int, default=3)
+    run.add_argument("--server", choices=("werkzeug", "gunicorn"), default="werkzeug",
+                     help="server the http driver starts")
+    run.add_argument("--server-workers", type=int, default=4, help="gunicorn workers")
+    run.add_argument("--url", help="use an already running server instead of starting one")
+    run.add_argument("--seed", type=int, default=24)
+    run.add_argument("--out", help="write the results as JSON")
+
+    serve = commands.add_parser("serve", help=argparse.SUPPRESS)
+    serve.add_argument("path")
+    serve.add_argument("--port", type=int, required=True)
+
+    cmp_ = commands.add_parser("compare", help="compare two result files")
+    cmp_.add_argument("old")
+    cmp_.add_argument("new")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        started = time.perf_counter()
+        summary = generate(args.path, args.users, args.menu_items, args.orders, args.groups, args.offers,
+                           args.listings, args.days, args.seed, args.hash_method)
+        print(f"generated {args.path} in {time.perf_counter() - started:.1f}s: {summary}")
+        return
+
+    if args.command == "compare":
+        compare(args.old, args.new)
+        return
+
+    if args.command == "serve":
+        from werkzeug.serving import run_simple
+        run_simple("127.0.0.1", args.port, bench_app(), threaded=True)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "loadtest.db")
+        if not args.url:
+            shutil.copy(args.path, path)
+        env = dict(os.environ, DATABASE=path, PASSWORD_HASH_METHOD=stored_hash_method(args.path),
+                   LOADTEST_WORKER="1")
+        os.environ.update(env)
+
+        server = None
+        started = time.perf_counter()
+        if args.driver == "client":
+            recorder = run_client(path, args.users, args.iterations, args.items_per_cart, args.seed)
+            users = args.users
+        else:
+            url = args.url
+            if not url:
+                server, url = start_server(args.server, path, env, args.server_workers)
+                started = time.perf_counter()
+            try:
+                recorder = run_http(url, args.path, args.processes, args.concurrency, args.iterations,
+                                    args.items_per_cart, args.seed)
+            finally:
+                if server:
+                    stop_server(server)
+            users = args.processes * args.concurrency
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "commit": git_revision(),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "driver": args.driver,
+            "server": None if args.driver == "client" else (args.url or args.server),
+            "users": users,
+            "iterations": args.iterations,
+            "items_per_cart": args.items_per_cart,
+            "dataset": dataset_summary(args.path),
+            "elapsed_s": round(elapsed, 2),
+            "flows_per_s": round(len(recorder.latencies["checkout"]) / elapsed, 1),
+            "steps": summarize(recorder, elapsed),
+        }
+
+    print_report(result)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from flask import current_app
+
+from db import get_db
+
+# ---------------- DATA VERSIONS ----------------
+
+# Every write to a cached table bumps its row in data_versions (see the
+# triggers created by migrations.py), so all workers notice the same change.
+
+def data_version(conn, name):
+    row = conn.execute("SELECT version FROM data_versions WHERE name=?", (name,)).fetchone()
+    return row[0] if row else 0
+
+# ---------------- VERSIONED CACHE ----------------
+
+class VersionedCache:
+    """Process-level value rebuilt whenever data_versions[name] changes.
+
+    The version is re-checked at most once per check_interval seconds, so
+    steady-state reads do not touch the database at all.
+    """
+
+    def __init__(self, name, load, check_interval=2.0):
+        self.name = name
+        self.load = load
+        self.check_interval = check_interval
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+
+    def _fresh(self, now):
+        return self._version is not None and now - self._checked_at < self.check_interval
+
+    def get(self, connection=get_db):
+        now = time.monotonic()
+        if self._fresh(now):
+            self.hits += 1
+            return self._value
+
+        with self._lock:
+            if self._fresh(now):
+                self.hits += 1
+                return self._value
+
+            conn = connection()
+            version = data_version(conn, self.name)
+            self.version_checks += 1
+            if version == self._version:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._value = self.load(conn, version)
+                self._version = version
+            self._checked_at = now
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._version = None
+            self._checked_at = 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version_checks": self.version_checks,
+            "version": self._version,
+        }
+
+# ---------------- FLASK INTEGRATION ----------------
+
+def register(app, cache):
+    app.extensions.setdefault("caches", {})[cache.name] = cache
+    return cache
+
+
+def get_cache(name):
+    return current_app.extensions["caches"][name]
+
+
+def all_stats():
+    return {name: cache.stats() for name, cache in current_app.extensions.get("caches", {}).items()}
@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from db import get_db
+
+DEFAULT_CART_TTL = 7 * 24 * 3600
+
+# ---------------- INTERFACE ----------------
+
+class CartStore:
+    """Server-side cart keyed by user_id.
+
+    Cart lines are dicts of {"name", "price", "quantity"} keyed by the same
+    keys the session cart used: the menu id, "offer_<id>" or "special_<id>".
+    Prices and quantities are stored as ints so totals never re-parse text.
+    """
+
+    def __init__(self, ttl=DEFAULT_CART_TTL):
+        self.ttl = ttl
+
+    def items(self, user_id):
+        raise NotImplementedError
+
+    def add(self, user_id, key, name, price, quantity):
+        raise NotImplementedError
+
+    def add_many(self, user_id, lines):
+        """Add (key, name, price, quantity) lines; subclasses do it in one write."""
+        for key, name, price, quantity in lines:
+            self.add(user_id, key, name, price, quantity)
+
+    def remove(self, user_id, key):
+        raise NotImplementedError
+
+    def clear(self, user_id):
+        raise NotImplementedError
+
+    def clear_in_transaction(self, conn, user_id):
+        """Empty the cart as part of the caller's open transaction on conn.
+
+        Stores outside the database cannot join it and clear right away.
+        """
+        self.clear(user_id)
+
+    def total(self, user_id):
+        return sum(item["price"] * item["quantity"] for item in self.items(user_id).values())
+
+# ---------------- IN-PROCESS LRU ----------------
+
+class MemoryCartStore(CartStore):
+    """LRU of carts held in this process. Only suitable for a single worker."""
+
+    def __init__(self, ttl=DEFAULT_CART_TTL, max_carts=10000):
+        super().__init__(ttl)
+        self.max_carts = max_carts
+        self._carts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, user_id):
+        entry = self._carts.get(user_id)
+        if entry is None:
+            return None
+        touched, cart = entry
+        if touched + self.ttl < time.time():
+            del self._carts[user_id]
+            return None
+        self._carts.move_to_end(user_id)
+        return cart
+
+    def _touch(self, user_id, cart):
+        self._carts[user_id] = (time.time(), cart)
+        self._carts.move_to_end(user_id)
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+
+    def items(self, user_id):
+        with self._lock:
+            cart = self._get(user_id) or {}
+            return {key: dict(item) for key, item in cart.items()}
+
+    def add(self, user_id, key, name, price, quantity):
+        self.add_many(user_id, [(key, name, price, quantity)])
+
+    def add_many(self, user_id, lines):
+        with self._lock:
+            cart = self._get(user_id) or {}
+            for key, name, price, quantity in lines:
+                if key in cart:
+                    cart[key]["quantity"] += int(quantity)
+                else:
+                    cart[key] = {"name": name, "price": int(price), "quantity": int(quantity)}
+            self._touch(user_id, cart)
+
+    def remove(self, user_id, key):
+        with self._lock:
+            cart = self._get(user_id)
+            if cart and key in cart:
+                cart.pop(key)
+                self._touch(user_id, cart)
+
+    def clear(self, user_id):
+        with self._lock:
+            self._carts.pop(user_id, None)
+
+# ---------------- SQLITE ----------------
+
+class SQLiteCartStore(CartStore):
+    """Carts stored in restaurant.db so every gunicorn worker sees the same cart."""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, ttl=DEFAULT_CART_TTL, connection=get_db):
+        super().__init__(ttl)
+        self.connection = connection
+        self._writes = 0
+
+    def _live_since(self):
+        return int(time.time()) - self.ttl
+
+    def items(self, user_id):
+        rows = self.connection().execute("""
+            SELECT ci.item_key, ci.name, ci.price, ci.quantity
+            FROM carts c
+            JOIN cart_items ci ON ci.user_id = c.user_id
+            WHERE c.user_id = ? AND c.updated_at >= ?
+            ORDER BY ci.added_at, ci.item_key
+        """, (user_id, self._live_since())).fetchall()
+        return {
+            row["item_key"]: {"name": row["name"], "price": row["price"], "quantity": row["quantity"]}
+            for row in rows
+        }
+
+    def total(self, user_id):
+        row = self.connection().execute("""
+            SELECT COALESCE(SUM(ci.price * ci.quantity), 0)
+            FROM carts c
+            JOIN cart_items ci ON ci.user_id = c.user_id
+            WHERE c.user_id = ? AND c.updated_at >= ?
+        """, (user_id, self._live_since())).fetchone()
+        return row[0]
+
+    def _touch(self, conn, user_id):
+        now = int(time.time())
+        # An expired cart is emptied before it is reused.
+        conn.execute(
+            "DELETE FROM cart_items WHERE user_id = ? AND user_id IN "
+            "(SELECT user_id FROM carts WHERE user_id = ? AND updated_at < ?)",
+            (user_id, user_id, self._live_since())
+        )
+        conn.execute("""
+            INSERT INTO carts (user_id, updated_at) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET updated_at = excluded.updated_at
+        """, (user_id, now))
+        return now
+
+    def _written(self, conn):
+        conn.commit()
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def add(self, user_id, key, name, price, quantity):
+        self.add_many(user_id, [(key, name, price, quantity)])
+
+    def add_many(self, user_id, lines):
+        conn = self.connection()
+        now = self._touch(conn, user_id)
+        conn.executemany("""
+            INSERT INTO cart_items (user_id, item_key, name, price, quantity, added_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, item_key) DO UPDATE SET quantity = quantity + excluded.quantity
+        """, [(user_id, key, name, int(price), int(quantity), now) for key, name, price, quantity in lines])
+        self._written(conn)
+
+    def remove(self, user_id, key):
+        conn = self.connection()
+        conn.execute("DELETE FROM cart_items WHERE user_id = ? AND item_key = ?", (user_id, key))
+        self._touch(conn, user_id)
+        self._written(conn)
+
+    def clear(self, user_id):
+        conn = self.connection()
+        conn.execute("DELETE FROM cart_items WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM carts WHERE user_id = ?", (user_id,))
+        self._written(conn)
+
+    def clear_in_transaction(self, conn, user_id):
+        conn.execute("DELETE FROM cart_items WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM carts WHERE user_id = ?", (user_id,))
+
+    def purge_expired(self):
+        conn = self.connection()
+        cutoff = self._live_since()
+        conn.execute(
+            "DELETE FROM cart_items WHERE user_id IN (SELECT user_id FROM carts WHERE updated_at < ?)",
+            (cutoff,)
+        )
+        conn.execute("DELETE FROM carts WHERE updated_at < ?", (cutoff,))
+        conn.commit()
+
+# ---------------- FLASK INTEGRATION ----------------
+
+CART_BACKENDS = {
+    "memory": MemoryCartStore,
+    "sqlite": SQLiteCartStore,
+}
+
+
+def init_app(app):
+    app.config.setdefault("CART_BACKEND", "sqlite")
+    app.config.setdefault("CART_TTL", DEFAULT_CART_TTL)
+    backend = app.config["CART_BACKEND"]
+    if backend not in CART_BACKENDS:
+        raise ValueError(f"Unknown CART_BACKEND {backend!r}")
+    app.extensions["cart_store"] = CART_BACKENDS[backend](ttl=app.config["CART_TTL"])
+
+
+def get_cart_store():
+    return current_app.extensions["cart_store"]
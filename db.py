@@ -0,0 +1,252 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+
+# ---------------- PRAGMAS ----------------
+
+# journal_mode=WAL lets readers keep going while checkout holds the write
+# lock. It is persistent, so it only needs to be set once per database file.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+
+def connect(database, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS, read_only=False, factory=sqlite3.Connection):
+    if read_only:
+        conn = sqlite3.connect(
+            f"file:{database}?mode=ro",
+            uri=True,
+            timeout=busy_timeout_ms / 1000,
+            check_same_thread=False,
+            factory=factory,
+        )
+    else:
+        conn = sqlite3.connect(
+            database,
+            timeout=busy_timeout_ms / 1000,
+            check_same_thread=False,
+            factory=factory,
+        )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    if not read_only:
+        conn.execute("PRAGMA journal_mode = WAL")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# ---------------- CONNECTION POOL ----------------
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections owned by one worker process."""
+
+    def __init__(self, database, max_size=8, timeout=10.0,
+                 busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS, read_only=False, factory=sqlite3.Connection):
+        self.database = database
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.read_only = read_only
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+                self.misses += 1
+
+        if can_create:
+            try:
+                return connect(self.database, self.busy_timeout_ms, self.read_only, self.factory)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool exhausted: block until another request hands a connection back.
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a database connection")
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.hits += 1
+            self.waits += 1
+            self.wait_time += waited
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "database": self.database,
+                "max_size": self.max_size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "wait_time_ms": round(self.wait_time * 1000, 3),
+            }
+
+# ---------------- WRITE TRANSACTIONS ----------------
+
+_lock_hooks = []
+_lock_stats = {}
+_lock_stats_lock = threading.Lock()
+
+
+def add_lock_timing_hook(hook):
+    """Register hook(name, wait_seconds, held_seconds) for write transactions."""
+    _lock_hooks.append(hook)
+
+
+def _record_lock_timing(name, wait, held):
+    with _lock_stats_lock:
+        stats = _lock_stats.setdefault(name, {
+            "count": 0, "wait_ms": 0.0, "held_ms": 0.0, "max_held_ms": 0.0,
+        })
+        stats["count"] += 1
+        stats["wait_ms"] += wait * 1000
+        stats["held_ms"] += held * 1000
+        stats["max_held_ms"] = max(stats["max_held_ms"], held * 1000)
+
+
+add_lock_timing_hook(_record_lock_timing)
+
+
+def lock_stats():
+    with _lock_stats_lock:
+        return {
+            name: {
+                "count": s["count"],
+                "avg_wait_ms": round(s["wait_ms"] / s["count"], 3),
+                "avg_held_ms": round(s["held_ms"] / s["count"], 3),
+                "max_held_ms": round(s["max_held_ms"], 3),
+            }
+            for name, s in _lock_stats.items()
+        }
+
+
+@contextmanager
+def write_transaction(conn, name="write"):
+    """Run the block under BEGIN IMMEDIATE and time how long the lock is held.
+
+    Taking the write lock up front means a busy database fails fast on
+    BEGIN (retried by busy_timeout) instead of midway through the block.
+    The caller must have committed or rolled back any earlier writes.
+    """
+    if conn.in_transaction:
+        raise RuntimeError(f"write_transaction({name!r}) started inside an open transaction")
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    acquired = time.perf_counter()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        held = time.perf_counter() - acquired
+        for hook in _lock_hooks:
+            hook(name, acquired - started, held)
+
+# ---------------- FLASK INTEGRATION ----------------
+
+# async_serving.py sets this in the WSGI environ of the browse requests it
+# runs on its reader threads; they get a read-only connection.
+READ_ONLY_ENVIRON_KEY = "restaurant.db_read_only"
+
+
+def _get_pool(app, key, max_size, read_only):
+    pool = app.extensions.get(key)
+    # Gunicorn forks workers after the app module is imported, so a pool
+    # inherited from the master must never be reused by a child.
+    if pool is None or pool.pid != os.getpid():
+        pool = ConnectionPool(
+            app.config["DATABASE"],
+            max_size=max_size,
+            timeout=app.config.get("DB_POOL_TIMEOUT", 10.0),
+            busy_timeout_ms=app.config.get("DB_BUSY_TIMEOUT_MS", DEFAULT_BUSY_TIMEOUT_MS),
+            read_only=read_only,
+            # metrics.py swaps in a connection class that times queries
+            factory=app.extensions.get("db_connection_factory", sqlite3.Connection),
+        )
+        app.extensions[key] = pool
+    return pool
+
+
+def get_pool(app=None):
+    app = app or current_app
+    return _get_pool(app, "db_pool", app.config.get("DB_POOL_SIZE", 8), read_only=False)
+
+
+def get_read_pool(app=None):
+    """Read-only connections for browse requests in the async serving mode."""
+    app = app or current_app
+    return _get_pool(app, "db_read_pool", app.config.get("DB_READ_POOL_SIZE", 8), read_only=True)
+
+
+def get_db():
+    if "db" not in g:
+        if has_request_context() and request.environ.get(READ_ONLY_ENVIRON_KEY):
+            g.db_read_only = True
+            g.db = get_read_pool().acquire()
+        else:
+            g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        pool = get_read_pool() if g.pop("db_read_only", False) else get_pool()
+        pool.release(conn)
+
+
+def init_app(app):
+    app.config.setdefault("DATABASE", "restaurant.db")
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,329 @@
+import calendar
+import csv
+import io
+import json
+import struct
+import sys
+from array import array
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import db
+
+# ---------------- DATASETS ----------------
+
+# dataset: [(column, type, SQL expression)]. "ts" columns are text in CSV
+# and epoch seconds (int64) in the columnar format.
+DATASETS = {
+    "orders": [
+        ("order_id", "int", "o.id"),
+        ("user_id", "int", "o.user_id"),
+        ("created_at", "ts", "o.created_at"),
+    ],
+    "order_items": [
+        ("line_id", "int", "oi.id"),
+        ("order_id", "int", "oi.order_id"),
+        ("user_id", "int", "o.user_id"),
+        ("created_at", "ts", "o.created_at"),
+        ("menu_id", "int", "oi.menu_id"),
+        ("item_name", "str", "oi.item_name"),
+        ("unit_price", "int", "oi.unit_price"),
+        ("quantity", "int", "oi.quantity"),
+    ],
+    "offers": [
+        ("offer_id", "int", "o.id"),
+        ("group_id", "int", "o.group_id"),
+        ("title", "str", "o.title"),
+        ("price", "int", "o.price"),
+        ("expires_at", "ts", "o.expiry_datetime"),
+        ("claimed_count", "int", "o.claimed_count"),
+        ("max_claims", "int", "o.max_claims"),
+    ],
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+# Orders fetched per page when exporting line items; each page's items are
+# read with one IN (...) lookup on idx_order_items_order.
+ORDERS_PER_ITEM_PAGE = 500
+
+FORMATS = ("csv", "columnar")
+MIMETYPES = {"csv": "text/csv", "columnar": "application/octet-stream"}
+EXTENSIONS = {"csv": "csv", "columnar": "rcol"}
+
+
+def date_bounds(start=None, end=None):
+    """Inclusive YYYY-MM-DD dates to [start, end) timestamp strings; raises ValueError."""
+    low = date.fromisoformat(start).isoformat() if start else "0000-01-01"
+    high = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else "9999-12-31"
+    return low, high
+
+
+def _epoch(day):
+    return calendar.timegm(date.fromisoformat(day).timetuple())
+
+
+def _select(dataset, columnar):
+    exprs = []
+    for name, kind, expr in DATASETS[dataset]:
+        if kind == "ts" and columnar:
+            expr = f"CAST(strftime('%s', {expr}) AS INTEGER)"
+        exprs.append(f"{expr} AS {name}")
+    return ", ".join(exprs)
+
+# ---------------- READING ----------------
+
+# Every page is its own short statement on a read-only connection: nothing
+# holds a read snapshot for the whole export, so WAL checkpoints keep up and
+# writers in other workers are never waiting on it. Rows written while an
+# export runs may or may not be included.
+
+def _order_pages(conn, select, low, high, page_size):
+    # The plain >= bound on the last created_at is what SQLite seeks the
+    # index with; it does not use the row-value comparison for that.
+    last = (low, 0)
+    while True:
+        rows = conn.execute(f"""
+            SELECT {select}, o.created_at AS _created_at, o.id AS _id
+            FROM orders o
+            WHERE o.created_at >= ? AND o.created_at < ?
+            AND (o.created_at, o.id) > (?, ?)
+            ORDER BY o.created_at, o.id
+            LIMIT ?
+        """, (last[0], high) + last + (page_size,)).fetchall()
+        if not rows:
+            return
+        last = (rows[-1][-2], rows[-1][-1])
+        yield rows
+
+
+def iter_chunks(conn, dataset, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE, columnar=False):
+    """Yield lists of row tuples (in DATASETS column order) for a date range.
+
+    Orders and order items are selected by order date, offers by expiry.
+    """
+    low, high = date_bounds(start, end)
+    select = _select(dataset, columnar)
+    width = len(DATASETS[dataset])
+
+    if dataset == "orders":
+        for rows in _order_pages(conn, select, low, high, chunk_size):
+            yield [tuple(row)[:width] for row in rows]
+
+    elif dataset == "order_items":
+        for orders in _order_pages(conn, "o.id", low, high, ORDERS_PER_ITEM_PAGE):
+            ids = [row[-1] for row in orders]
+            rows = conn.execute(f"""
+                SELECT {select}
+                FROM order_items oi
+                JOIN orders o ON o.id = oi.order_id
+                WHERE oi.order_id IN ({','.join('?' * len(ids))})
+                ORDER BY o.created_at, o.id, oi.id
+            """, ids).fetchall()
+            if rows:
+                yield [tuple(row) for row in rows]
+
+    elif dataset == "offers":
+        low_ts = _epoch(start) if start else 0
+        high_ts = _epoch(end) + 86400 if end else 2 ** 62
+        last_id = 0
+        while True:
+            rows = conn.execute(f"""
+                SELECT {select}
+                FROM offers o
+                WHERE o.id > ? AND o.expiry_ts >= ? AND o.expiry_ts < ?
+                ORDER BY o.id
+                LIMIT ?
+            """, (last_id, low_ts, high_ts, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [tuple(row) for row in rows]
+
+    else:
+        raise ValueError(f"Unknown dataset {dataset!r}")
+
+# ---------------- CSV ----------------
+
+def csv_stream(chunks, dataset):
+    """Yield CSV text one chunk at a time."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _, _ in DATASETS[dataset]])
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+# ---------------- COLUMNAR ----------------
+
+# A stream of row groups, each holding every column of up to one chunk of
+# rows as contiguous little-endian arrays that numpy.frombuffer can wrap:
+#
+#   MAGIC
+#   repeated: <u4 header length> <JSON header> <buffers listed in the header>
+#   <u4 0>
+#
+# int/ts columns are int64 with an optional uint8 validity buffer when the
+# group has NULLs; str columns are int64 offsets (rows + 1) and UTF-8 data.
+
+MAGIC = b"RCOL\x01\n"
+
+
+def _int_buffers(values):
+    if None not in values:
+        return [array("q", values)], False
+    valid = array("B", (value is not None for value in values))
+    return [array("q", (0 if value is None else value for value in values)), valid], True
+
+
+def _str_buffers(values):
+    data = bytearray()
+    offsets = array("q", [0])
+    valid = array("B")
+    for value in values:
+        valid.append(value is not None)
+        if value is not None:
+            data += str(value).encode("utf-8")
+        offsets.append(len(data))
+    if all(valid):
+        return [offsets, data], False
+    return [offsets, data, valid], True
+
+
+def columnar_stream(chunks, dataset):
+    """Yield the columnar encoding of the rows one row group at a time."""
+    columns = DATASETS[dataset]
+    yield MAGIC
+    for rows in chunks:
+        header = {"rows": len(rows), "columns": []}
+        buffers = []
+        for index, (name, kind, _) in enumerate(columns):
+            values = [row[index] for row in rows]
+            if kind == "str":
+                column_buffers, nulls = _str_buffers(values)
+            else:
+                column_buffers, nulls = _int_buffers(values)
+            if sys.byteorder == "big":
+                for buf in column_buffers:
+                    if isinstance(buf, array):
+                        buf.byteswap()
+            header["columns"].append({
+                "name": name,
+                "type": kind,
+                "nulls": nulls,
+                "sizes": [memoryview(buf).nbytes for buf in column_buffers],
+            })
+            buffers += column_buffers
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+        yield struct.pack("<I", len(encoded)) + encoded
+        for buf in buffers:
+            yield memoryview(buf).tobytes()
+    yield struct.pack("<I", 0)
+
+
+def read_columnar(fh):
+    """Yield each row group of a columnar export as {column: numpy array}.
+
+    int/ts columns become int64 arrays (masked arrays when they hold NULLs);
+    str columns become object arrays. Requires NumPy.
+    """
+    import numpy as np
+
+    if fh.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a columnar export")
+    while True:
+        (length,) = struct.unpack("<I", fh.read(4))
+        if not length:
+            return
+        header = json.loads(fh.read(length))
+        group = {}
+        for column in header["columns"]:
+            raw = [fh.read(size) for size in column["sizes"]]
+            if column["type"] == "str":
+                offsets = np.frombuffer(raw[0], dtype="<i8")
+                data = raw[1]
+                values = np.array(
+                    [data[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])],
+                    dtype=object
+                )
+            else:
+                values = np.frombuffer(raw[0], dtype="<i8")
+            if column["nulls"]:
+                valid = np.frombuffer(raw[-1], dtype=np.uint8).astype(bool)
+                values = np.ma.masked_array(values, mask=~valid)
+            group[column["name"]] = values
+        yield group
+
+
+def load_columnar(path):
+    """Read a whole columnar export into one concatenated array per column."""
+    import numpy as np
+
+    with open(path, "rb") as fh:
+        groups = list(read_columnar(fh))
+    if not groups:
+        return {}
+    return {
+        name: (np.ma.concatenate if any(np.ma.isMaskedArray(g[name]) for g in groups) else np.concatenate)(
+            [g[name] for g in groups]
+        )
+        for name in groups[0]
+    }
+
+# ---------------- STREAMING ----------------
+
+def stream(database, dataset, fmt="csv", start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield an export as str (csv) or bytes (columnar) pieces.
+
+    Opens its own read-only connection so the export can outlive the request
+    that started it (a streamed Response body runs after the view returns).
+    """
+    conn = db.connect(database, read_only=True)
+    conn.row_factory = None  # plain tuples; sqlite3.Row costs ~25% here
+    try:
+        chunks = iter_chunks(conn, dataset, start, end, chunk_size, columnar=(fmt == "columnar"))
+        if fmt == "columnar":
+            yield from columnar_stream(chunks, dataset)
+        else:
+            yield from csv_stream(chunks, dataset)
+    finally:
+        conn.close()
+
+# ---------------- CLI ----------------
+
+@click.command("export")
+@click.argument("dataset", type=click.Choice(list(DATASETS)))
+@click.argument("path")
+@click.option("--start", help="First day (YYYY-MM-DD), inclusive.")
+@click.option("--end", help="Last day (YYYY-MM-DD), inclusive.")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def export_command(dataset, path, start, end, fmt, chunk_size):
+    """Stream orders, order_items or offers to a file ("-" for stdout)."""
+    try:
+        date_bounds(start, end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    pieces = stream(current_app.config["DATABASE"], dataset, fmt, start, end, chunk_size)
+    if fmt == "csv":
+        out = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    else:
+        out = sys.stdout.buffer if path == "-" else open(path, "wb")
+    try:
+        for piece in pieces:
+            out.write(piece)
+    finally:
+        if path != "-":
+            out.close()
+
+
+def init_app(app):
+    app.cli.add_command(export_command)
@@ -0,0 +1,353 @@
+import csv
+import json
+import sys
+import threading
+from datetime import date, datetime, timezone
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+
+import db
+import jobs
+from cache import data_version
+
+# ---------------- DEMAND FORECAST ----------------
+
+# Per-item daily quantities come from the daily_item_sales rollup (one row
+# per item per day, maintained at checkout), so loading a year of history is
+# a single range read rather than a scan of order_items.
+
+HISTORY_DAYS = 364  # 52 whole weeks, so every weekday is counted equally
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+PLAN_DAYS = 7
+TOP_SPECIALS = 5
+# Weekday indexes are shrunk toward 1.0 by this many weeks' worth of
+# average demand, so a couple of lucky Fridays do not make a Friday item.
+SEASON_PRIOR_WEEKS = 4.0
+
+
+def create_schema(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS recipe_ingredients(
+            item_name TEXT NOT NULL,
+            ingredient TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit TEXT,
+            PRIMARY KEY(item_name, ingredient)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_cache(
+            day TEXT PRIMARY KEY,
+            recipes_version INTEGER NOT NULL,
+            payload TEXT NOT NULL
+        )
+    """)
+
+
+def load_history(conn, end_day, days=HISTORY_DAYS):
+    """Return (item_names, start_day, quantities[items, days]) for the days before end_day."""
+    end = np.datetime64(end_day, "D")
+    start = end - days
+    cur = conn.cursor()
+    cur.row_factory = None  # plain tuples; sqlite3.Row doubles the load time
+    rows = cur.execute("""
+        SELECT item_name, day, quantity FROM daily_item_sales
+        WHERE day >= ? AND day < ?
+    """, (str(start), str(end_day))).fetchall()
+
+    # Dict lookups beat np.unique on an object array by a wide margin here
+    items = {}
+    day_offsets = {str(start + offset): offset for offset in range(days)}
+    cells = np.fromiter(
+        (items.setdefault(name, len(items)) * days + day_offsets[day] for name, day, _ in rows),
+        dtype=np.int64, count=len(rows)
+    )
+    history = np.zeros(len(items) * days)
+    # (day, item_name) is the rollup's primary key, so no cell is set twice
+    history[cells] = np.fromiter((quantity for _, _, quantity in rows), dtype=np.float64, count=len(rows))
+    return np.array(list(items), dtype=object), start, history.reshape(len(items), days)
+
+
+def moving_average(history, window):
+    """Trailing moving average along the day axis; column j averages days j-window+1..j."""
+    totals = np.cumsum(history, axis=1)
+    totals[:, window:] = totals[:, window:] - totals[:, :-window]
+    return totals[:, window - 1:] / window
+
+
+def weekday_index(history, start):
+    """Per-item demand on each weekday (Mon=0) relative to the item's mean, shape [items, 7]."""
+    days = history.shape[1]
+    weekdays = (np.arange(days) + (start.astype(np.int64) + 3)) % 7  # 1970-01-01 was a Thursday
+    onehot = np.zeros((days, 7))
+    onehot[np.arange(days), weekdays] = 1.0
+
+    per_weekday = history @ onehot           # [items, 7] totals
+    counts = onehot.sum(axis=0)              # days of each weekday in the window
+    mean = history.mean(axis=1, keepdims=True)
+    prior = SEASON_PRIOR_WEEKS * mean
+    index = (per_weekday + prior) / (counts * mean + prior)
+    return np.where(mean > 0, index, 1.0)
+
+
+def compute(conn, day):
+    """Forecast demand for `day` and the PLAN_DAYS starting on it, from history before it."""
+    names, start, history = load_history(conn, day)
+    result = {"day": day, "history_start": str(start), "items": [], "specials": [], "ingredients": []}
+    if not len(names):
+        return result
+
+    short = moving_average(history, SHORT_WINDOW)
+    long = moving_average(history, LONG_WINDOW)
+    # Whole-week windows average out the weekday pattern, which is then
+    # applied back per target day.
+    level = (short[:, -1] + long[:, -1]) / 2
+    trend = np.divide(short[:, -1], long[:, -1], out=np.ones_like(level), where=long[:, -1] > 0)
+
+    season = weekday_index(history, start)
+    target = np.datetime64(day, "D")
+    plan_weekdays = (np.arange(PLAN_DAYS) + (target.astype(np.int64) + 3)) % 7
+    today = level * season[:, plan_weekdays[0]]
+    week = level * season[:, plan_weekdays].sum(axis=1)
+
+    order = np.argsort(-today, kind="stable")
+    result["items"] = [
+        {
+            "item_name": names[i],
+            "forecast": round(float(today[i]), 1),
+            "week_forecast": round(float(week[i]), 1),
+            "weekday_lift": round(float(season[i, plan_weekdays[0]]), 2),
+            "trend": round(float(trend[i]), 2),
+        }
+        for i in order if today[i] > 0
+    ]
+
+    # A good special sells well today and sells better today than usual
+    score = today * np.clip(season[:, plan_weekdays[0]], 0, None)
+    candidates = [i for i in np.argsort(-score, kind="stable")
+                  if today[i] > 0 and season[i, plan_weekdays[0]] > 1.0 and not names[i].startswith("Offer")]
+    result["specials"] = [
+        {"item_name": names[i], "forecast": round(float(today[i]), 1),
+         "weekday_lift": round(float(season[i, plan_weekdays[0]]), 2)}
+        for i in candidates[:TOP_SPECIALS]
+    ]
+
+    result["ingredients"] = ingredient_plan(conn, names, week)
+    return result
+
+
+def ingredient_plan(conn, names, servings):
+    """Sum recipe quantities over forecast servings: one matrix product over all items."""
+    recipes = conn.execute("SELECT item_name, ingredient, quantity, unit FROM recipe_ingredients").fetchall()
+    if not recipes:
+        return []
+
+    position = {name: i for i, name in enumerate(names)}
+    recipes = [row for row in recipes if row[0] in position]
+    if not recipes:
+        return []
+    keys = sorted({(row[1], row[3] or "") for row in recipes})
+    column = {key: j for j, key in enumerate(keys)}
+    per_serving = np.zeros((len(names), len(keys)))
+    for item_name, ingredient, quantity, unit in recipes:
+        per_serving[position[item_name], column[(ingredient, unit or "")]] += quantity or 0
+
+    needed = servings @ per_serving
+    return [
+        {"ingredient": ingredient, "unit": unit, "quantity": round(float(needed[j]), 2)}
+        for j, (ingredient, unit) in sorted(enumerate(keys), key=lambda k: -needed[k[0]])
+        if needed[j] > 0
+    ]
+
+# ---------------- DAILY CACHE ----------------
+
+# A day's forecast only depends on history before that day, so it is worked
+# out once per day (and recipe version) by the refresh_forecast job, or by
+# `flask forecast refresh`, and stored in forecast_cache for every worker.
+# Page views only read the cache; each process keeps the latest one in
+# memory.
+
+REFRESH_JOB = "refresh_forecast"
+# Tomorrow's refresh runs this long after midnight UTC, once the day is over
+REFRESH_DELAY = 60
+
+_latest = {}
+_lock = threading.Lock()
+
+
+def utc_today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def cached(conn, day):
+    """day's forecast for the current recipes, or None if it has not been refreshed."""
+    key = (day, data_version(conn, "recipe_ingredients"))
+    with _lock:
+        if _latest.get("key") == key:
+            return _latest["result"]
+    row = conn.execute(
+        "SELECT payload FROM forecast_cache WHERE day = ? AND recipes_version = ?", key
+    ).fetchone()
+    if row is None:
+        return None
+    result = json.loads(row[0])
+    with _lock:
+        _latest.update(key=key, result=result)
+    return result
+
+
+def get_forecast(conn, day=None):
+    """The cached forecast for day (default today), without writing.
+
+    Until that day's refresh has run this is the newest earlier forecast,
+    or None if nothing has been cached yet.
+    """
+    day = day or utc_today()
+    result = cached(conn, day)
+    if result is None:
+        row = conn.execute(
+            "SELECT payload FROM forecast_cache WHERE day <= ? ORDER BY day DESC LIMIT 1", (day,)
+        ).fetchone()
+        result = json.loads(row[0]) if row else None
+    return result
+
+
+def refresh(conn, day=None):
+    """Compute day's forecast and store it in forecast_cache. Returns it."""
+    day = day or utc_today()
+    key = (day, data_version(conn, "recipe_ingredients"))
+    result = compute(conn, day)
+    with db.write_transaction(conn, "forecast_cache"):
+        conn.execute("""
+            INSERT OR REPLACE INTO forecast_cache (day, recipes_version, payload)
+            VALUES (?, ?, ?)
+        """, key + (json.dumps(result, separators=(",", ":")),))
+        conn.execute("DELETE FROM forecast_cache WHERE day < date(?, '-30 days')", (day,))
+    with _lock:
+        _latest.update(key=key, result=result)
+    return result
+
+
+def schedule_refresh(conn, day=None, delay=0):
+    """Queue a refresh of day's forecast unless one is already queued.
+
+    Commits with the caller's transaction, like jobs.enqueue().
+    """
+    payload = {"day": day or utc_today()}
+    queued = conn.execute(
+        "SELECT 1 FROM jobs WHERE status = 'queued' AND kind = ? AND payload = ?",
+        (REFRESH_JOB, json.dumps(payload))
+    ).fetchone()
+    if not queued:
+        jobs.enqueue(conn, REFRESH_JOB, payload, delay=delay)
+
+
+@jobs.handler(REFRESH_JOB)
+def refresh_forecast_job(conn, payload):
+    """Refresh one day's forecast and queue tomorrow's."""
+    # A worker that was down past midnight catches up on today, not the missed day
+    refresh(conn, max(payload["day"], utc_today()))
+    now = datetime.now(timezone.utc)
+    tomorrow = date.fromordinal(now.date().toordinal() + 1)
+    midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc)
+    with db.write_transaction(conn, "forecast_schedule"):
+        schedule_refresh(conn, tomorrow.isoformat(), (midnight - now).total_seconds() + REFRESH_DELAY)
+
+# ---------------- CLI ----------------
+
+@click.group("forecast")
+def forecast_cli():
+    """Demand forecasts and recipe data."""
+
+
+def _check_day(ctx, param, value):
+    if value:
+        try:
+            date.fromisoformat(value)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return value
+
+
+@forecast_cli.command("refresh")
+@click.option("--day", callback=_check_day, help="Day to forecast (YYYY-MM-DD), default today (UTC).")
+@with_appcontext
+def refresh_command(day):
+    """Recompute a day's forecast and store it for the web workers."""
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        result = refresh(conn, day)
+    finally:
+        conn.close()
+    click.echo(f"Forecast for {result['day']} cached ({len(result['items'])} items).")
+
+
+@forecast_cli.command("show")
+@click.option("--day", callback=_check_day, help="Day to forecast (YYYY-MM-DD), default today (UTC).")
+@click.option("--top", default=20, show_default=True, help="Items to list.")
+@click.option("--refresh", "recompute", is_flag=True, help="Recompute and cache even if the day is cached.")
+@with_appcontext
+def show_command(day, top, recompute):
+    """Print forecast demand, suggested specials and ingredient quantities."""
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        result = None if recompute else cached(conn, day or utc_today())
+        if result is None:
+            result = refresh(conn, day)
+    finally:
+        conn.close()
+
+    click.echo(f"Forecast for {result['day']} (history from {result['history_start']})")
+    click.echo("\nSuggested specials:")
+    for item in result["specials"]:
+        click.echo(f"  {item['item_name']:30} {item['forecast']:8.1f}  x{item['weekday_lift']:.2f} today")
+    click.echo(f"\nTop items (today / next {PLAN_DAYS} days / trend):")
+    for item in result["items"][:top]:
+        click.echo(f"  {item['item_name']:30} {item['forecast']:8.1f} {item['week_forecast']:9.1f} "
+                   f"{item['trend']:6.2f}")
+    if result["ingredients"]:
+        click.echo(f"\nIngredients for the next {PLAN_DAYS} days:")
+        for row in result["ingredients"]:
+            click.echo(f"  {row['ingredient']:30} {row['quantity']:10.2f} {row['unit']}")
+
+
+@forecast_cli.command("import-recipes")
+@click.argument("path")
+@with_appcontext
+def import_recipes_command(path):
+    """Upsert item_name,ingredient,quantity,unit rows (quantity per serving) from a CSV file."""
+    fh = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        rows = []
+        for line, raw in enumerate(csv.DictReader(fh), start=2):
+            try:
+                rows.append((raw["item_name"].strip(), raw["ingredient"].strip(),
+                             float(raw["quantity"]), (raw.get("unit") or "").strip()))
+            except (KeyError, AttributeError, TypeError, ValueError) as e:
+                click.echo(f"line {line}: skipped ({e})", err=True)
+    finally:
+        if path != "-":
+            fh.close()
+
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        with db.write_transaction(conn, "import_recipes"):
+            conn.executemany("""
+                INSERT INTO recipe_ingredients (item_name, ingredient, quantity, unit)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(item_name, ingredient) DO UPDATE SET
+                    quantity = excluded.quantity,
+                    unit = excluded.unit
+            """, rows)
+            schedule_refresh(conn)
+    finally:
+        conn.close()
+    click.echo(f"{len(rows)} recipe rows imported.")
+
+
+def init_app(app):
+    app.cli.add_command(forecast_cli)
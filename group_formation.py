@@ -0,0 +1,114 @@
+import db
+import jobs
+import rollups
+
+# ---------------- GROUP FORMATION ----------------
+
+# A "<item> Lovers" group is created once this many distinct users have
+# ordered the item.
+GROUP_MIN_BUYERS = 2
+
+
+def group_name_for(item_name):
+    return f"{item_name} Lovers"
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+def record_buyers(conn, user_id, item_names):
+    """Update buyer counts and group memberships for one order.
+
+    Returns {group_id: members added} for the dashboard rollups.
+
+    Runs inside the caller's transaction with a fixed number of set-based
+    statements over the cart's items, so its cost does not grow with
+    order history.
+    """
+    names = sorted({name for name in item_names if not name.startswith("Offer")})
+    if not names:
+        return {}
+    marks = _placeholders(names)
+
+    known = {row[0] for row in conn.execute(
+        f"SELECT item_name FROM item_buyers WHERE user_id=? AND item_name IN ({marks})",
+        [user_id] + names
+    )}
+    new_names = [name for name in names if name not in known]
+    if new_names:
+        conn.executemany(
+            "INSERT INTO item_buyers (item_name, user_id) VALUES (?,?)",
+            [(name, user_id) for name in new_names]
+        )
+        conn.executemany("""
+            INSERT INTO item_buyer_counts (item_name, buyer_count) VALUES (?, 1)
+            ON CONFLICT(item_name) DO UPDATE SET buyer_count = buyer_count + 1
+        """, [(name,) for name in new_names])
+
+    popular = [row[0] for row in conn.execute(
+        f"SELECT item_name FROM item_buyer_counts WHERE item_name IN ({marks}) AND buyer_count >= ?",
+        names + [GROUP_MIN_BUYERS]
+    )]
+    if not popular:
+        return {}
+
+    group_names = [group_name_for(name) for name in popular]
+    existing = dict(conn.execute(
+        f"SELECT group_name, id FROM groups WHERE group_name IN ({_placeholders(group_names)})",
+        group_names
+    ).fetchall())
+
+    joined = {}
+    if existing:
+        # RETURNING only yields the rows actually inserted, not ignored ones
+        for row in conn.execute(f"""
+            INSERT OR IGNORE INTO group_members (group_id, user_id)
+            SELECT id, ? FROM groups WHERE id IN ({_placeholders(existing)})
+            RETURNING group_id
+        """, [user_id] + list(existing.values())).fetchall():
+            joined[row[0]] = 1
+
+    for item_name in popular:
+        group_name = group_name_for(item_name)
+        if group_name in existing:
+            continue
+        # First time the threshold is reached: seed the group with every
+        # buyer recorded so far (only GROUP_MIN_BUYERS rows at this point).
+        group_id = conn.execute("INSERT INTO groups (group_name) VALUES (?)", (group_name,)).lastrowid
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO group_members (group_id, user_id)
+            SELECT ?, user_id FROM item_buyers WHERE item_name=?
+        """, (group_id, item_name))
+        joined[group_id] = cur.rowcount
+    return joined
+
+
+def backfill_buyers(conn):
+    """Populate item_buyers/item_buyer_counts from existing order history."""
+    conn.execute("""
+        INSERT OR IGNORE INTO item_buyers (item_name, user_id)
+        SELECT DISTINCT oi.item_name, o.user_id
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        WHERE oi.item_name IS NOT NULL AND o.user_id IS NOT NULL
+    """)
+    conn.execute("DELETE FROM item_buyer_counts")
+    conn.execute("""
+        INSERT INTO item_buyer_counts (item_name, buyer_count)
+        SELECT item_name, COUNT(*) FROM item_buyers GROUP BY item_name
+    """)
+
+
+@jobs.handler("recompute_groups")
+def recompute_groups_job(conn, payload):
+    """Group formation for one order, queued by checkout."""
+    with db.write_transaction(conn, "recompute_groups"):
+        order = conn.execute("SELECT user_id FROM orders WHERE id = ?", (payload["order_id"],)).fetchone()
+        if order is None:
+            return
+        names = [row[0] for row in conn.execute(
+            "SELECT item_name FROM order_items WHERE order_id = ?", (payload["order_id"],)
+        )]
+        joined = record_buyers(conn, order["user_id"], names)
+        rollups.record_members(conn, joined)
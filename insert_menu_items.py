@@ -1,43 +1,11 @@
-import sqlite3
+import os
+import sys
 
-# ===============================================
-# CONNECT USING FULL PATH (IMPORTANT)
-# ===============================================
-
-db_path = r"C:\Users\windows\Desktop\food\restaurant.db"
-conn = sqlite3.connect(db_path)
-c = conn.cursor()
-
-print("Connected to database successfully")
-
-# ===============================================
-# STEP 1 — CREATE TABLE IF NOT EXISTS
-# ===============================================
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS menu (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    item_name TEXT UNIQUE,
-    category TEXT,
-    price INTEGER,
-    image TEXT
-)
-""")
-
-print("Menu table ready")
+import db
+import migrations
 
 # ===============================================
-# STEP 2 — ADD IMAGE COLUMN IF MISSING
-# ===============================================
-
-try:
-    c.execute("ALTER TABLE menu ADD COLUMN image TEXT")
-    print("Image column added")
-except:
-    print("Image column already exists")
-
-# ===============================================
-# STEP 3 — ITEMS WITH IMAGES
+# SAMPLE MENU ITEMS WITH IMAGES
 # ===============================================
 
 new_items = [
@@ -59,26 +27,26 @@ new_items = [
 ]
 
 # ===============================================
-# STEP 4 — INSERT SAFELY
+# INSERT SAFELY (ONE TRANSACTION)
 # ===============================================
 
-inserted_count = 0
-
-for item in new_items:
-    c.execute("SELECT * FROM menu WHERE item_name=?", (item[0],))
-    if not c.fetchone():
-        c.execute("""
+def seed_menu(conn, items=new_items):
+    with db.write_transaction(conn, "seed_menu"):
+        cur = conn.executemany("""
             INSERT INTO menu (item_name, category, price, image)
             VALUES (?, ?, ?, ?)
-        """, item)
-        inserted_count += 1
+            ON CONFLICT(item_name) DO NOTHING
+        """, items)
+    return cur.rowcount
 
-# ===============================================
-# SAVE & CLOSE
-# ===============================================
 
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    # Usage: python insert_menu_items.py [path/to/restaurant.db]
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("DATABASE", "restaurant.db")
+
+    migrations.migrate(db_path)
+    conn = db.connect(db_path)
+    inserted_count = seed_menu(conn)
+    conn.close()
 
-print(f"{inserted_count} new items inserted successfully.")
-print("Database updated safely with images.")
\ No newline at end of file
+    print(f"{inserted_count} new items inserted successfully.")
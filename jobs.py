@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# ---------------- JOB QUEUE ----------------
+
+# Jobs are rows in the jobs table, so enqueueing inside a request's write
+# transaction makes the job exactly as durable as the data it refers to,
+# and any number of `flask worker` processes can share the queue without a
+# broker: claiming a job is one UPDATE ... RETURNING under BEGIN IMMEDIATE.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0       # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 600.0
+# A running job whose worker has not finished it in this long is assumed
+# lost (worker killed) and handed out again.
+LEASE_SECONDS = 300
+KEEP_DONE_SECONDS = 7 * 86400
+LATENCY_SAMPLE = 1000
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register fn(conn, payload) as the handler for jobs of this kind.
+
+    Handlers may run more than once for a job (retries, expired leases), so
+    they must be idempotent.
+    """
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def create_schema(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS jobs(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            run_at REAL NOT NULL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            worker TEXT,
+            last_error TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs(status, run_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at)")
+
+
+def enqueue(conn, kind, payload, delay=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Add a job; commits with the caller's transaction. Returns the job id."""
+    now = time.time()
+    cur = conn.execute("""
+        INSERT INTO jobs (kind, payload, max_attempts, run_at, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (kind, json.dumps(payload), max_attempts, now + delay, now))
+    return cur.lastrowid
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`, with jitter so failures spread out."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(conn, worker):
+    """Take the next due job (or one whose lease expired). Returns a row or None."""
+    now = time.time()
+    with db.write_transaction(conn, "job_claim"):
+        # A lease that expired on the last attempt is not handed out again;
+        # fail it so stats() shows it and retry-failed-jobs can requeue it.
+        conn.execute("""
+            UPDATE jobs SET status = 'failed', finished_at = ?, last_error = 'lease expired'
+            WHERE status = 'running' AND started_at < ? AND attempts >= max_attempts
+        """, (now, now - LEASE_SECONDS))
+        return conn.execute("""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, started_at = ?, worker = ?
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE (status = 'queued' AND run_at <= ?)
+                OR (status = 'running' AND started_at < ? AND attempts < max_attempts)
+                ORDER BY run_at, id
+                LIMIT 1
+            )
+            RETURNING id, kind, payload, attempts, max_attempts, created_at
+        """, (now, worker, now, now - LEASE_SECONDS)).fetchone()
+
+
+def run_job(conn, job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    try:
+        fn = HANDLERS.get(job["kind"])
+        if fn is None:
+            raise LookupError(f"No handler for job kind {job['kind']!r}")
+        fn(conn, json.loads(job["payload"]))
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        error = traceback.format_exc(limit=5)
+        retry = job["attempts"] < job["max_attempts"]
+        logger.warning("job %s (%s) attempt %s failed%s", job["id"], job["kind"], job["attempts"],
+                       "; will retry" if retry else "; giving up")
+        with db.write_transaction(conn, "job_fail"):
+            conn.execute("""
+                UPDATE jobs SET status = ?, run_at = ?, finished_at = ?, last_error = ?
+                WHERE id = ?
+            """, (
+                QUEUED if retry else FAILED,
+                time.time() + backoff(job["attempts"]),
+                None if retry else time.time(),
+                error,
+                job["id"],
+            ))
+        return False
+
+    with db.write_transaction(conn, "job_done"):
+        conn.execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, last_error = NULL WHERE id = ?",
+            (time.time(), job["id"])
+        )
+    return True
+
+
+def purge(conn, keep_seconds=KEEP_DONE_SECONDS):
+    with db.write_transaction(conn, "job_purge"):
+        return conn.execute(
+            "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+            (time.time() - keep_seconds,)
+        ).rowcount
+
+# ---------------- WORKER ----------------
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def work(database, poll_interval=1.0, burst=False, stop=None):
+    """Process jobs until stopped (or, with burst, until the queue is empty).
+
+    Returns the number of jobs run.
+    """
+    conn = db.connect(database)
+    name = worker_name()
+    processed = 0
+    last_purge = 0.0
+    try:
+        while not (stop and stop.is_set()):
+            if time.monotonic() - last_purge > 3600:
+                purge(conn)
+                last_purge = time.monotonic()
+
+            job = claim(conn, name)
+            if job is None:
+                if burst:
+                    break
+                if stop:
+                    stop.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+                continue
+            run_job(conn, job)
+            processed += 1
+    finally:
+        conn.close()
+    return processed
+
+
+def start_thread(database, poll_interval=1.0):
+    """Run a worker in a daemon thread (for the development server)."""
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=work, args=(database, poll_interval), kwargs={"stop": stop},
+        name="job-worker", daemon=True
+    )
+    thread.start()
+    return thread, stop
+
+# ---------------- STATS ----------------
+
+def stats(conn):
+    """Queue depth by status plus wait/run latency over recently finished jobs."""
+    now = time.time()
+    # Finished jobs are left out of the counts so this stays an index range
+    # read over live jobs only.
+    depth = dict(conn.execute("""
+        SELECT status, COUNT(*) FROM jobs
+        WHERE status IN ('queued', 'running', 'failed')
+        GROUP BY status
+    """).fetchall())
+    due, oldest = conn.execute("""
+        SELECT COUNT(*), MIN(run_at) FROM jobs WHERE status = 'queued' AND run_at <= ?
+    """, (now,)).fetchone()
+
+    recent = conn.execute("""
+        SELECT started_at - created_at AS wait,
+               finished_at - started_at AS run,
+               finished_at - created_at AS total
+        FROM jobs
+        WHERE status = 'done'
+        ORDER BY finished_at DESC
+        LIMIT ?
+    """, (LATENCY_SAMPLE,)).fetchall()
+    waits = sorted(row[0] for row in recent)
+    runs = sorted(row[1] for row in recent)
+    totals = sorted(row[2] for row in recent)
+
+    def pct(values, p):
+        return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 1) if values else None
+
+    failed = conn.execute("""
+        SELECT id, kind, attempts, last_error FROM jobs
+        WHERE status = 'failed'
+        ORDER BY finished_at DESC
+        LIMIT 5
+    """).fetchall()
+
+    return {
+        "depth": {status: depth.get(status, 0) for status in (QUEUED, RUNNING, FAILED)},
+        "due": due,
+        "oldest_due_age_s": round(now - oldest, 1) if oldest else 0,
+        "wait_ms": {"p50": pct(waits, 0.5), "p95": pct(waits, 0.95)},
+        "run_ms": {"p50": pct(runs, 0.5), "p95": pct(runs, 0.95)},
+        "latency_ms": {"p50": pct(totals, 0.5), "p95": pct(totals, 0.95)},
+        "recent_failures": [
+            {"id": row[0], "kind": row[1], "attempts": row[2],
+             "error": (row[3] or "").strip().rsplit("\n", 1)[-1]}
+            for row in failed
+        ],
+    }
+
+# ---------------- CLI ----------------
+
+@click.command("worker")
+@click.option("--poll-interval", default=1.0, show_default=True, help="Seconds to sleep when idle.")
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+@with_appcontext
+def worker_command(poll_interval, burst):
+    """Run background jobs from the SQLite queue."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    click.echo(f"worker {worker_name()} started")
+    try:
+        processed = work(current_app.config["DATABASE"], poll_interval, burst)
+    except KeyboardInterrupt:
+        return
+    click.echo(f"{processed} jobs processed")
+
+
+@click.command("retry-failed-jobs")
+@with_appcontext
+def retry_failed_command():
+    """Requeue every job that exhausted its attempts."""
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        with db.write_transaction(conn, "job_retry"):
+            count = conn.execute("""
+                UPDATE jobs SET status = 'queued', attempts = 0, run_at = ?, finished_at = NULL
+                WHERE status = 'failed'
+            """, (time.time(),)).rowcount
+    finally:
+        conn.close()
+    click.echo(f"{count} jobs requeued")
+
+
+def init_app(app):
+    app.cli.add_command(worker_command)
+    app.cli.add_command(retry_failed_command)
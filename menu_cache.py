@@ -0,0 +1,33 @@
+import json
+
+from cache import VersionedCache, get_cache, register
+
+# ---------------- MENU CACHE ----------------
+
+class MenuSnapshot:
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+        self.by_id = {item["id"]: item for item in items}
+        for item in items:
+            if item.get("image_variants"):
+                item["image_variants"] = json.loads(item["image_variants"])
+
+
+def load_menu(conn, version):
+    rows = conn.execute("SELECT * FROM menu ORDER BY id").fetchall()
+    return MenuSnapshot(version, [dict(row) for row in rows])
+
+# ---------------- FLASK INTEGRATION ----------------
+
+def init_app(app):
+    app.config.setdefault("MENU_CACHE_CHECK_INTERVAL", 2.0)
+    register(app, VersionedCache("menu", load_menu, app.config["MENU_CACHE_CHECK_INTERVAL"]))
+
+
+def get_menu_cache():
+    return get_cache("menu")
+
+
+def get_menu():
+    return get_menu_cache().get()
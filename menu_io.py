@@ -0,0 +1,266 @@
+import csv
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import db
+
+FIELDS = ("item_name", "category", "price", "image")
+DEFAULT_CHUNK_SIZE = 2000
+# Rejected rows listed by `flask menu import` before it gives up
+MAX_REPORTED_ERRORS = 20
+
+# ---------------- READING / WRITING ----------------
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def read_rows(fh, fmt):
+    """Yield (line number, raw row). A JSONL line that is not an object yields the reason instead of a dict."""
+    if fmt == "jsonl":
+        for line, text in enumerate(fh, 1):
+            text = text.strip()
+            if not text:
+                continue
+            try:
+                raw = json.loads(text)
+            except ValueError as e:
+                raw = f"invalid JSON ({e})"
+            else:
+                if not isinstance(raw, dict):
+                    raw = "not a JSON object"
+            yield line, raw
+    else:
+        reader = csv.DictReader(fh)
+        for raw in reader:
+            yield reader.line_num, raw
+
+
+def write_rows(fh, fmt, rows):
+    if fmt == "jsonl":
+        for row in rows:
+            fh.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n")
+    else:
+        writer = csv.writer(fh)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+
+# ---------------- IMPORT ----------------
+
+def clean_price(value):
+    """Whole-number price from an int, an integral float, or either as a string."""
+    if isinstance(value, bool):
+        raise ValueError(f"invalid price {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid price {value!r}")
+    if not number.is_integer():
+        raise ValueError(f"price {value!r} is not a whole number")
+    return int(number)
+
+
+def clean_row(raw, images):
+    """Return a (item_name, category, price, image) tuple or raise ValueError."""
+    if isinstance(raw, str):
+        raise ValueError(raw)
+    name = raw.get("item_name")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("missing item_name")
+    name = name.strip()
+    category = str(raw.get("category") or "").strip() or None
+    price = clean_price(raw.get("price"))
+    if price < 0:
+        raise ValueError(f"negative price {price}")
+    image = str(raw.get("image") or "").strip() or None
+    if image is not None and images is not None and image not in images:
+        raise ValueError(f"image {image!r} not found in food images directory")
+    return name, category, price, image
+
+
+def validate_rows(numbered_rows, images=None, max_errors=MAX_REPORTED_ERRORS):
+    """Check every row without keeping any. Returns (error count, first max_errors (line, reason))."""
+    count = 0
+    errors = []
+    for line, raw in numbered_rows:
+        try:
+            clean_row(raw, images)
+        except ValueError as e:
+            count += 1
+            if len(errors) < max_errors:
+                errors.append((line, str(e)))
+    return count, errors
+
+
+def clean_rows(numbered_rows, images=None):
+    """Yield cleaned rows; raises ValueError naming the line of the first bad one."""
+    for line, raw in numbered_rows:
+        try:
+            yield clean_row(raw, images)
+        except ValueError as e:
+            raise ValueError(f"line {line}: {e}")
+
+
+def import_menu(conn, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upsert cleaned rows in chunks, one transaction per chunk.
+
+    Only rows that are new or differ from the stored row are written, so
+    re-importing an unchanged catalog does no writes (and does not bump the
+    menu cache version). Returns counts of inserted/updated/unchanged.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    rows = iter(rows)
+    while True:
+        raw_chunk = list(itertools.islice(rows, chunk_size))
+        if not raw_chunk:
+            break
+
+        # The last occurrence of a name within a chunk wins.
+        chunk = {row[0]: row for row in raw_chunk}
+
+        names = list(chunk)
+        existing = {
+            r[0]: tuple(r) for r in conn.execute(
+                f"SELECT item_name, category, price, image FROM menu "
+                f"WHERE item_name IN ({','.join('?' * len(names))})",
+                names
+            )
+        }
+        changed = []
+        for name, row in chunk.items():
+            if name not in existing:
+                counts["inserted"] += 1
+                changed.append(row)
+            elif existing[name] != row:
+                counts["updated"] += 1
+                changed.append(row)
+            else:
+                counts["unchanged"] += 1
+
+        if changed:
+            with db.write_transaction(conn, "menu_import"):
+                conn.executemany("""
+                    INSERT INTO menu (item_name, category, price, image)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(item_name) DO UPDATE SET
+                        category = excluded.category,
+                        price = excluded.price,
+                        image = excluded.image
+                """, changed)
+    return counts
+
+# ---------------- EXPORT ----------------
+
+def export_menu(conn, fh, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    cur = conn.execute("SELECT item_name, category, price, image FROM menu ORDER BY id")
+    cur.arraysize = chunk_size
+
+    def rows():
+        while True:
+            batch = cur.fetchmany()
+            if not batch:
+                return
+            yield from (tuple(row) for row in batch)
+
+    write_rows(fh, fmt, rows())
+
+# ---------------- CLI ----------------
+
+def food_images_dir():
+    return os.path.join(current_app.static_folder, "food_images")
+
+
+@click.group("menu")
+def menu_cli():
+    """Bulk menu import and export."""
+
+
+@menu_cli.command("import")
+@click.argument("path")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True)
+@click.option("--images-dir", help="Directory image names are checked against.")
+@click.option("--skip-image-check", is_flag=True, help="Accept image names without checking the directory.")
+@with_appcontext
+def import_command(path, fmt, chunk_size, images_dir, skip_image_check):
+    """Upsert menu items from a CSV or JSONL file ("-" for stdin)."""
+    images = None
+    if not skip_image_check:
+        images_dir = images_dir or food_images_dir()
+        if not os.path.isdir(images_dir):
+            raise click.ClickException(
+                f"Images directory {images_dir} not found; pass --images-dir or --skip-image-check."
+            )
+        images = set(os.listdir(images_dir))
+
+    # The file is read twice: once to check every row, so a bad row imports
+    # nothing, then again to upsert it chunk by chunk. Only the first few
+    # errors are kept, so memory does not grow with the file.
+    fmt = detect_format(path, fmt)
+    if path == "-":
+        fh = tempfile.TemporaryFile("w+", newline="", encoding="utf-8")
+        shutil.copyfileobj(sys.stdin, fh)
+    else:
+        fh = open(path, newline="", encoding="utf-8")
+    try:
+        fh.seek(0)
+        count, errors = validate_rows(read_rows(fh, fmt), images)
+        if count:
+            lines = [f"line {line}: {reason}" for line, reason in errors]
+            if count > len(errors):
+                lines.append(f"... and {count - len(errors)} more")
+            raise click.ClickException(f"{count} invalid rows, nothing imported:\n" + "\n".join(lines))
+
+        fh.seek(0)
+        conn = db.connect(current_app.config["DATABASE"])
+        try:
+            counts = import_menu(conn, clean_rows(read_rows(fh, fmt), images), chunk_size)
+        except ValueError as e:
+            raise click.ClickException(f"{path} changed during the import: {e}")
+        finally:
+            conn.close()
+    finally:
+        fh.close()
+
+    click.echo(f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged")
+
+
+@menu_cli.command("export")
+@click.argument("path")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@with_appcontext
+def export_command(path, fmt):
+    """Write the menu to a CSV or JSONL file ("-" for stdout)."""
+    fmt = detect_format(path, fmt)
+    conn = db.connect(current_app.config["DATABASE"], read_only=True)
+    try:
+        if path == "-":
+            export_menu(conn, sys.stdout, fmt)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as fh:
+                export_menu(conn, fh, fmt)
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    app.cli.add_command(menu_cli)
@@ -0,0 +1,334 @@
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import current_app, g, request, session
+
+logger = logging.getLogger(__name__)
+
+# ---------------- HISTOGRAMS ----------------
+
+# Everything here is per worker process: each gunicorn worker reports its
+# own numbers (the Prometheus output carries a pid label to tell them apart).
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are bucket upper bounds."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= self.count * p:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return None
+
+# ---------------- SQL TRACING ----------------
+
+# Request connections come from a pool built with TracedConnection, whose
+# cursors time execute() and fetch*() and add them to the current request's
+# trace. Statements are keyed by their SQL text; since queries use
+# placeholders, the same text run many times in one request is a loop
+# issuing one query per row (N+1).
+
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+SLOW_QUERY_LOG_SIZE = 50
+TOP_STATEMENTS = 20
+
+_local = threading.local()
+_settings = {"slow_query_s": DEFAULT_SLOW_QUERY_MS / 1000}
+
+
+class RequestTrace:
+    __slots__ = ("endpoint", "queries", "sql_time", "counts", "times")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.queries = 0
+        self.sql_time = 0.0
+        self.counts = {}
+        self.times = {}
+
+
+class TracedCursor(sqlite3.Cursor):
+    _sql = None
+    _elapsed = 0.0
+
+    def _account(self, elapsed, executed=False):
+        self._elapsed += elapsed
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            sql = self._sql
+            if executed:
+                trace.queries += 1
+                trace.counts[sql] = trace.counts.get(sql, 0) + 1
+            trace.sql_time += elapsed
+            trace.times[sql] = trace.times.get(sql, 0.0) + elapsed
+        slow = _settings["slow_query_s"]
+        if self._elapsed >= slow and self._elapsed - elapsed < slow:
+            _slow_query(self._sql, self._elapsed, trace.endpoint if trace else None)
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        self._elapsed = 0.0
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._account(time.perf_counter() - started, executed=True)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        self._elapsed = 0.0
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._account(time.perf_counter() - started, executed=True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._account(time.perf_counter() - started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        finally:
+            self._account(time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._account(time.perf_counter() - started)
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# ---------------- STORE ----------------
+
+_lock = threading.Lock()
+_endpoints = {}      # endpoint -> {"latency": Histogram, "queries": Histogram, "statuses": {}}
+_statements = {}     # sql -> [calls, seconds, max per-request seconds]
+_n_plus_one = {}     # (endpoint, sql) -> [requests flagged, max calls in one request]
+_slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _one_line(sql):
+    return " ".join(sql.split())
+
+
+def _slow_query(sql, elapsed, endpoint):
+    ms = round(elapsed * 1000, 1)
+    logger.warning("slow query (%.1f ms) in %s: %s", ms, endpoint or "-", _one_line(sql)[:500])
+    with _lock:
+        _slow.append({"at": time.time(), "ms": ms, "endpoint": endpoint, "sql": _one_line(sql)})
+
+
+def _record(trace, status, elapsed):
+    threshold = current_app.config["N_PLUS_ONE_THRESHOLD"]
+    repeated = [(sql, n) for sql, n in trace.counts.items() if n >= threshold]
+    with _lock:
+        stats = _endpoints.get(trace.endpoint)
+        if stats is None:
+            stats = _endpoints[trace.endpoint] = {
+                "latency": Histogram(), "queries": Histogram(QUERY_COUNT_BUCKETS), "statuses": {},
+            }
+        stats["latency"].observe(elapsed * 1000)
+        stats["queries"].observe(trace.queries)
+        stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+
+        for sql, seconds in trace.times.items():
+            entry = _statements.get(sql)
+            if entry is None:
+                entry = _statements[sql] = [0, 0.0, 0.0]
+            entry[0] += trace.counts.get(sql, 0)
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+        new = []
+        for sql, n in repeated:
+            flagged = _n_plus_one.get((trace.endpoint, sql))
+            if flagged is None:
+                flagged = _n_plus_one[(trace.endpoint, sql)] = [0, 0]
+                new.append((sql, n))
+            flagged[0] += 1
+            flagged[1] = max(flagged[1], n)
+    for sql, n in new:
+        logger.warning("possible N+1 in %s: %d runs of %s", trace.endpoint, n, _one_line(sql)[:300])
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+        _statements.clear()
+        _n_plus_one.clear()
+        _slow.clear()
+
+# ---------------- REQUEST HOOKS ----------------
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    _local.trace = RequestTrace(request.endpoint or "unmatched")
+
+
+def _finish_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc=None):
+    trace = getattr(_local, "trace", None)
+    started = g.pop("metrics_started", None)
+    _local.trace = None
+    if trace is None or started is None:
+        return
+    status = g.pop("metrics_status", 500)
+    # Streamed bodies (exports) are timed up to the view returning
+    _record(trace, status, time.perf_counter() - started)
+
+# ---------------- REPORTS ----------------
+
+def snapshot():
+    """Per-endpoint latency and query counts, top statements, N+1 flags, slow queries."""
+    with _lock:
+        endpoints = []
+        for name, stats in _endpoints.items():
+            latency, queries = stats["latency"], stats["queries"]
+            endpoints.append({
+                "endpoint": name,
+                "count": latency.count,
+                "mean_ms": round(latency.sum / latency.count, 2) if latency.count else None,
+                "p50_ms": latency.percentile(0.5),
+                "p95_ms": latency.percentile(0.95),
+                "p99_ms": latency.percentile(0.99),
+                "avg_queries": round(queries.sum / queries.count, 1) if queries.count else None,
+                "p95_queries": queries.percentile(0.95),
+                "statuses": dict(stats["statuses"]),
+            })
+        statements = sorted(_statements.items(), key=lambda item: -item[1][1])[:TOP_STATEMENTS]
+        return {
+            "pid": os.getpid(),
+            "endpoints": sorted(endpoints, key=lambda e: -(e["mean_ms"] or 0) * e["count"]),
+            "statements": [
+                {"sql": _one_line(sql), "calls": calls, "total_ms": round(seconds * 1000, 1),
+                 "avg_ms": round(seconds * 1000 / calls, 3) if calls else None,
+                 "max_request_ms": round(worst * 1000, 1)}
+                for sql, (calls, seconds, worst) in statements
+            ],
+            "n_plus_one": [
+                {"endpoint": endpoint, "sql": _one_line(sql), "requests": n, "max_calls": worst}
+                for (endpoint, sql), (n, worst) in sorted(_n_plus_one.items(), key=lambda item: -item[1][0])
+            ],
+            "slow_queries": list(reversed(_slow)),
+            "slow_query_ms": _settings["slow_query_s"] * 1000,
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def prometheus():
+    """Prometheus text exposition of this process's request metrics."""
+    pid = os.getpid()
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by Flask endpoint.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_endpoints.items())
+        for name, stats in items:
+            latency = stats["latency"]
+            labels = f'endpoint="{_escape(name)}",pid="{pid}"'
+            seen = 0
+            for bound, n in zip(latency.bounds, latency.counts):
+                seen += n
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound / 1000:g}"}} {seen}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {latency.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {latency.sum / 1000:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {latency.count}")
+
+        lines += ["# HELP http_requests_total Responses by endpoint and status.",
+                  "# TYPE http_requests_total counter"]
+        for name, stats in items:
+            for status, n in sorted(stats["statuses"].items()):
+                lines.append(f'http_requests_total{{endpoint="{_escape(name)}",status="{status}",pid="{pid}"}} {n}')
+
+        lines += ["# HELP sql_queries_per_request Queries issued per request by endpoint.",
+                  "# TYPE sql_queries_per_request summary"]
+        for name, stats in items:
+            queries = stats["queries"]
+            labels = f'endpoint="{_escape(name)}",pid="{pid}"'
+            lines.append(f"sql_queries_per_request_sum{{{labels}}} {queries.sum:g}")
+            lines.append(f"sql_queries_per_request_count{{{labels}}} {queries.count}")
+
+        lines += ["# HELP sql_n_plus_one_requests_total Requests that repeated one statement many times.",
+                  "# TYPE sql_n_plus_one_requests_total counter"]
+        per_endpoint = {}
+        for (endpoint, _), (n, _) in _n_plus_one.items():
+            per_endpoint[endpoint] = per_endpoint.get(endpoint, 0) + n
+        for endpoint, n in sorted(per_endpoint.items()):
+            lines.append(f'sql_n_plus_one_requests_total{{endpoint="{_escape(endpoint)}",pid="{pid}"}} {n}')
+
+        lines += ["# HELP sql_slow_queries_recent Slow queries in the in-memory log.",
+                  "# TYPE sql_slow_queries_recent gauge",
+                  f'sql_slow_queries_recent{{pid="{pid}"}} {len(_slow)}']
+    return "\n".join(lines) + "\n"
+
+
+def scrape_allowed():
+    """Admins, or a scraper presenting METRICS_TOKEN as a bearer token."""
+    if session.get("is_admin"):
+        return True
+    token = current_app.config.get("METRICS_TOKEN")
+    return bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+
+
+def init_app(app):
+    """Register the hooks; call before other before_request hooks so they are timed too."""
+    app.config.setdefault("METRICS_ENABLED", True)
+    app.config.setdefault("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS)
+    app.config.setdefault("N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD)
+    app.config.setdefault("METRICS_TOKEN", None)
+    if not app.config["METRICS_ENABLED"]:
+        return
+    _settings["slow_query_s"] = app.config["SLOW_QUERY_MS"] / 1000
+    app.extensions["db_connection_factory"] = TracedConnection
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,470 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+import auth
+import db
+import forecast
+import group_formation
+import jobs
+import offers
+import rollups
+import search
+import supplier_search
+
+# ---------------- HELPERS ----------------
+
+def add_column_if_missing(c, table, column, definition):
+    columns = [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_version_triggers(c, table, update_columns=None):
+    """Bump data_versions[table] on every write so cached copies reload.
+
+    With update_columns, UPDATEs only bump the version when one of those
+    columns is written; use it to skip counters no cached page shows.
+    """
+    c.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)", (table,))
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        columns = ""
+        if event == "UPDATE" and update_columns:
+            columns = " OF " + ", ".join(update_columns)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+            AFTER {event}{columns} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+            END
+        """)
+
+# ---------------- MIGRATIONS ----------------
+
+# Columns of offers that cached group pages render
+OFFER_PAGE_COLUMNS = ("group_id", "title", "description", "price", "expiry_datetime", "expiry_ts")
+
+# Each migration must be idempotent: databases created by the old
+# import-time init_db() already contain some of these objects.
+
+def m001_initial_schema(c):
+    # USERS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS users(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            is_admin INTEGER DEFAULT 0
+        )
+    """)
+
+    # MENU
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS menu(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_name TEXT UNIQUE,
+            category TEXT,
+            price INTEGER,
+            image TEXT
+        )
+    """)
+
+    # ORDERS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS orders(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    # ORDER ITEMS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS order_items(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            item_name TEXT,
+            FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE
+        )
+    """)
+
+    # GROUPS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS groups(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_name TEXT UNIQUE
+        )
+    """)
+
+    # GROUP MEMBERS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS group_members(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER,
+            user_id INTEGER,
+            UNIQUE(group_id, user_id),
+            FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    # OFFERS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS offers(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER,
+            title TEXT,
+            description TEXT,
+            price INTEGER,
+            expiry_datetime TEXT,
+            FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE
+        )
+    """)
+
+    # DEFAULT ADMIN
+    admin = c.execute("SELECT 1 FROM users WHERE email='admin@gmail.com'").fetchone()
+    if not admin:
+        c.execute(
+            "INSERT INTO users (name,email,password,is_admin) VALUES (?,?,?,1)",
+            ("admin", "admin@gmail.com", generate_password_hash("admin123"))
+        )
+
+
+def m002_missing_tables(c):
+    # Tables the routes used but nothing ever created.
+
+    # TODAY'S SPECIALS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS specials(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_name TEXT,
+            category TEXT,
+            price INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # SUPPLIER LISTINGS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS supplier_items(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            item_name TEXT,
+            category TEXT,
+            price_per_kg REAL,
+            quantity INTEGER,
+            location TEXT,
+            contact TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_supplier_items_user ON supplier_items(user_id, created_at)")
+
+    # DIET MENU REQUESTS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS diet_menu_requests(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            name TEXT,
+            shift TEXT,
+            mobile TEXT,
+            days TEXT,
+            months TEXT,
+            liquids TEXT,
+            nonveg TEXT,
+            food_items TEXT,
+            status TEXT DEFAULT 'Pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_diet_requests_user ON diet_menu_requests(user_id, created_at)")
+
+    # The offers claim columns
+    add_column_if_missing(c, "offers", "claimed_count", "INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(c, "offers", "max_claims", "INTEGER")
+
+
+def m003_menu_image_and_unique_name(c):
+    add_column_if_missing(c, "menu", "image", "TEXT")
+    # Older databases have no UNIQUE(item_name); keep the first row per name.
+    c.execute("DELETE FROM menu WHERE id NOT IN (SELECT MIN(id) FROM menu GROUP BY item_name)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_menu_item_name ON menu(item_name)")
+
+
+def m004_group_formation(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS item_buyers(
+            item_name TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY(item_name, user_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS item_buyer_counts(
+            item_name TEXT PRIMARY KEY,
+            buyer_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_order_items_item_name ON order_items(item_name)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members(user_id)")
+    group_formation.backfill_buyers(c)
+
+
+def m005_order_line_details(c):
+    add_column_if_missing(c, "order_items", "menu_id", "INTEGER")
+    add_column_if_missing(c, "order_items", "unit_price", "INTEGER")
+    add_column_if_missing(c, "order_items", "quantity", "INTEGER DEFAULT 1")
+    # Price lines written before unit_price existed from the menu
+    c.execute("""
+        UPDATE order_items
+        SET unit_price = COALESCE((SELECT price FROM menu WHERE menu.item_name = order_items.item_name), 0),
+            quantity = COALESCE(quantity, 1)
+        WHERE unit_price IS NULL
+    """)
+    c.execute("DROP INDEX IF EXISTS idx_orders_user")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at)")
+
+
+def m006_carts(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS carts(
+            user_id INTEGER PRIMARY KEY,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS cart_items(
+            user_id INTEGER NOT NULL,
+            item_key TEXT NOT NULL,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            added_at INTEGER NOT NULL,
+            PRIMARY KEY(user_id, item_key)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_carts_updated ON carts(updated_at)")
+
+
+def m007_data_versions(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions(
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    create_version_triggers(c, "menu")
+
+
+def m008_search_index(c):
+    search.create_schema(c)
+    search.rebuild(c)
+
+
+def m009_offer_claims(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS offer_claims(
+            offer_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            claimed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY(offer_id, user_id),
+            FOREIGN KEY(offer_id) REFERENCES offers(id) ON DELETE CASCADE,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+
+
+def m010_offer_expiry_ts(c):
+    add_column_if_missing(c, "offers", "expiry_ts", "INTEGER")
+    offers.backfill_expiry(c)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_offers_group_expiry ON offers(group_id, expiry_ts)")
+
+
+def m011_menu_image_variants(c):
+    add_column_if_missing(c, "menu", "image_variants", "TEXT")
+
+
+
+def m012_supplier_listing_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_supplier_items_category_price ON supplier_items(category, price_per_kg)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_supplier_items_category_created ON supplier_items(category, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_supplier_items_price ON supplier_items(price_per_kg)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_supplier_items_created ON supplier_items(created_at)")
+    create_version_triggers(c, "supplier_items")
+
+
+def m013_supplier_search(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_supplier_items_quantity ON supplier_items(quantity)")
+    supplier_search.create_schema(c)
+
+
+def m014_dashboard_rollups(c):
+    rollups.create_schema(c)
+    rollups.backfill(c)
+
+
+def m015_orders_created_index(c):
+    # Date-range exports page through orders by (created_at, id)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)")
+
+
+def m016_forecasts(c):
+    forecast.create_schema(c)
+    create_version_triggers(c, "recipe_ingredients")
+
+
+def m017_jobs(c):
+    jobs.create_schema(c)
+
+
+def m018_login_rate_limits(c):
+    auth.create_schema(c)
+
+
+def m019_render_cache_versions(c):
+    for table in ("specials", "offers", "groups"):
+        create_version_triggers(c, table)
+
+
+def m020_search_update_triggers(c):
+    for table in ("menu", "specials", "offers"):
+        c.execute(f"DROP TRIGGER IF EXISTS {table}_search_update")
+    search.create_schema(c)
+
+
+def m021_offer_version_columns(c):
+    # Claims bump claimed_count, which no cached page shows
+    c.execute("DROP TRIGGER IF EXISTS offers_version_update")
+    create_version_triggers(c, "offers", OFFER_PAGE_COLUMNS)
+
+
+
+def m022_forecast_refresh_job(c):
+    # The refresh job queues the next day's itself from here on
+    forecast.schedule_refresh(c)
+
+
+MIGRATIONS = [
+    (1, "initial schema", m001_initial_schema),
+    (2, "specials, supplier_items, diet_menu_requests", m002_missing_tables),
+    (3, "menu image column and unique item names", m003_menu_image_and_unique_name),
+    (4, "incremental group formation", m004_group_formation),
+    (5, "order line prices and quantities", m005_order_line_details),
+    (6, "server-side carts", m006_carts),
+    (7, "data versions for cache invalidation", m007_data_versions),
+    (8, "full-text search index", m008_search_index),
+    (9, "offer claim ledger", m009_offer_claims),
+    (10, "offer expiry as epoch seconds", m010_offer_expiry_ts),
+    (11, "menu image variants", m011_menu_image_variants),
+    (12, "supplier listing indexes and version triggers", m012_supplier_listing_indexes),
+    (13, "supplier listing search", m013_supplier_search),
+    (14, "admin dashboard rollups", m014_dashboard_rollups),
+    (15, "orders created_at index", m015_orders_created_index),
+    (16, "demand forecast cache and recipes", m016_forecasts),
+    (17, "background job queue", m017_jobs),
+    (18, "login rate limits", m018_login_rate_limits),
+    (19, "version triggers for cached pages", m019_render_cache_versions),
+    (20, "search triggers only on indexed columns", m020_search_update_triggers),
+    (21, "offers version trigger only on displayed columns", m021_offer_version_columns),
+    (22, "queue the daily forecast refresh", m022_forecast_refresh_job),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# ---------------- RUNNER ----------------
+
+def current_version(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(database, echo=print):
+    """Apply pending migrations, each in its own transaction. Returns the new version."""
+    conn = db.connect(database)
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version(
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        version = current_version(conn)
+        for number, name, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            with db.write_transaction(conn, "migrate"):
+                # Another process may have applied it while we waited for the lock.
+                if current_version(conn) >= number:
+                    continue
+                migration(conn)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+            echo(f"Applied migration {number:03d}: {name}")
+            version = number
+        return version
+    finally:
+        conn.close()
+
+
+def check(database):
+    """Cheap startup check that the schema is up to date."""
+    conn = db.connect(database)
+    try:
+        version = current_version(conn)
+    finally:
+        conn.close()
+    if version < LATEST_VERSION:
+        raise RuntimeError(
+            f"Database {database} is at schema version {version}, "
+            f"this code needs {LATEST_VERSION}. Run `flask --app app migrate` first."
+        )
+    return version
+
+# ---------------- FLASK INTEGRATION ----------------
+
+@click.command("migrate")
+@with_appcontext
+def migrate_command():
+    """Apply pending database migrations."""
+    version = migrate(current_app.config["DATABASE"], echo=click.echo)
+    click.echo(f"Database is at schema version {version}.")
+
+
+@click.command("seed-menu")
+@with_appcontext
+def seed_menu_command():
+    """Insert the sample menu items that are not already on the menu."""
+    from insert_menu_items import seed_menu
+
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        inserted = seed_menu(conn)
+    finally:
+        conn.close()
+    click.echo(f"{inserted} new items inserted.")
+
+
+def init_app(app):
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(seed_menu_command)
+
+    checked = {}
+
+    # Importing the app (including for `flask migrate`) must not touch the
+    # database, so each worker checks the version on its first request.
+    @app.before_request
+    def check_schema_version():
+        if os.getpid() not in checked:
+            checked[os.getpid()] = check(app.config["DATABASE"])
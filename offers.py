@@ -0,0 +1,101 @@
+import calendar
+import time
+from datetime import datetime
+
+import db
+import rollups
+
+# ---------------- EXPIRY ----------------
+
+# Offer expiry is entered as a naive date/time and, as before, compared
+# against UTC "now". It is stored as epoch seconds in offers.expiry_ts so
+# that filters are plain range predicates on the (group_id, expiry_ts) index.
+EXPIRY_FORMATS = (
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+)
+
+
+def parse_expiry(text):
+    """Return (expiry_datetime, expiry_ts) for a form value, or raise ValueError."""
+    text = (text or "").strip()
+    for fmt in EXPIRY_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return parsed.strftime("%Y-%m-%d %H:%M"), calendar.timegm(parsed.timetuple())
+    raise ValueError(f"Unrecognised expiry {text!r}")
+
+
+def now_ts():
+    return int(time.time())
+
+
+def backfill_expiry(conn):
+    """Fill expiry_ts for offers written before the column existed."""
+    conn.execute("""
+        UPDATE offers
+        SET expiry_ts = COALESCE(CAST(strftime('%s', expiry_datetime) AS INTEGER), 0)
+        WHERE expiry_ts IS NULL
+    """)
+
+# ---------------- OFFER CLAIMS ----------------
+
+CLAIMED = "claimed"
+NOT_FOUND = "not_found"
+EXPIRED = "expired"
+ALREADY_CLAIMED = "already_claimed"
+SOLD_OUT = "sold_out"
+
+
+def claim(conn, offer_id, user_id):
+    """Claim an offer for a user. Returns (status, remaining).
+
+    The stock check and increment are a single UPDATE ... RETURNING, and the
+    ledger row is written in the same IMMEDIATE transaction, so concurrent
+    claimers can never oversell or claim twice. remaining is None for offers
+    without a max_claims limit.
+    """
+    with db.write_transaction(conn, "claim_offer"):
+        row = conn.execute("""
+            UPDATE offers
+            SET claimed_count = claimed_count + 1
+            WHERE id = ?
+            AND expiry_ts > ?
+            AND (max_claims IS NULL OR claimed_count < max_claims)
+            AND NOT EXISTS (
+                SELECT 1 FROM offer_claims WHERE offer_id = ? AND user_id = ?
+            )
+            RETURNING group_id, max_claims - claimed_count AS remaining
+        """, (offer_id, now_ts(), offer_id, user_id)).fetchone()
+
+        if row:
+            conn.execute(
+                "INSERT INTO offer_claims (offer_id, user_id) VALUES (?, ?)",
+                (offer_id, user_id)
+            )
+            rollups.record_claim(conn, row["group_id"])
+            return CLAIMED, row["remaining"]
+
+    return _claim_failure(conn, offer_id, user_id), None
+
+
+def _claim_failure(conn, offer_id, user_id):
+    offer = conn.execute("""
+        SELECT expiry_ts > ? AS live
+        FROM offers WHERE id = ?
+    """, (now_ts(), offer_id)).fetchone()
+    if not offer:
+        return NOT_FOUND
+    if not offer["live"]:
+        return EXPIRED
+    claimed = conn.execute(
+        "SELECT 1 FROM offer_claims WHERE offer_id = ? AND user_id = ?",
+        (offer_id, user_id)
+    ).fetchone()
+    if claimed:
+        return ALREADY_CLAIMED
+    return SOLD_OUT
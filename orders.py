@@ -0,0 +1,94 @@
+import db
+import jobs
+import rollups
+
+# ---------------- CHECKOUT ----------------
+
+def cart_lines(cart):
+    """(menu_id, item_name, unit_price, quantity) for each cart line; menu_id is None for offers/specials."""
+    return [
+        (int(key) if key.isdigit() else None, item["name"], item["price"], item["quantity"])
+        for key, item in cart.items()
+    ]
+
+
+def place_order(conn, user_id, carts):
+    """Order the user's cart and empty it, in one transaction.
+
+    Returns (order_id, total), or None if the cart is empty. The cart is read
+    under the write lock, so a repeated or concurrent checkout of the same
+    cart places one order.
+    """
+    with db.write_transaction(conn, "checkout"):
+        lines = cart_lines(carts.items(user_id))
+        if not lines:
+            return None
+        cur = conn.execute("INSERT INTO orders (user_id) VALUES (?)", (user_id,))
+        order_id = cur.lastrowid
+
+        conn.executemany("""
+            INSERT INTO order_items (order_id, menu_id, item_name, unit_price, quantity)
+            VALUES (?,?,?,?,?)
+        """, [(order_id,) + line for line in lines])
+
+        rollups.record_order(conn, order_id, lines)
+
+        # Group formation runs in `flask worker`, off the request path
+        jobs.enqueue(conn, "recompute_groups", {"order_id": order_id})
+
+        carts.clear_in_transaction(conn, user_id)
+
+    return order_id, sum(price * quantity for _, _, price, quantity in lines)
+
+# ---------------- HISTORY ----------------
+
+ORDERS_PER_PAGE = 20
+
+
+def order_history(conn, user_id, before_ts=None, before_id=None, limit=ORDERS_PER_PAGE):
+    """One page of a user's orders, newest first, with their items.
+
+    Keyset cursor: (before_ts, before_id) is the (created_at, id) of the last
+    order on the previous page. Returns (orders, next_cursor or None).
+    """
+    params = [user_id]
+    cursor_sql = ""
+    if before_ts and before_id:
+        cursor_sql = "AND (created_at, id) < (?, ?)"
+        params += [before_ts, before_id]
+    params.append(limit + 1)
+
+    rows = conn.execute(f"""
+        WITH page AS (
+            SELECT id, created_at FROM orders
+            WHERE user_id=? {cursor_sql}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        )
+        SELECT p.id, p.created_at,
+               oi.item_name, oi.unit_price AS price, oi.quantity,
+               SUM(oi.unit_price * oi.quantity) OVER (PARTITION BY p.id) AS total
+        FROM page p
+        LEFT JOIN order_items oi ON oi.order_id = p.id
+        ORDER BY p.created_at DESC, p.id DESC, oi.id
+    """, params).fetchall()
+
+    orders = []
+    for row in rows:
+        if not orders or orders[-1]["id"] != row["id"]:
+            orders.append({
+                "id": row["id"],
+                "created_at": row["created_at"],
+                "items": [],
+                "total": row["total"] or 0
+            })
+        if row["item_name"] is not None:
+            orders[-1]["items"].append(
+                {"item_name": row["item_name"], "price": row["price"], "quantity": row["quantity"]}
+            )
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = {"before_ts": orders[-1]["created_at"], "before_id": orders[-1]["id"]}
+    return orders, next_cursor
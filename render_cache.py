@@ -0,0 +1,115 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, make_response, render_template, request
+from markupsafe import Markup
+
+from cache import register
+
+# ---------------- FRAGMENT CACHE ----------------
+
+# Rendered HTML that is the same for every user (the menu grid, the specials
+# list, a group's offers) is kept per process and reused until the data
+# version it was rendered from changes. Per-user parts of a page are rendered
+# around the cached fragment, which costs next to nothing.
+
+DEFAULT_MAX_ENTRIES = 1024
+
+Fragment = namedtuple("Fragment", "html etag")
+
+
+class FragmentCache:
+    """LRU of rendered fragments keyed by (name, key), checked against a version."""
+
+    def __init__(self, name="fragments", max_entries=DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, key, version, render):
+        """Return the cached Fragment, or call render() -> (html, expires_at) and keep it.
+
+        expires_at is an epoch time after which the fragment is stale even
+        without a version change (offers dropping off at expiry), or None.
+        """
+        with self._lock:
+            entry = self._entries.get((name, key))
+            if entry and entry[0] == version and (entry[1] is None or time.time() < entry[1]):
+                self._entries.move_to_end((name, key))
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # Rendered outside the lock; two requests may both render on a miss
+        html, expires_at = render()
+        html = Markup(html)
+        fragment = Fragment(html, hashlib.sha1(html.encode("utf-8")).hexdigest()[:20])
+        with self._lock:
+            self._entries[(name, key)] = (version, expires_at, fragment)
+            self._entries.move_to_end((name, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def get_fragment_cache():
+    return current_app.extensions["caches"]["fragments"]
+
+
+def fragment(name, key, version, render):
+    return get_fragment_cache().get(name, key, version, render)
+
+# ---------------- CONDITIONAL GET ----------------
+
+_template_digests = {}
+
+
+def _template_digest(name):
+    """Hash of a page template's source, so a deploy that changes it changes the ETag."""
+    digest = _template_digests.get(name)
+    if digest is None:
+        source, _, _ = current_app.jinja_env.loader.get_source(current_app.jinja_env, name)
+        digest = _template_digests[name] = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return digest
+
+
+def cached_response(fragment, template=None, slot=None, vary=()):
+    """Respond with a page built from a cached fragment, or 304 if the client has it.
+
+    With a template, the fragment is passed to it as `slot` and the template
+    renders the per-user parts around it; vary lists the per-user values it
+    shows. Nothing is rendered for a 304.
+    """
+    parts = [fragment.etag]
+    if template:
+        parts.append(_template_digest(template))
+    parts += [str(value) for value in vary]
+    etag = parts[0] if len(parts) == 1 else hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()[:20]
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    elif template:
+        response = make_response(render_template(template, **{slot: fragment.html}))
+    else:
+        response = make_response(fragment.html)
+    response.set_etag(etag, weak=True)
+    # Personalised and behind a login, so browsers revalidate every time
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def init_app(app):
+    app.config.setdefault("FRAGMENT_CACHE_SIZE", DEFAULT_MAX_ENTRIES)
+    register(app, FragmentCache(max_entries=app.config["FRAGMENT_CACHE_SIZE"]))
@@ -0,0 +1,203 @@
+from datetime import date, datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import db
+
+# ---------------- ROLLUP TABLES ----------------
+
+# The admin dashboard reads only these tables. They are updated in the same
+# transaction as the write they summarise (checkout, group joins, offer
+# claims), so they never drift from the source rows; `flask rollups
+# backfill` rebuilds them from history.
+
+DASHBOARD_DAYS = 14
+TOP_ITEMS = 10
+TOP_ITEMS_DAYS = 30
+
+
+def create_schema(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales(
+            day TEXT PRIMARY KEY,
+            orders INTEGER NOT NULL DEFAULT 0,
+            items_sold INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS daily_item_sales(
+            day TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            orders INTEGER NOT NULL DEFAULT 0,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(day, item_name)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS group_stats(
+            group_id INTEGER PRIMARY KEY,
+            member_count INTEGER NOT NULL DEFAULT 0,
+            offer_claims INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE
+        )
+    """)
+
+# ---------------- INCREMENTAL UPDATES ----------------
+
+def record_order(conn, order_id, lines):
+    """Add one order's (menu_id, item_name, unit_price, quantity) lines to the daily rollups."""
+    day = conn.execute("SELECT date(created_at) FROM orders WHERE id = ?", (order_id,)).fetchone()[0]
+
+    per_item = {}
+    for _, name, price, quantity in lines:
+        quantity_sum, revenue = per_item.get(name, (0, 0))
+        per_item[name] = (quantity_sum + quantity, revenue + price * quantity)
+
+    conn.executemany("""
+        INSERT INTO daily_item_sales (day, item_name, orders, quantity, revenue)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT(day, item_name) DO UPDATE SET
+            orders = orders + 1,
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    """, [(day, name, quantity, revenue) for name, (quantity, revenue) in per_item.items()])
+
+    conn.execute("""
+        INSERT INTO daily_sales (day, orders, items_sold, revenue)
+        VALUES (?, 1, ?, ?)
+        ON CONFLICT(day) DO UPDATE SET
+            orders = orders + 1,
+            items_sold = items_sold + excluded.items_sold,
+            revenue = revenue + excluded.revenue
+    """, (day, sum(q for q, _ in per_item.values()), sum(r for _, r in per_item.values())))
+
+
+def record_members(conn, joined):
+    """Add {group_id: new_member_count} to the group rollup."""
+    conn.executemany("""
+        INSERT INTO group_stats (group_id, member_count) VALUES (?, ?)
+        ON CONFLICT(group_id) DO UPDATE SET member_count = member_count + excluded.member_count
+    """, [(group_id, count) for group_id, count in joined.items() if count])
+
+
+def record_claim(conn, group_id):
+    conn.execute("""
+        INSERT INTO group_stats (group_id, offer_claims) VALUES (?, 1)
+        ON CONFLICT(group_id) DO UPDATE SET offer_claims = offer_claims + 1
+    """, (group_id,))
+
+# ---------------- BACKFILL ----------------
+
+def backfill(conn):
+    """Rebuild every rollup from the source tables."""
+    conn.execute("DELETE FROM daily_item_sales")
+    conn.execute("""
+        INSERT INTO daily_item_sales (day, item_name, orders, quantity, revenue)
+        SELECT date(o.created_at),
+               oi.item_name,
+               COUNT(DISTINCT oi.order_id),
+               SUM(oi.quantity),
+               SUM(COALESCE(oi.unit_price, 0) * oi.quantity)
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        WHERE oi.item_name IS NOT NULL
+        GROUP BY date(o.created_at), oi.item_name
+    """)
+
+    conn.execute("DELETE FROM daily_sales")
+    conn.execute("""
+        INSERT INTO daily_sales (day, orders, items_sold, revenue)
+        SELECT date(o.created_at),
+               COUNT(DISTINCT o.id),
+               COALESCE(SUM(oi.quantity), 0),
+               COALESCE(SUM(COALESCE(oi.unit_price, 0) * oi.quantity), 0)
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        GROUP BY date(o.created_at)
+    """)
+
+    conn.execute("DELETE FROM group_stats")
+    conn.execute("""
+        INSERT INTO group_stats (group_id, member_count, offer_claims)
+        SELECT g.id,
+               (SELECT COUNT(*) FROM group_members gm WHERE gm.group_id = g.id),
+               (SELECT COUNT(*) FROM offer_claims oc
+                JOIN offers o ON o.id = oc.offer_id
+                WHERE o.group_id = g.id)
+        FROM groups g
+    """)
+
+# ---------------- DASHBOARD ----------------
+
+def dashboard(conn, today=None):
+    """Everything the admin dashboard shows, read from the rollups only.
+
+    Each query touches at most DASHBOARD_DAYS / TOP_ITEMS_DAYS days of rollup
+    rows (plus one row per group), however long the order history is. Days
+    are UTC, matching orders.created_at.
+    """
+    today = today or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    days = conn.execute("""
+        SELECT day, orders, items_sold, revenue FROM daily_sales
+        WHERE day > date(?, ?)
+        ORDER BY day DESC
+    """, (today, f"-{DASHBOARD_DAYS} days")).fetchall()
+
+    top_items = conn.execute("""
+        SELECT item_name, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+        FROM daily_item_sales
+        WHERE day > date(?, ?)
+        GROUP BY item_name
+        ORDER BY revenue DESC, quantity DESC
+        LIMIT ?
+    """, (today, f"-{TOP_ITEMS_DAYS} days", TOP_ITEMS)).fetchall()
+
+    groups = conn.execute("""
+        SELECT g.id, g.group_name,
+               COALESCE(s.member_count, 0) AS total_members,
+               COALESCE(s.offer_claims, 0) AS offer_claims
+        FROM groups g
+        LEFT JOIN group_stats s ON s.group_id = g.id
+        ORDER BY g.id
+    """).fetchall()
+
+    week_start = (date.fromisoformat(today) - timedelta(days=6)).isoformat()
+    week = [row for row in days if row["day"] >= week_start]
+    return {
+        "today": days[0] if days and days[0]["day"] == today else None,
+        "week_orders": sum(row["orders"] for row in week),
+        "week_revenue": sum(row["revenue"] for row in week),
+        "days": days,
+        "top_items": top_items,
+        "groups": groups,
+    }
+
+# ---------------- CLI ----------------
+
+@click.group("rollups")
+def rollups_cli():
+    """Dashboard rollup maintenance."""
+
+
+@rollups_cli.command("backfill")
+@with_appcontext
+def backfill_command():
+    """Rebuild the dashboard rollups from order, group and claim history."""
+    conn = db.connect(current_app.config["DATABASE"])
+    try:
+        with db.write_transaction(conn, "rollups_backfill"):
+            backfill(conn)
+        days, groups = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM daily_sales), (SELECT COUNT(*) FROM group_stats)"
+        ).fetchone()
+    finally:
+        conn.close()
+    click.echo(f"Rebuilt rollups: {days} days of sales, {groups} groups.")
+
+
+def init_app(app):
+    app.cli.add_command(rollups_cli)
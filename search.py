@@ -0,0 +1,125 @@
+import re
+
+from offers import now_ts
+
+# ---------------- SEARCH INDEX ----------------
+
+# menu, specials and group offers share one FTS5 table. Each source row maps
+# to a fixed rowid (id * 4 + kind code) so triggers can update it in place.
+KINDS = {
+    "menu": (0, "menu", "item_name", "category"),
+    "special": (1, "specials", "item_name", "category"),
+    "offer": (2, "offers", "title", "description"),
+}
+
+MAX_SUGGESTIONS = 10
+MAX_RESULTS = 200
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def create_schema(c):
+    """Create the FTS table and sync triggers. Returns True if newly created."""
+    exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='search_index'"
+    ).fetchone()
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            title,
+            body,
+            kind UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )
+    """)
+
+    for kind, (code, table, title, body) in KINDS.items():
+        rowid = f"{{row}}.id * 4 + {code}"
+        insert = (
+            f"INSERT INTO search_index (rowid, title, body, kind) "
+            f"VALUES ({rowid.format(row='new')}, new.{title}, new.{body}, '{kind}');"
+        )
+        delete = f"DELETE FROM search_index WHERE rowid = {rowid.format(row='old')};"
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table}
+            BEGIN {insert} END
+        """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table}
+            BEGIN {delete} END
+        """)
+        # Only the indexed columns: claimed_count bumps and image variant
+        # updates must not rewrite the FTS row.
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {title}, {body} ON {table}
+            BEGIN {delete} {insert} END
+        """)
+
+    return not exists
+
+
+def rebuild(c):
+    c.execute("DELETE FROM search_index")
+    for kind, (code, table, title, body) in KINDS.items():
+        c.execute(f"""
+            INSERT INTO search_index (rowid, title, body, kind)
+            SELECT id * 4 + {code}, {title}, {body}, '{kind}' FROM {table}
+        """)
+
+# ---------------- QUERIES ----------------
+
+def match_query(text):
+    """Turn free text into an FTS5 query where every word is a prefix match."""
+    tokens = _TOKEN.findall(text or "")
+    return " ".join(f'"{token}"*' for token in tokens[:8])
+
+
+def search(conn, text, kinds=None, limit=MAX_RESULTS):
+    """Return [(kind, id)] ordered by BM25 rank, titles weighted over body."""
+    query = match_query(text)
+    if not query:
+        return []
+
+    sql = """
+        SELECT kind, rowid / 4 AS ref_id
+        FROM search_index
+        WHERE search_index MATCH ?
+    """
+    params = [query]
+    if kinds:
+        sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+        params += list(kinds)
+    sql += " ORDER BY bm25(search_index, 10.0, 1.0) LIMIT ?"
+    params.append(limit)
+    return [(row[0], row[1]) for row in conn.execute(sql, params)]
+
+
+def suggest(conn, text, limit=MAX_SUGGESTIONS):
+    """Search-as-you-type results across menu items, specials and live offers."""
+    query = match_query(text)
+    if not query:
+        return []
+
+    # Rank inside the FTS table first and only join the top hits; a few spare
+    # candidates cover offers dropped for being expired.
+    limit = min(limit, MAX_SUGGESTIONS)
+    rows = conn.execute("""
+        SELECT s.kind, s.ref_id, s.title,
+               COALESCE(m.price, sp.price, o.price) AS price,
+               COALESCE(m.category, sp.category) AS category,
+               o.group_id
+        FROM (
+            SELECT kind, rowid / 4 AS ref_id, title, bm25(search_index, 10.0, 1.0) AS score
+            FROM search_index
+            WHERE search_index MATCH ?
+            ORDER BY score
+            LIMIT ?
+        ) s
+        LEFT JOIN menu m ON s.kind = 'menu' AND m.id = s.ref_id
+        LEFT JOIN specials sp ON s.kind = 'special' AND sp.id = s.ref_id
+        LEFT JOIN offers o ON s.kind = 'offer' AND o.id = s.ref_id
+        WHERE s.kind != 'offer' OR o.expiry_ts > ?
+        ORDER BY s.score
+        LIMIT ?
+    """, (query, limit * 3, now_ts(), limit)).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,194 @@
+import re
+
+# ---------------- SUPPLIER LISTING SEARCH ----------------
+
+# sort key: (column, direction)
+SORTS = {
+    "newest": ("s.created_at", "DESC"),
+    "price_asc": ("s.price_per_kg", "ASC"),
+    "price_desc": ("s.price_per_kg", "DESC"),
+    "quantity_desc": ("s.quantity", "DESC"),
+}
+# Values the old admin_suppliers form sends
+SORT_ALIASES = {"": "newest", "low": "price_asc"}
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# A range filter matching fewer rows than this is used as the index lookup;
+# broader ones are applied while walking the sort order instead.
+PROBE_ROWS = 5000
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def create_schema(c):
+    """External-content FTS over supplier_items, kept in sync by triggers."""
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS supplier_items_fts USING fts5(
+            item_name,
+            location,
+            content = 'supplier_items',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS supplier_items_fts_insert AFTER INSERT ON supplier_items
+        BEGIN
+            INSERT INTO supplier_items_fts (rowid, item_name, location)
+            VALUES (new.id, new.item_name, new.location);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS supplier_items_fts_delete AFTER DELETE ON supplier_items
+        BEGIN
+            INSERT INTO supplier_items_fts (supplier_items_fts, rowid, item_name, location)
+            VALUES ('delete', old.id, old.item_name, old.location);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS supplier_items_fts_update AFTER UPDATE ON supplier_items
+        BEGIN
+            INSERT INTO supplier_items_fts (supplier_items_fts, rowid, item_name, location)
+            VALUES ('delete', old.id, old.item_name, old.location);
+            INSERT INTO supplier_items_fts (rowid, item_name, location)
+            VALUES (new.id, new.item_name, new.location);
+        END
+    """)
+    c.execute("INSERT INTO supplier_items_fts (supplier_items_fts) VALUES ('rebuild')")
+
+
+def _column_match(column, text):
+    tokens = _TOKEN.findall(text or "")[:6]
+    return " AND ".join(f'{column} : "{token}"*' for token in tokens)
+
+
+def _is_selective(conn, name, ranges):
+    """True if the range filters on one column match fewer than PROBE_ROWS listings."""
+    where = [f"{column} {op} ?" for column, op, _ in ranges if column == name]
+    params = [value for column, _, value in ranges if column == name]
+    count = conn.execute(f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM supplier_items WHERE {' AND '.join(where)} LIMIT {PROBE_ROWS}
+        )
+    """, params).fetchone()[0]
+    return count < PROBE_ROWS
+
+
+def parse_filters(args):
+    """Read search filters from request.args; unparseable numbers are ignored."""
+    sort = args.get("sort") or ""
+    sort = SORT_ALIASES.get(sort, sort)
+    if sort not in SORTS:
+        sort = "newest"
+    category = args.get("category")
+    # created_at cursors are timestamps, the other sort keys are numbers
+    after_type = str if sort == "newest" else float
+    limit = args.get("limit", DEFAULT_LIMIT, type=int) or DEFAULT_LIMIT
+    return {
+        "q": (args.get("q") or "").strip(),
+        "category": None if category in (None, "", "All") else category,
+        "min_price": args.get("min_price", type=float),
+        "max_price": args.get("max_price", type=float),
+        "min_quantity": args.get("min_quantity", type=float),
+        "location": (args.get("location") or "").strip(),
+        "sort": sort,
+        "after": args.get("after", type=after_type),
+        "after_id": args.get("after_id", type=int),
+        "limit": max(1, min(limit, MAX_LIMIT)),
+    }
+
+
+def search_listings(conn, filters):
+    """Return (rows, next_cursor) for one page of supplier listings.
+
+    Text filters (item name words, location prefix) go through the FTS
+    index; price, quantity and category use the B-tree indexes from
+    migrations 12 and 13. Pages are keyset-paginated on (sort column, id).
+    """
+    conditions = []
+    params = []
+
+    match = " AND ".join(filter(None, [
+        _column_match("item_name", filters["q"]),
+        _column_match("location", filters["location"]),
+    ]))
+    if match:
+        # CROSS JOIN keeps the FTS hits as the outer loop; otherwise the
+        # planner may walk a sort index over every listing probing for them.
+        source = "supplier_items_fts f CROSS JOIN supplier_items s ON s.id = f.rowid"
+        conditions.append("supplier_items_fts MATCH ?")
+        params.append(match)
+    else:
+        source = "supplier_items s"
+
+    if filters["category"]:
+        conditions.append("s.category = ?")
+        params.append(filters["category"])
+
+    ranges = []
+    if filters["min_price"] is not None:
+        ranges.append(("price_per_kg", ">=", filters["min_price"]))
+    if filters["max_price"] is not None:
+        ranges.append(("price_per_kg", "<=", filters["max_price"]))
+    if filters["min_quantity"] is not None:
+        ranges.append(("quantity", ">=", filters["min_quantity"]))
+
+    column, direction = SORTS[filters["sort"]]
+    # A broad range is cheaper as a row filter while the sort index drives
+    # the scan; the unary + stops SQLite from picking the range's index.
+    broad = set()
+    if not match:
+        for name in {name for name, _, _ in ranges} - {column[2:]}:
+            if not _is_selective(conn, name, ranges):
+                broad.add(name)
+    for name, op, value in ranges:
+        conditions.append(f"{'+' if name in broad else ''}s.{name} {op} ?")
+        params.append(value)
+
+    after = filters["after"]
+    if after is not None and filters["after_id"]:
+        compare = "<" if direction == "DESC" else ">"
+        conditions.append(f"({column}, s.id) {compare} (?, ?)")
+        params += [after, filters["after_id"]]
+
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    limit = filters["limit"]
+    rows = conn.execute(f"""
+        SELECT u.name,
+               s.item_name,
+               s.category,
+               s.price_per_kg,
+               s.quantity,
+               s.location,
+               s.contact,
+               s.created_at,
+               s.id
+        FROM {source}
+        JOIN users u ON s.user_id = u.id
+        {where}
+        ORDER BY {column} {direction}, s.id {direction}
+        LIMIT ?
+    """, params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = {"after": last[column.split(".")[1]], "after_id": last["id"]}
+    return rows, next_cursor
+
+
+def listing_to_dict(row):
+    return {
+        "id": row["id"],
+        "supplier": row["name"],
+        "item_name": row["item_name"],
+        "category": row["category"],
+        "price_per_kg": row["price_per_kg"],
+        "quantity": row["quantity"],
+        "location": row["location"],
+        "contact": row["contact"],
+        "created_at": row["created_at"],
+    }